@@ -0,0 +1,128 @@
+#!python
+"""
+Compares the per sub-image (tile) CPU latency, and the load time, of the fastai learner against
+the standalone TorchScript (and ONNX) models exported by `model_export`, with and without
+int8 dynamic quantization.
+
+The load time is measured in a new Python process (so it includes importing fastai or not),
+and each exported model's probabilities are compared against the fastai learner's.
+Without a `--model`, an untrained classifier with the same architecture as `fastai_test` is used.
+
+Usage:
+    python -m benchmarks.inference_benchmark --model model.pkl --batch-sizes 1 64 --threads 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from src import model_export
+from src import tile_classifier as tc
+from src import tile_dataset
+
+
+def createUntrainedLearner(directory: str, architecture: str) -> str:
+    """Export an untrained fastai learner with the given architecture (e.g. `resnet34`)"""
+    from fastai.vision.all import (  # type: ignore
+        CrossEntropyLossFlat,
+        DataLoader,
+        DataLoaders,
+        Learner,
+        create_cnn_model,
+    )
+    import torchvision.models as models  # type: ignore
+
+    loaders = [DataLoader(tile_dataset.TileIndexDataset([]), bs=1) for _ in range(2)]
+    learn = Learner(
+        DataLoaders(*loaders),
+        create_cnn_model(getattr(models, architecture), 2, pretrained=False),
+        loss_func=CrossEntropyLossFlat(),
+    )
+    file_name = os.path.join(directory, "model.pkl")
+    learn.export(file_name)
+    return file_name
+
+
+def measureLoadSeconds(file_name: str) -> float:
+    """Measure how long it takes to import the loader and load the model in a new process"""
+    code = (
+        "import time; start = time.perf_counter(); "
+        "from src import tile_classifier as tc; "
+        f"tc.loadClassifier({file_name!r}); "
+        "print(time.perf_counter() - start)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def measureTileMilliseconds(
+    classifier: tc.TileClassifier, tiles: np.ndarray, batch_size: int, repeats: int
+) -> float:
+    """The median time to score a batch, per sub-image"""
+    batch = tiles[:batch_size]
+    classifier.predict(batch)  # Warm up
+    times: list[float] = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        classifier.predict(batch)
+        times.append(time.perf_counter() - start_time)
+    return 1000.0 * float(np.median(times)) / batch_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--model", help="The exported fastai learner (`learn.export()`)")
+    parser.add_argument("--architecture", default="resnet34")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64])
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--onnx", action="store_true", help="Also benchmark ONNX models")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    torch.set_num_threads(args.threads)
+
+    rng = np.random.default_rng(args.seed)
+    tiles = rng.integers(0, 256, size=(max(args.batch_sizes), 224, 224, 3), dtype=np.uint8)
+    with tempfile.TemporaryDirectory() as directory:
+        learner_file = args.model or createUntrainedLearner(directory, args.architecture)
+        baseline = tc.loadFastaiLearner(learner_file)
+
+        files = {"fastai learner": learner_file}
+        extensions = [tc.TORCHSCRIPT_EXTENSION] + ([tc.ONNX_EXTENSION] if args.onnx else [])
+        for extension in extensions:
+            for quantize in (False, True):
+                name = f"{extension[1:]}{' int8' if quantize else ''}"
+                file_name = os.path.join(directory, f"model_{len(files)}{extension}")
+                model_export.exportModel(baseline.module, file_name, quantize)
+                files[name] = file_name
+
+        expected = baseline.predict(tiles)
+        print(f"{args.threads} threads, {len(tiles)} sub-images")
+        header = "".join(f"{f'ms/tile @{b}':>14}" for b in args.batch_sizes)
+        print(f"{'model':<16} {'MB':>6} {'load s':>7}{header} {'max diff':>9}")
+        for name, file_name in files.items():
+            classifier = tc.loadClassifier(file_name)
+            timings = "".join(
+                f"{measureTileMilliseconds(classifier, tiles, b, args.repeats):>14.2f}"
+                for b in args.batch_sizes
+            )
+            difference = float(np.abs(classifier.predict(tiles) - expected).max())
+            print(
+                f"{name:<16} {os.path.getsize(file_name) / 1e6:>6.1f} "
+                f"{measureLoadSeconds(file_name):>7.2f}{timings} {difference:>9.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
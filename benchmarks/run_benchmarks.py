@@ -0,0 +1,393 @@
+#!python
+"""
+Benchmarks the hot paths of the extraction and tagging tools on synthetic camera-like images.
+
+Every benchmark is run a number of times and the timings (in milliseconds) are saved as JSON
+(by default into `benchmarks/results/<git commit>.json`), so that the results of two commits
+can be compared with `--baseline`.
+
+Usage:
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --quick --baseline benchmarks/results/abc1234.json
+"""
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Callable, Union
+
+import numpy as np
+from PIL import Image
+
+from src import model
+from src import data_serialization_json as ds
+from src import grouping
+from src import sub_image_regions as sir
+from src import training_sub_image_extraction as extraction
+import tagger_ui.data_access_layer as dal
+import tagger_ui.ui_model as uiModel
+
+from benchmarks import synthetic_data
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(__file__), "results")
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """The timings of a single benchmark (in milliseconds per run)"""
+
+    name: str
+    parameters: dict[str, Any]
+    runs: int
+    minMs: float
+    medianMs: float
+    meanMs: float
+    maxMs: float
+
+    @property
+    def key(self) -> str:
+        """Identifies the benchmark (and its parameters) when comparing results"""
+        parameters = ",".join(f"{k}={v}" for k, v in sorted(self.parameters.items()))
+        return f"{self.name}[{parameters}]"
+
+
+def measure(
+    name: str, fn: Callable[[], Any], runs: int, **parameters: Any
+) -> BenchmarkResult:
+    """Time the given function (after one warm-up call)"""
+    fn()
+    timings_ms: list[float] = []
+    for _ in range(runs):
+        start_time = time.perf_counter_ns()
+        fn()
+        timings_ms.append((time.perf_counter_ns() - start_time) / 1_000_000)
+
+    result = BenchmarkResult(
+        name,
+        parameters,
+        runs,
+        minMs=min(timings_ms),
+        medianMs=float(np.median(timings_ms)),
+        meanMs=float(np.mean(timings_ms)),
+        maxMs=max(timings_ms),
+    )
+    print(f"{result.key:<66} {result.medianMs:>10.3f}ms")
+    return result
+
+
+# ##################################################################################################
+# region Benchmarks
+# ##################################################################################################
+
+
+def benchmarkExtraction(
+    rng: np.random.Generator, width: int, height: int, runs: int, out_dir: str
+) -> list[BenchmarkResult]:
+    """The sub-image extraction hot paths (on a single image pair)"""
+    previous, current, regions = synthetic_data.createCameraImagePair(rng, width, height)
+    image_size = model.Size2d(width, height)
+    block_size = extraction.BLOCK_SIZE
+    sub_image_regions = list(sir.createSubImageRegions(block_size, image_size))
+    tiles = sub_image_regions
+    image_diff = extraction.calculate_image_diff(previous, current)
+    size = f"{width}x{height}"
+
+    results = [
+        measure(
+            "createSubImageRegions",
+            lambda: list(sir.createSubImageRegions(block_size, image_size)),
+            runs,
+            imageSize=size,
+        ),
+        measure(
+            "createSubImageTaggedRegions",
+            lambda: list(sir.createSubImageTaggedRegions(sub_image_regions, regions)),
+            runs,
+            imageSize=size,
+            taggedRegions=len(regions),
+        ),
+        measure(
+            "calculate_image_diff",
+            lambda: extraction.calculate_image_diff(previous, current),
+            runs,
+            imageSize=size,
+        ),
+        measure(
+            "tile slice",
+            lambda: np.stack([image_diff[r.y1 : r.y2, r.x1 : r.x2] for r in tiles]),
+            runs,
+            imageSize=size,
+            tiles=len(tiles),
+        ),
+    ]
+
+    # Save the same sub-image with each encoding backend
+    os.makedirs(os.path.join(out_dir, "true"), exist_ok=True)
+    image_info = model.ImageInfo(True, "D:/data/NRSI/camera_0000/STC_00001.JPG", regions)
+    sub_region = model.TaggedRegion2d(0, 0, block_size.width, block_size.height, True)
+    output_info = extraction.OutputImageInfo(out_dir, image_info, sub_region)
+    sub_image = np.ascontiguousarray(image_diff[: block_size.height, : block_size.width])
+    original_backend = extraction.SUB_IMAGE_BACKEND
+    try:
+        for backend in ("pil", "cv2"):
+            extraction.SUB_IMAGE_BACKEND = backend
+            results.append(
+                measure(
+                    "save_sub_image",
+                    lambda: extraction.save_sub_image(output_info, sub_image),
+                    runs * 10,
+                    backend=backend,
+                )
+            )
+    finally:
+        extraction.SUB_IMAGE_BACKEND = original_backend
+    return results
+
+
+def benchmarkRegionIndex(
+    rng: np.random.Generator, width: int, height: int, runs: int
+) -> list[BenchmarkResult]:
+    """Tagging every sub-image of an image by testing it against all of the tagged regions at
+    once, against gathering the tagged regions in the sub-image's index cells
+    (the crossover is `model.region_index.BATCH_INDEX_THRESHOLD`)
+    """
+    block_size = extraction.BLOCK_SIZE
+    image_size = model.Size2d(width, height)
+    tiles = model.RegionArray.fromRegions(
+        sir.createSubImageRegions(block_size, image_size)
+    )
+    results: list[BenchmarkResult] = []
+    original_threshold = model.region_index.BATCH_INDEX_THRESHOLD
+    try:
+        for count in (2, 20, 200, 2000):
+            positions = rng.integers(0, (width - 100, height - 100), size=(count, 2))
+            regions = [model.Region2d(x, y, 100, 100) for x, y in positions.tolist()]
+            array = model.RegionArray.fromRegions(regions)
+            index = model.RegionIndex(regions)
+            model.region_index.BATCH_INDEX_THRESHOLD = -1  # Always use the index cells
+            results += [
+                measure(
+                    "RegionArray.intersectsAny",
+                    lambda: tiles.intersectsAny(array),
+                    runs * 10,
+                    tiles=len(tiles),
+                    taggedRegions=count,
+                ),
+                measure(
+                    "RegionIndex.intersectsAnyBatch",
+                    lambda: index.intersectsAnyBatch(tiles),
+                    runs * 10,
+                    tiles=len(tiles),
+                    taggedRegions=count,
+                ),
+            ]
+    finally:
+        model.region_index.BATCH_INDEX_THRESHOLD = original_threshold
+    return results
+
+
+def createTkRoot() -> Union[Any, None]:
+    """Create a hidden Tk root window (needed to wrap images for Tk),
+    or None if Tk can't be used (for example, without a display)
+    """
+    try:
+        import tkinter as tk
+
+        root = tk.Tk()
+        root.withdraw()
+        return root
+    except Exception:  # pylint: disable=broad-except
+        return None
+
+
+def benchmarkTagger(
+    rng: np.random.Generator,
+    width: int,
+    height: int,
+    runs: int,
+    out_dir: str,
+    collection_sizes: list[int],
+) -> list[BenchmarkResult]:
+    """The tagger UI hot paths (scaling and moving between images, loading and saving)"""
+    window_size = model.Size2d(1600, 900)
+    image = Image.fromarray(synthetic_data.createTexturedImage(rng, width, height))
+    scale = uiModel.calculateImageScale(image, window_size)
+    results = [
+        measure(
+            "scaleImage",
+            lambda: uiModel.scaleImage(image, scale),
+            runs,
+            imageSize=f"{width}x{height}",
+            windowSize=f"{window_size.width}x{window_size.height}",
+        )
+    ]
+
+    # Moving to an image loads, scales and wraps it for Tk
+    tk_root = createTkRoot()
+    if tk_root is None:
+        print("moveToImage skipped - Tk is not available")
+    else:
+        file_paths: list[str] = []
+        for i in range(runs + 1):
+            file_path = os.path.join(out_dir, f"STC_{i:05}.jpg")
+            image.save(file_path, quality=90)
+            file_paths.append(file_path)
+        manager = uiModel.AnnotatedImagesManager(
+            [uiModel.AnnotatedImage(f) for f in file_paths]
+        )
+        manager.onWindowResized(window_size)
+        indexes = iter(range(len(file_paths)))
+        results.append(
+            measure(
+                "moveToImage",
+                lambda: manager.moveToImage(next(indexes)),
+                runs,
+                imageSize=f"{width}x{height}",
+            )
+        )
+        tk_root.destroy()
+
+    for count in collection_sizes:
+        collection = synthetic_data.createImagesCollection(rng, count)
+        file_name = os.path.join(out_dir, f"animals_{count}.json")
+        ds.saveImagesCollectionToJson(file_name, collection)
+        manager = dal.convertImagesCollectionToAnnotatedImagesManager(collection)
+        json_runs = max(1, runs // max(1, count // 1000))
+        results.append(
+            measure(
+                "saveAnnotatedImagesToJsonFile",
+                lambda: dal.saveAnnotatedImagesToJsonFile(file_name, manager),
+                json_runs,
+                images=count,
+            )
+        )
+        results.append(
+            measure(
+                "loadAnnotatedImagesFromJsonFile",
+                lambda: dal.loadAnnotatedImagesFromJsonFile(file_name),
+                json_runs,
+                images=count,
+            )
+        )
+    return results
+
+
+def benchmarkGrouping(
+    rng: np.random.Generator, runs: int, collection_sizes: list[int]
+) -> list[BenchmarkResult]:
+    """Grouping the images into bursts of consecutive images"""
+    results: list[BenchmarkResult] = []
+    for count in collection_sizes:
+        images = synthetic_data.createImagesCollection(rng, count).images
+        results.append(
+            measure(
+                "groupImages",
+                lambda: grouping.groupImages(images),
+                max(1, runs // max(1, count // 1000)),
+                images=count,
+            )
+        )
+    return results
+
+
+# endregion
+
+# ##################################################################################################
+# region Saving and comparing the results
+# ##################################################################################################
+
+
+def gitCommit() -> str:
+    """The current (short) git commit hash, or "unknown" if it can't be determined"""
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def saveResults(file_name: str, commit: str, results: list[BenchmarkResult]) -> None:
+    data = {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(r) for r in results],
+    }
+    with open(file_name, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def loadResults(file_name: str) -> list[BenchmarkResult]:
+    with open(file_name, "rt") as f:
+        data = json.load(f)
+    return [BenchmarkResult(**r) for r in data["results"]]
+
+
+def compareResults(
+    baseline: list[BenchmarkResult], results: list[BenchmarkResult]
+) -> None:
+    """Print how much each benchmark's median time changed from the baseline"""
+    baseline_by_key = {r.key: r for r in baseline}
+    print(f"{'benchmark':<66} {'baseline':>10} {'current':>10} {'change':>8}")
+    for result in results:
+        previous = baseline_by_key.get(result.key)
+        if previous is None:
+            continue
+        change = 100.0 * (result.medianMs - previous.medianMs) / previous.medianMs
+        print(
+            f"{result.key:<66} {previous.medianMs:>10.3f} {result.medianMs:>10.3f} "
+            f"{change:>+7.1f}%"
+        )
+
+
+# endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the extraction and tagging hot paths"
+    )
+    parser.add_argument("--width", type=int, default=4000, help="Camera image width")
+    parser.add_argument("--height", type=int, default=3000, help="Camera image height")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per benchmark")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--quick", action="store_true", help="Skip the 100k image JSON benchmarks"
+    )
+    parser.add_argument("--output", help="The results JSON file")
+    parser.add_argument("--baseline", help="A previous results JSON file to compare with")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    collection_sizes = [1_000, 10_000] if args.quick else [1_000, 10_000, 100_000]
+    results: list[BenchmarkResult] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        results += benchmarkExtraction(rng, args.width, args.height, args.runs, temp_dir)
+        results += benchmarkRegionIndex(rng, args.width, args.height, args.runs)
+        results += benchmarkTagger(
+            rng, args.width, args.height, args.runs, temp_dir, collection_sizes
+        )
+        results += benchmarkGrouping(rng, args.runs, collection_sizes)
+
+    commit = gitCommit()
+    output_file = args.output or os.path.join(RESULTS_FOLDER, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    saveResults(output_file, commit, results)
+    print(f"Saved results: {output_file}")
+
+    if args.baseline:
+        compareResults(loadResults(args.baseline), results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!python
+"""
+Compares the speed and accuracy of estimating the stabilisation transforms at full resolution
+against estimating them on a downscaled (1/4 and 1/8) image with tracked point re-use.
+
+A synthetic burst of camera images is created (a textured scene that sways with a known random
+rotation and shift from image to image) and saved as JPEGs, so that the reduced size JPEG decoding
+is part of the timing, just like with real camera images.
+
+Usage:
+    python -m benchmarks.stabilisation_benchmark --width 4000 --height 3000 --images 10
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from src import model
+from src import image_stabalization as stabilisation
+from benchmarks.synthetic_data import createTexturedImage
+
+
+def createSwayTransform(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """A random small rotation and shift, like a camera swaying in the wind"""
+    angle = rng.uniform(-1.0, 1.0)
+    transform = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    transform[:, 2] += rng.uniform(-0.01, 0.01, size=2) * (width, height)
+    return transform
+
+
+def createBurst(
+    directory: str, count: int, width: int, height: int, seed: int
+) -> tuple[list[model.ImageInfo], list[np.ndarray]]:
+    """Save a burst of swaying images, returning the images and the true transform onto
+    each image from the image before it
+    """
+    rng = np.random.default_rng(seed)
+    scene = createTexturedImage(rng, width, height)
+    images: list[model.ImageInfo] = []
+    transforms: list[np.ndarray] = []
+    for i in range(count):
+        transform = createSwayTransform(rng, width, height)
+        file_path = os.path.join(directory, f"burst_{i:04}.jpg")
+        cv2.imwrite(file_path, stabilisation.warpImage(scene, transform))
+        images.append(model.ImageInfo(False, file_path, []))
+        transforms.append(transform)
+
+    # The transform from image i-1 to image i is T_i * inverse(T_i-1)
+    def toMatrix(t: np.ndarray) -> np.ndarray:
+        return np.vstack([t, [0.0, 0.0, 1.0]])
+
+    relative = [np.eye(3)[:2]] + [
+        (toMatrix(transforms[i]) @ np.linalg.inv(toMatrix(transforms[i - 1])))[:2]
+        for i in range(1, count)
+    ]
+    return (images, relative)
+
+
+def calculateCornerError(
+    estimated: np.ndarray, expected: np.ndarray, width: int, height: int
+) -> float:
+    """The mean distance (in full resolution pixels) between where the two transforms
+    move the corners of the image
+    """
+    corners = np.array(
+        [[0, 0, 1], [width, 0, 1], [0, height, 1], [width, height, 1]], dtype=np.float64
+    )
+    return float(np.linalg.norm(corners @ estimated.T - corners @ expected.T, axis=1).mean())
+
+
+def runBenchmark(
+    images: list[model.ImageInfo],
+    expected: list[np.ndarray],
+    width: int,
+    height: int,
+    levels: int,
+    reuse_points: bool,
+) -> dict:
+    start_time = time.perf_counter()
+    results = stabilisation.estimateGroupTransforms(
+        images, levels=levels, reuse_points=reuse_points
+    )
+    elapsed = time.perf_counter() - start_time
+
+    errors = [
+        calculateCornerError(t, e, width, height)
+        for t, e in zip(results[1:], expected[1:])
+        if t is not None
+    ]
+    return {
+        "levels": levels,
+        "reusePoints": reuse_points,
+        "msPerPair": 1000.0 * elapsed / max(1, len(images) - 1),
+        "failedPairs": sum(1 for t in results[1:] if t is None),
+        "meanErrorPixels": float(np.mean(errors)) if errors else float("nan"),
+        "maxErrorPixels": float(np.max(errors)) if errors else float("nan"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    configurations = [(0, False), (2, False), (2, True), (3, True)]
+    with tempfile.TemporaryDirectory() as directory:
+        images, expected = createBurst(
+            directory, args.images, args.width, args.height, args.seed
+        )
+        print(f"{args.images} images of {args.width}x{args.height}")
+        print(
+            f"{'scale':>6} {'re-use':>7} {'ms/pair':>9} {'failed':>7} "
+            f"{'mean err':>9} {'max err':>8}"
+        )
+        for levels, reuse_points in configurations:
+            result = runBenchmark(
+                images, expected, args.width, args.height, levels, reuse_points
+            )
+            print(
+                f"{'1/' + str(2**levels):>6} {str(reuse_points):>7} "
+                f"{result['msPerPair']:>9.1f} {result['failedPairs']:>7} "
+                f"{result['meanErrorPixels']:>9.2f} {result['maxErrorPixels']:>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
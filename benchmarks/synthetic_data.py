@@ -0,0 +1,73 @@
+"""
+Creates synthetic (but camera-like) images and image collections for the benchmarks,
+so that the benchmarks are reproducible without any of the real camera data.
+"""
+import os
+
+import cv2
+import numpy as np
+
+from src import model
+
+
+def createTexturedImage(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Create a camera-like (BGR) image with plenty of texture and corners"""
+    blocks = rng.integers(0, 255, size=(height // 32, width // 32, 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+    return cv2.GaussianBlur(image, (9, 9), 0)
+
+
+def createCameraImagePair(
+    rng: np.random.Generator, width: int, height: int, animals: int = 3
+) -> tuple[np.ndarray, np.ndarray, list[model.Region2d]]:
+    """Create a previous and current camera image, where the current image has some sensor
+    noise and a few bright "animals" that weren't in the previous image
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, list[model.Region2d]]: The previous image,
+            the current image and the regions of the animals in the current image
+    """
+    previous = createTexturedImage(rng, width, height)
+    noise = rng.integers(-4, 5, size=previous.shape, dtype=np.int16)
+    current = np.clip(previous.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    regions: list[model.Region2d] = []
+    for _ in range(animals):
+        w = int(rng.integers(width // 20, width // 6))
+        h = int(rng.integers(height // 20, height // 6))
+        x = int(rng.integers(0, width - w))
+        y = int(rng.integers(0, height - h))
+        centre, axes = (x + w // 2, y + h // 2), (w // 2, h // 2)
+        cv2.ellipse(current, centre, axes, 0, 0, 360, (200, 180, 160), -1)
+        regions.append(model.Region2d(x, y, w, h))
+    return (previous, current, regions)
+
+
+def createImagesCollection(
+    rng: np.random.Generator, count: int, images_per_folder: int = 1000
+) -> model.ImagesCollection:
+    """Create an images collection like `animals.json`, with bursts of consecutive images
+    spread over camera folders, and about 10% of the images tagged with 1 to 3 regions
+    """
+    images: list[model.ImageInfo] = []
+    index = 0
+    for i in range(count):
+        folder = os.path.join("D:/data/NRSI", f"camera_{i // images_per_folder:04}")
+        index += 1 if rng.random() < 0.8 else int(rng.integers(2, 50))  # New burst
+        tagged = bool(rng.random() < 0.1)
+        regions = (
+            [
+                model.Region2d(
+                    int(rng.integers(0, 3800)),
+                    int(rng.integers(0, 2800)),
+                    int(rng.integers(50, 800)),
+                    int(rng.integers(50, 600)),
+                )
+                for _ in range(int(rng.integers(1, 4)))
+            ]
+            if tagged
+            else []
+        )
+        file_path = os.path.join(folder, f"STC_{index:05}.JPG").replace("\\", "/")
+        images.append(model.ImageInfo(tagged, file_path, regions))
+    return model.ImagesCollection(0, 0, images)
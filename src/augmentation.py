@@ -0,0 +1,95 @@
+"""
+The rotations and flips (transforms) used to create more positive training examples
+from each positively tagged sub-image.
+
+The transforms can either be applied when the sub-images are extracted
+(saving a separate file for each transform) or recorded in the tile index and applied
+on the fly by the training data loader with `applyTransformsToBatch`.
+
+See:
+    https://note.nkmk.me/en/python-opencv-numpy-rotate-flip
+"""
+from typing import Any, Sequence
+
+import numpy as np
+
+# The transform names - these are also used as the sub-image file name suffix
+IDENTITY = ""
+ROTATE_90_CLOCKWISE = "rotate_90°c"
+ROTATE_90_COUNTER_CLOCKWISE = "rotate_90°cc"
+FLIP_X = "flipped_x"
+FLIP_Y = "flipped_y"
+FLIP_XY = "flipped_xy"  # Same as rotating 180°
+
+# All of the transforms, the index of each transform is its transform ID
+TRANSFORMS: tuple[str, ...] = (
+    IDENTITY,
+    ROTATE_90_CLOCKWISE,
+    ROTATE_90_COUNTER_CLOCKWISE,
+    FLIP_X,
+    FLIP_Y,
+    FLIP_XY,
+)
+
+# The transforms used to augment the positively tagged sub-images (everything except identity)
+AUGMENTATIONS: tuple[str, ...] = TRANSFORMS[1:]
+
+
+def transformId(name: str) -> int:
+    """The integer ID of the transform with the given name"""
+    return TRANSFORMS.index(name)
+
+
+def applyTransform(image: Any, name: str, axes: tuple[int, int] = (0, 1)) -> Any:
+    """Apply the named transform to a single image
+
+    Args:
+        image (Any): The image (a NumPy array)
+        name (str): The name of the transform to apply (one of TRANSFORMS)
+        axes (tuple[int, int]): The (height, width) axes of the image
+            The default is for a single HxW or HxWxC image
+
+    Returns:
+        Any: The transformed image (this may be a view onto the original image)
+    """
+    height_axis, width_axis = axes
+    if name == IDENTITY:
+        return image
+    if name == ROTATE_90_CLOCKWISE:
+        return np.rot90(image, k=-1, axes=axes)
+    if name == ROTATE_90_COUNTER_CLOCKWISE:
+        return np.rot90(image, k=1, axes=axes)
+    if name == FLIP_X:
+        return np.flip(image, axis=width_axis)
+    if name == FLIP_Y:
+        return np.flip(image, axis=height_axis)
+    if name == FLIP_XY:
+        return np.flip(image, axis=axes)
+    raise ValueError(f"Unknown transform: {name}")
+
+
+def applyTransformsToBatch(
+    batch: np.ndarray, transform_ids: Sequence[int], axes: tuple[int, int] = (1, 2)
+) -> np.ndarray:
+    """Apply a (possibly different) transform to each image in a batch of square images.
+    Rather than transforming the images one at a time, all the images sharing a transform
+    are transformed together with a single NumPy operation.
+
+    Args:
+        batch (np.ndarray): The batch of square images
+        transform_ids (Sequence[int]): The transform ID of each image in the batch
+        axes (tuple[int, int]): The (height, width) axes of the images in the batch
+            The default (1, 2) is for NxHxWxC batches, use (2, 3) for NxCxHxW batches
+
+    Returns:
+        np.ndarray: A new batch of the transformed images
+    """
+    assert batch.shape[axes[0]] == batch.shape[axes[1]], "Images must be square"
+    ids = np.asarray(transform_ids)
+    assert len(ids) == len(batch)
+
+    result = np.empty_like(batch)
+    for id in np.unique(ids):
+        mask = ids == id
+        result[mask] = applyTransform(batch[mask], TRANSFORMS[id], axes)
+    return result
@@ -0,0 +1,255 @@
+"""
+Training (and refreshing) the sub-image classifier on CPU-only servers (see `fastai_test.py`).
+
+Training on the CPU is mostly limited by the backbone, so this uses a smaller backbone,
+the channels-last memory format (which the CPU convolution kernels are fastest with),
+a fixed split of the CPU cores between the compute threads and the data loader workers,
+and data loaders without GPU memory pinning.
+
+Fine-tuning first trains only the head with the backbone frozen, which `Learner.fine_tune`
+does by running every batch forwards (and backwards, for the batch norm layers) through the
+whole backbone. With `cacheFeatures` the backbone features of every sample are calculated once
+instead, and the head is trained on those cached features - which takes seconds on a CPU.
+"""
+from dataclasses import dataclass
+import os
+import time
+from typing import Any, Callable, Union
+
+import torch
+import torch.nn.functional as F
+from torchvision import models  # type: ignore
+from fastai.callback.core import Callback  # type: ignore
+
+from src import inference
+
+# The backbones to choose from (smallest first) - they're all supported by fastai's `cnn_learner`
+BACKBONES: dict[str, Callable[..., Any]] = {
+    "resnet18": models.resnet18,
+    "resnet34": models.resnet34,
+}
+
+
+@dataclass(frozen=True)
+class CpuTrainingConfig:
+    """The settings for training on the CPU"""
+
+    # The backbone (one of `BACKBONES`)
+    backbone: str = "resnet18"
+
+    # The batch size (the GPU batch size is limited by its memory, but on the CPU a larger batch
+    # makes better use of the cores)
+    batchSize: int = 64
+
+    # The data loader worker processes, and the compute threads
+    # (None for all of the CPU cores not used by the workers)
+    workers: int = max(1, (os.cpu_count() or 1) // 4)
+    threads: Union[int, None] = None
+
+    # The batches each data loader worker prepares ahead of time
+    prefetchFactor: int = 4
+
+    # Whether to use the channels-last memory format
+    channelsLast: bool = True
+
+    # Whether to train the head on cached backbone features while the backbone is frozen
+    cacheFeatures: bool = True
+
+    # The epochs to train the head for while the backbone is frozen
+    headEpochs: int = 1
+
+    def __post_init__(self):
+        assert self.backbone in BACKBONES, f"Unknown backbone: {self.backbone}"
+        assert self.workers >= 0
+
+    @property
+    def computeThreads(self) -> int:
+        """The number of compute threads"""
+        if self.threads is not None:
+            return self.threads
+        return max(1, (os.cpu_count() or 1) - self.workers)
+
+
+def configureCpuTraining(config: CpuTrainingConfig) -> None:
+    """Use the configured number of CPU threads for training"""
+    inference.configureThreads(config.computeThreads)
+
+
+def tuneDataLoaders(data_loaders: Any, config: CpuTrainingConfig) -> None:
+    """Change the fastai data loaders to the CPU settings
+    (the configured workers and prefetching, and no GPU memory pinning)
+    """
+    for loader in data_loaders.loaders:
+        loader.pin_memory = False
+        loader.fake_l.pin_memory = False
+        loader.fake_l.num_workers = config.workers
+        loader.fake_l.prefetch_factor = config.prefetchFactor
+
+
+class ThroughputCallback(Callback):  # type: ignore
+    """Measures (and prints) the training images per second of each epoch"""
+
+    def __init__(self):
+        self.imagesPerSecond: list[float] = []
+        self._count = 0
+        self._start = 0.0
+
+    def before_train(self):
+        self._count, self._start = 0, time.perf_counter()
+
+    def after_batch(self):
+        if self.training:
+            self._count += len(self.learn.yb[0])
+
+    def after_train(self):
+        seconds = time.perf_counter() - self._start
+        images_per_second = self._count / seconds if seconds > 0 else 0.0
+        self.imagesPerSecond.append(images_per_second)
+        print(f"Epoch {self.epoch}: {self._count} images, {images_per_second:.1f} images/s")
+
+
+def prepareLearner(learn: Any, config: CpuTrainingConfig) -> None:
+    """Add the images per second reporting to the fastai learner,
+    and switch its model to the channels-last memory format (without mixed precision)
+    """
+    learn.add_cb(ThroughputCallback())
+    if config.channelsLast:
+        # The model is converted now (rather than when fitting starts) for `computeFeatures`
+        learn.model.to(memory_format=torch.channels_last)
+        learn.to_channelslast(use_amp=False)
+
+
+# ##################################################################################################
+# region Cached backbone features
+# ##################################################################################################
+
+
+@dataclass(frozen=True)
+class CachedFeatures:
+    """The pooled backbone features of every sample"""
+
+    # The `N x F` features
+    features: torch.Tensor
+
+    # The `N` labels
+    labels: torch.Tensor
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+
+def splitCnnModel(
+    module: torch.nn.Module,
+) -> tuple[torch.nn.Module, torch.nn.Module, torch.nn.Module]:
+    """Split a fastai `cnn_learner` model into its backbone, the (parameter free) pooling at
+    the start of its head, and the rest of its head (which shares the model's layers)
+    """
+    body, head = module[0], module[1]  # type: ignore
+    return (body, head[:2], head[2:])
+
+
+def computeFeatures(module: torch.nn.Module, loader: Any) -> CachedFeatures:
+    """Run every batch from the loader through the backbone (and pooling) once
+
+    Args:
+        module (torch.nn.Module): The fastai `cnn_learner` model
+        loader (Any): The data loader of (image batch, label batch) tuples
+
+    Returns:
+        CachedFeatures: The pooled backbone features of every sample
+    """
+    body, pool, _ = splitCnnModel(module)
+    was_training = module.training
+    module.eval()
+    features: list[torch.Tensor] = []
+    labels: list[torch.Tensor] = []
+    with torch.no_grad():
+        for images, batch_labels in loader:
+            features.append(pool(body(images.as_subclass(torch.Tensor))))
+            labels.append(batch_labels.as_subclass(torch.Tensor))
+    module.train(was_training)
+    return CachedFeatures(torch.cat(features), torch.cat(labels))
+
+
+def fitHead(
+    head: torch.nn.Module,
+    train: CachedFeatures,
+    valid: Union[CachedFeatures, None],
+    epochs: int,
+    lr: float,
+    batch_size: int,
+    weight_decay: float = 0.01,
+) -> list[float]:
+    """Train the head on cached features, with the same one-cycle schedule
+    `Learner.fine_tune` uses for the frozen epochs
+
+    Returns:
+        list[float]: The validation error rate after each epoch (if there are validation features)
+    """
+    optimizer = torch.optim.AdamW(head.parameters(), lr=lr, weight_decay=weight_decay)
+    steps_per_epoch = max(1, len(train) // batch_size)
+    scheduler = torch.optim.lr_scheduler.OneCycleLR(
+        optimizer, max_lr=lr, total_steps=epochs * steps_per_epoch, pct_start=0.99
+    )
+
+    error_rates: list[float] = []
+    for epoch in range(epochs):
+        start_time = time.perf_counter()
+        head.train()
+        order = torch.randperm(len(train))
+        total_loss = 0.0
+        for step in range(steps_per_epoch):
+            batch = order[step * batch_size : (step + 1) * batch_size]
+            loss = F.cross_entropy(head(train.features[batch]), train.labels[batch])
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            total_loss += loss.item()
+        seconds = time.perf_counter() - start_time
+        message = f"Head epoch {epoch}: loss {total_loss / steps_per_epoch:.4f}"
+
+        if valid is not None and len(valid) > 0:
+            head.eval()
+            with torch.no_grad():
+                predictions = head(valid.features).argmax(dim=1)
+            error_rates.append((predictions != valid.labels).float().mean().item())
+            message += f", error rate {error_rates[-1]:.4f}"
+
+        images_per_second = steps_per_epoch * batch_size / seconds if seconds > 0 else 0.0
+        print(f"{message}, {images_per_second:.1f} images/s")
+    return error_rates
+
+
+def fineTune(
+    learn: Any,
+    epochs: int,
+    config: CpuTrainingConfig,
+    base_lr: float = 2e-3,
+    lr_mult: float = 100,
+) -> None:
+    """Fine-tune the fastai learner like `Learner.fine_tune`, but (with `cacheFeatures`) train
+    the head on cached backbone features for the frozen epochs.
+    Unlike `Learner.fine_tune`, the batch norm layers of the backbone aren't updated while it is
+    frozen (the features are calculated with the pre-trained statistics).
+    """
+    if not config.cacheFeatures:
+        learn.fine_tune(epochs, base_lr, freeze_epochs=config.headEpochs, lr_mult=lr_mult)
+        return
+
+    learn.freeze()
+    start_time = time.perf_counter()
+    train = computeFeatures(learn.model, learn.dls.train)
+    valid = computeFeatures(learn.model, learn.dls.valid)
+    seconds = time.perf_counter() - start_time
+    print(f"Cached the features of {len(train) + len(valid)} images in {seconds:.1f}s")
+
+    _, _, head = splitCnnModel(learn.model)
+    fitHead(head, train, valid, config.headEpochs, base_lr, config.batchSize)
+
+    base_lr /= 2
+    learn.unfreeze()
+    learn.fit_one_cycle(epochs, slice(base_lr / lr_mult, base_lr), pct_start=0.3, div=5.0)
+
+
+# endregion
@@ -0,0 +1,275 @@
+"""
+Reads and writes the images data as `.csv` files (the format the utility scripts and Excel use),
+streaming the rows one at a time, so even a multi-GB catalogue is never loaded all at once.
+
+Each row is an image: its tag, its file path, and optionally its regions and confidence:
+
+    tagged,filePath,regions,confidence
+    True,D:\\data\\cam1\\IMG_0002.JPG,10 20 30 40;50 60 70 80 0.93,0.97
+
+where each region is `x y w h` (or `x y w h confidence` for a predicted region),
+separated by `;`.  The older two column files (`tag,path`) can be read as well,
+with or without their header row (`animals.out.csv` files have none).
+The images collection's metadata is saved in a leading `#` comment row, so that converting
+an `animals.json` file to `.csv` and back again doesn't lose anything.
+The files are written with standard `"` quoting (like Excel), while the older files that the
+utility scripts quoted with `|` are recognised when they're read.
+"""
+import csv
+import re
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, Union
+
+from src import model
+from src import neighbour_images as neighbours
+
+# The header row of the `.csv` files
+CSV_HEADER = ["tagged", "filePath", "regions", "confidence"]
+
+# The quote character of the `.csv` files
+QUOTE_CHAR = '"'
+
+# The quote character of the older `.csv` files written by the utility scripts
+LEGACY_QUOTE_CHAR = "|"
+
+# The amount of the file that is checked for the legacy quote character
+_QUOTE_SAMPLE_SIZE = 64 * 1024
+
+# A field quoted with the legacy quote character (file paths can't contain a `|` on Windows)
+_LEGACY_QUOTED_FIELD = re.compile(r"(^|,)\|", re.MULTILINE)
+
+# The number of images in each chunk read by `readImageChunks`
+DEFAULT_CHUNK_SIZE = 10_000
+
+_TRUE_VALUES = {"true", "1", "yes"}
+_FALSE_VALUES = {"false", "0", "no"}
+
+
+# ##################################################################################################
+# region Loading csv functions (de-serialization)
+# ##################################################################################################
+
+
+def parseTag(value: str) -> bool:
+    """Parse a tag column (`TRUE`, `True` and `1` are all tagged)"""
+    return value.strip().lower() in _TRUE_VALUES
+
+
+def parseRegions(value: str) -> list[model.Region2d]:
+    """Parse a regions column back into its regions"""
+    regions: list[model.Region2d] = []
+    for text in value.split(";"):
+        numbers = text.split()
+        if not numbers:
+            continue
+        x, y, w, h = (int(n) for n in numbers[:4])
+        if len(numbers) > 4:
+            regions.append(model.PredictedRegion2d(x, y, w, h, float(numbers[4])))
+        else:
+            regions.append(model.Region2d(x, y, w, h))
+    return regions
+
+
+def parseImageRow(row: list[str]) -> model.ImageInfo:
+    """Parse a `.csv` row back into an image"""
+    regions = parseRegions(row[2]) if len(row) > 2 else []
+    confidence = float(row[3]) if len(row) > 3 and row[3] else None
+    return model.ImageInfo(parseTag(row[0]), row[1].strip(), regions, confidence)
+
+
+def _parseMetadata(row: list[str]) -> dict[str, int]:
+    """Parse the images collection metadata comment row (`#maxViewed=1,currentIndex=0`)"""
+    metadata: dict[str, int] = {}
+    for item in [row[0].lstrip("#")] + row[1:]:
+        name, _, value = item.partition("=")
+        if value:
+            metadata[name.strip()] = int(value)
+    return metadata
+
+
+def detectQuoteChar(sample: str) -> str:
+    """The quote character of a `.csv` file, from the start of the file"""
+    return LEGACY_QUOTE_CHAR if _LEGACY_QUOTED_FIELD.search(sample) else QUOTE_CHAR
+
+
+def _isHeaderRow(row: list[str]) -> bool:
+    """Determines if the row is a header row, rather than an image (which starts with its tag)"""
+    return row[0].strip().lower() not in _TRUE_VALUES | _FALSE_VALUES
+
+
+def _readRows(file_name: str) -> Iterator[list[str]]:
+    """Stream the rows of the `.csv` file, including the metadata row but not the header"""
+    with open(file_name, "r", newline="") as csv_file:
+        quote_char = detectQuoteChar(csv_file.read(_QUOTE_SAMPLE_SIZE))
+        csv_file.seek(0)
+        reader = csv.reader(csv_file, quotechar=quote_char)
+        header_found = False
+        for row in reader:
+            if not row:
+                continue
+            if row[0].startswith("#"):
+                yield row
+            elif not header_found:
+                header_found = True
+                if not _isHeaderRow(row):
+                    yield row  # A legacy file without a header row
+            else:
+                yield row
+
+
+def readImages(file_name: str) -> Iterator[model.ImageInfo]:
+    """Stream the images in the `.csv` file, one at a time"""
+    for row in _readRows(file_name):
+        if not row[0].startswith("#"):
+            yield parseImageRow(row)
+
+
+def readImageChunks(
+    file_name: str, chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Iterator[list[model.ImageInfo]]:
+    """Stream the images in the `.csv` file, in chunks of (up to) `chunk_size` images"""
+    assert chunk_size > 0
+    images = readImages(file_name)
+    while chunk := list(islice(images, chunk_size)):
+        yield chunk
+
+
+def loadImagesCollectionFromCsv(file_name: str) -> model.ImagesCollection:
+    """Load the whole images collection from the `.csv` file"""
+    metadata: dict[str, int] = {}
+    images: list[model.ImageInfo] = []
+    for row in _readRows(file_name):
+        if row[0].startswith("#"):
+            metadata.update(_parseMetadata(row))
+        else:
+            images.append(parseImageRow(row))
+    return model.ImagesCollection(
+        maxViewed=metadata.get("maxViewed", 0),
+        currentIndex=metadata.get("currentIndex", 0),
+        images=images,
+    )
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Saving csv functions (serialization)
+# ##################################################################################################
+
+
+def formatRegions(regions: Iterable[model.Region2d]) -> str:
+    """Format the regions as a regions column"""
+    texts: list[str] = []
+    for region in regions:
+        nr = model.normalize(region)
+        text = f"{nr.x} {nr.y} {nr.w} {nr.h}"
+        if isinstance(region, model.PredictedRegion2d):
+            text += f" {region.confidence!r}"
+        texts.append(text)
+    return ";".join(texts)
+
+
+def formatImageRow(image: model.ImageInfo) -> list[str]:
+    """Format an image as a `.csv` row"""
+    confidence = "" if image.confidence is None else repr(image.confidence)
+    return [str(image.tagged), image.filePath, formatRegions(image.regions), confidence]
+
+
+def writeImages(
+    file_name: str,
+    images: Iterable[model.ImageInfo],
+    collection: Union[model.ImagesCollection, None] = None,
+) -> int:
+    """Stream the images into a `.csv` file, one at a time
+
+    Args:
+        file_name (str): The `.csv` file to write
+        images (Iterable[model.ImageInfo]): The images to write (e.g. from `readImages`)
+        collection (Union[model.ImagesCollection, None]): The images collection the images
+            are from, to save its metadata too
+
+    Returns:
+        int: The number of images written
+    """
+    count = 0
+    with open(file_name, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file, quotechar=QUOTE_CHAR, quoting=csv.QUOTE_MINIMAL)
+        if collection is not None:
+            writer.writerow(
+                [
+                    f"#maxViewed={collection.maxViewed}",
+                    f"currentIndex={collection.currentIndex}",
+                ]
+            )
+        writer.writerow(CSV_HEADER)
+        for image in images:
+            writer.writerow(formatImageRow(image))
+            count += 1
+    return count
+
+
+def saveImagesCollectionToCsv(file_name: str, collection: model.ImagesCollection) -> None:
+    """Save the whole images collection to the `.csv` file"""
+    writeImages(file_name, collection.images, collection)
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Single pass statistics
+# ##################################################################################################
+
+
+@dataclass
+class ImageRecordStats:
+    """Counts the tagged images, and finds the image groups that start with a tagged image,
+    one image at a time (add the images in their `grouping.groupImages` order)
+    """
+
+    total: int = 0
+    tagged: int = 0
+    groups: int = 0
+
+    # The tagged images that start an image group
+    # (which we really don't want for training, as there's no previous image to subtract)
+    taggedGroupStarts: list[str] = field(default_factory=list)
+
+    _previousKey: Union[neighbours.ImageKey, None] = field(default=None, repr=False)
+
+    @property
+    def notTagged(self) -> int:
+        return self.total - self.tagged
+
+    def add(self, image: model.ImageInfo) -> None:
+        """Count the next image"""
+        self.total += 1
+        self.tagged += image.tagged
+
+        # A new group starts with a new folder, or when the image numbers aren't consecutive
+        key = neighbours.createImageKey(image.filePath)
+        previous = self._previousKey
+        isNewGroup = (
+            key is None
+            or previous is None
+            or key[0] != previous[0]
+            or key[3] != previous[3] + 1
+        )
+        if isNewGroup:
+            self.groups += 1
+            if image.tagged:
+                self.taggedGroupStarts.append(image.filePath)
+        self._previousKey = key
+
+
+def calculateImageRecordStats(images: Iterable[model.ImageInfo]) -> ImageRecordStats:
+    """Count the images (in a single pass, so they can be streamed from a `.csv` file)"""
+    stats = ImageRecordStats()
+    for image in images:
+        stats.add(image)
+    return stats
+
+
+# endregion
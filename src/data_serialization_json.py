@@ -10,9 +10,18 @@ from src import model
 # ##################################################################################################
 
 
-def deSerializeRegion2d(dict: dict[str, int]) -> model.Region2d:
-    """Serialize a JSON dictionary back into a Region2d."""
+def deSerializeRegion2d(dict: dict[str, Any]) -> model.Region2d:
+    """Serialize a JSON dictionary back into a Region2d
+    (or a PredictedRegion2d if it has a confidence)."""
     assert dict
+    if "confidence" in dict:
+        return model.PredictedRegion2d(
+            x=dict["x"],
+            y=dict["y"],
+            w=dict["w"],
+            h=dict["h"],
+            confidence=dict["confidence"],
+        )
     return model.Region2d(x=dict["x"], y=dict["y"], w=dict["w"], h=dict["h"])
 
 
@@ -22,6 +31,7 @@ def deSerializeImageInfo(dict: dict[str, Any]) -> model.ImageInfo:
         tagged=dict["tagged"],
         filePath=dict["filePath"],
         regions=dict["regions"],
+        confidence=dict.get("confidence"),
     )
 
 
@@ -68,26 +78,32 @@ def loadImagesCollectionFromJson(file_name: str) -> model.ImagesCollection:
 # ##################################################################################################
 
 
-def serializeRegion2dToDict(region: model.Region2d) -> dict[str, int]:
+def serializeRegion2dToDict(region: model.Region2d) -> dict[str, Any]:
     """Serialize a Region2d into a Dict suitable for saving to JSON."""
     assert region
     nr = model.normalize(region)
-    return {
+    result: dict[str, Any] = {
         "x": nr.x,
         "y": nr.y,
         "w": nr.w,
         "h": nr.h,
     }
+    if isinstance(region, model.PredictedRegion2d):
+        result["confidence"] = region.confidence
+    return result
 
 
 def serializeImageInfoToDict(image: model.ImageInfo) -> dict[str, Any]:
     """Convert an annotated image into a dictionary suitable for JSON serialization"""
     assert image
-    return {
+    result: dict[str, Any] = {
         "tagged": image.tagged,
         "filePath": image.filePath,
         "regions": [serializeRegion2dToDict(r) for r in image.regions if r is not None],
     }
+    if image.confidence is not None:
+        result["confidence"] = image.confidence
+    return result
 
 
 def deSerializeImageCollection(collection: model.ImagesCollection) -> dict[str, Any]:
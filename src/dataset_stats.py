@@ -0,0 +1,608 @@
+r"""
+The statistics of the images data set (`animals.json`) and of the extracted sub-image store,
+along with a projection of how many sub-images (and bytes) an extraction run will produce,
+so that extraction runs (and their disk space) can be sized before launching them.
+
+The images are read into columnar NumPy arrays in a single pass (see `createImageTable`),
+and every statistic is then calculated from those arrays.
+
+Run from the top-level folder with:
+    python -m src.dataset_stats animals.json --tiles D:\data\NRSI\__ai_training_images
+"""
+import argparse
+from dataclasses import asdict, dataclass
+import json
+import os
+from typing import Any, Iterable, Sequence, Union
+
+import numpy as np
+from PIL import Image as pilImage
+
+from src import augmentation
+from src import data_serialization_json as ds
+from src import extraction_config as ec
+from src import model
+from src import neighbour_images as neighbours
+from src import sub_image_regions as sir
+from src import tile_index as ti
+from src import training_sub_image_extraction as extraction
+
+# The bins of the region size histograms (in full size image pixels)
+REGION_SIZE_BINS = (0, 32, 64, 128, 224, 448, 896, np.inf)
+
+# The bins of the group size histogram (the number of images in each group)
+GROUP_SIZE_BINS = (1, 2, 3, 5, 10, 20, 50, np.inf)
+
+# The approximate size of a saved sub-image (JPEG bytes per pixel),
+# used to project the output size when there's no existing sub-image store to measure
+DEFAULT_BYTES_PER_PIXEL = 0.4
+
+
+# ##################################################################################################
+# region The columnar image table
+# ##################################################################################################
+
+
+@dataclass(frozen=True)
+class ImageTable:
+    """The images data set as columnar arrays (one entry per image, in the data set's order),
+    plus the confirmed (human tagged) regions of every image
+    """
+
+    filePaths: list[str]
+
+    # The camera (folder) names - each image's camera is an index into this list
+    cameras: list[str]
+    camera: np.ndarray  # int32[N]
+
+    # The image group (burst) of each image (see `grouping.groupImages`)
+    group: np.ndarray  # int32[N]
+
+    tagged: np.ndarray  # bool[N]
+
+    # `True` where the image has a previous image in its group
+    # (so it's the current image of an image pair, which is what gets extracted)
+    isPair: np.ndarray  # bool[N]
+
+    # The image of each region (in increasing order), and the (normalized) regions
+    regionImage: np.ndarray  # int32[M]
+    regions: model.RegionArray
+
+    def __len__(self) -> int:
+        return len(self.filePaths)
+
+
+def createImageTable(images: Iterable[model.ImageInfo]) -> ImageTable:
+    """Read the images into an image table, in a single pass
+    (the images must be in the order `grouping.groupImages` expects)
+    """
+    file_paths: list[str] = []
+    camera_ids: dict[str, int] = {}
+    camera: list[int] = []
+    group: list[int] = []
+    tagged: list[bool] = []
+    is_pair: list[bool] = []
+    region_image: list[int] = []
+    boxes: list[tuple[int, int, int, int]] = []
+
+    previous_key: Union[neighbours.ImageKey, None] = None
+    for i, image in enumerate(images):
+        key = neighbours.createImageKey(image.filePath)
+        folder = key[0] if key else os.path.normpath(os.path.dirname(image.filePath))
+
+        # A new group starts with a new folder, or when the image numbers aren't consecutive
+        continues_group = (
+            key is not None
+            and previous_key is not None
+            and key[0] == previous_key[0]
+            and key[3] == previous_key[3] + 1
+        )
+        previous_key = key
+
+        file_paths.append(image.filePath)
+        camera.append(camera_ids.setdefault(folder, len(camera_ids)))
+        group.append(group[-1] + (0 if continues_group else 1) if group else 0)
+        tagged.append(image.tagged)
+        is_pair.append(continues_group)
+        for region in model.confirmedRegions(image.regions):
+            r = model.normalize(region)
+            region_image.append(i)
+            boxes.append((r.x, r.y, r.w, r.h))
+
+    return ImageTable(
+        filePaths=file_paths,
+        cameras=list(camera_ids),
+        camera=np.array(camera, dtype=np.int32),
+        group=np.array(group, dtype=np.int32),
+        tagged=np.array(tagged, dtype=bool),
+        isPair=np.array(is_pair, dtype=bool),
+        regionImage=np.array(region_image, dtype=np.int32),
+        regions=model.RegionArray(boxes),
+    )
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Data set statistics
+# ##################################################################################################
+
+
+@dataclass(frozen=True)
+class CameraStats:
+    """The counts of a single camera (folder)"""
+
+    camera: str
+    images: int
+    tagged: int
+    groups: int
+    pairs: int
+    regions: int
+
+
+def calculateCameraStats(table: ImageTable) -> list[CameraStats]:
+    """The counts of each camera"""
+    n = len(table.cameras)
+    images = np.bincount(table.camera, minlength=n)
+    tagged = np.bincount(table.camera[table.tagged], minlength=n)
+    groups = np.bincount(table.camera[~table.isPair], minlength=n)
+    pairs = np.bincount(table.camera[table.isPair], minlength=n)
+    regions = np.bincount(table.camera[table.regionImage], minlength=n)
+    return [
+        CameraStats(
+            camera=name,
+            images=int(images[i]),
+            tagged=int(tagged[i]),
+            groups=int(groups[i]),
+            pairs=int(pairs[i]),
+            regions=int(regions[i]),
+        )
+        for i, name in enumerate(table.cameras)
+    ]
+
+
+@dataclass(frozen=True)
+class GroupStats:
+    """The counts of the image groups (bursts)"""
+
+    groups: int
+
+    # The groups with at least one tagged image
+    taggedGroups: int
+
+    # The groups that start with a tagged image
+    # (which we don't want for training, as there's no previous image to subtract)
+    taggedGroupStarts: int
+
+    meanSize: float
+
+    # The histogram of the number of images in each group
+    # (the last bin has no upper edge, so its upper edge is None)
+    sizeBins: list[Union[float, None]]
+    sizeCounts: list[int]
+
+
+def calculateGroupStats(table: ImageTable) -> GroupStats:
+    """The counts of the image groups"""
+    if len(table) == 0:
+        empty_counts = [0] * (len(GROUP_SIZE_BINS) - 1)
+        return GroupStats(0, 0, 0, 0.0, _binEdges(GROUP_SIZE_BINS), empty_counts)
+    sizes = np.bincount(table.group)
+    tagged_groups = np.unique(table.group[table.tagged])
+    size_counts, _ = np.histogram(sizes, bins=GROUP_SIZE_BINS)
+    return GroupStats(
+        groups=len(sizes),
+        taggedGroups=len(tagged_groups),
+        taggedGroupStarts=int((table.tagged & ~table.isPair).sum()),
+        meanSize=float(sizes.mean()),
+        sizeBins=_binEdges(GROUP_SIZE_BINS),
+        sizeCounts=size_counts.tolist(),
+    )
+
+
+def _binEdges(bins: Sequence[float]) -> list[Union[float, None]]:
+    """The histogram bin edges as JSON friendly values (None instead of infinity)"""
+    return [float(b) if np.isfinite(b) else None for b in bins]
+
+
+@dataclass(frozen=True)
+class RegionSizeStats:
+    """The histograms of the confirmed regions' sizes (in full size image pixels)"""
+
+    regions: int
+
+    # The bin edges (the last bin has no upper edge, so its upper edge is None)
+    bins: list[Union[float, None]]
+    widthCounts: list[int]
+    heightCounts: list[int]
+
+    # The larger of each region's width and height
+    # (regions larger than the sub-image size are never seen whole by the AI model)
+    maxSideCounts: list[int]
+
+
+def calculateRegionSizeStats(table: ImageTable) -> RegionSizeStats:
+    """The histograms of the region sizes"""
+    widths = table.regions.boxes[:, 2]
+    heights = table.regions.boxes[:, 3]
+    return RegionSizeStats(
+        regions=len(table.regions),
+        bins=_binEdges(REGION_SIZE_BINS),
+        widthCounts=np.histogram(widths, bins=REGION_SIZE_BINS)[0].tolist(),
+        heightCounts=np.histogram(heights, bins=REGION_SIZE_BINS)[0].tolist(),
+        maxSideCounts=np.histogram(
+            np.maximum(widths, heights), bins=REGION_SIZE_BINS
+        )[0].tolist(),
+    )
+
+
+# endregion
+
+
+# ##################################################################################################
+# region The extracted sub-image store
+# ##################################################################################################
+
+
+@dataclass(frozen=True)
+class TileStoreStats:
+    """The counts of an extracted sub-image store (see `training_sub_image_extraction`)"""
+
+    positiveFiles: int
+    negativeFiles: int
+    totalBytes: int
+
+    # The training samples (from the tile index, which includes the augmentations of
+    # the positive sub-images when they're augmented by the data loader)
+    positiveSamples: int
+    negativeSamples: int
+
+    # The fraction of the training samples that are positive (after augmentation)
+    positiveRatio: float
+
+    bytesPerFile: float
+
+
+def calculateTileStoreStats(out_dir: str) -> TileStoreStats:
+    """Count the sub-images (and their bytes) in the store's `true` and `false` folders,
+    and the training samples in its tile index (if it has one)
+    """
+    counts = {True: 0, False: 0}
+    total_bytes = 0
+    for tag in (True, False):
+        folder = os.path.join(out_dir, "true" if tag else "false")
+        if not os.path.isdir(folder):
+            continue
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    counts[tag] += 1
+                    total_bytes += entry.stat().st_size
+
+    samples = dict(counts)
+    index_file = os.path.join(out_dir, ti.TILE_INDEX_FILE_NAME)
+    if os.path.isfile(index_file):
+        tags = np.array([e.tag for e in ti.loadTileIndex(index_file)], dtype=bool)
+        samples = {True: int(tags.sum()), False: int((~tags).sum())}
+
+    sample_count = samples[True] + samples[False]
+    file_count = counts[True] + counts[False]
+    return TileStoreStats(
+        positiveFiles=counts[True],
+        negativeFiles=counts[False],
+        totalBytes=total_bytes,
+        positiveSamples=samples[True],
+        negativeSamples=samples[False],
+        positiveRatio=samples[True] / sample_count if sample_count else 0.0,
+        bytesPerFile=total_bytes / file_count if file_count else 0.0,
+    )
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Projecting an extraction run
+# ##################################################################################################
+
+
+def readCameraImageSizes(
+    table: ImageTable, default_size: Union[model.Size2d, None] = None
+) -> list[Union[model.Size2d, None]]:
+    """The image size of each camera, from the header of the camera's first image
+    (or the default size if the image can't be read)
+    """
+    _, first_images = np.unique(table.camera, return_index=True)
+    sizes: list[Union[model.Size2d, None]] = []
+    for i in first_images.tolist():
+        try:
+            with pilImage.open(table.filePaths[i]) as image:
+                sizes.append(model.Size2d(*image.size))
+        except OSError:
+            sizes.append(default_size)
+    return sizes
+
+
+@dataclass(frozen=True)
+class TileCounts:
+    """The sub-images (tiles) an extraction run will tag, before any are sampled"""
+
+    pairs: int
+    tiles: int
+    positiveTiles: int
+
+    # The image pairs whose image size is unknown (so they aren't counted)
+    unsizedPairs: int
+
+    @property
+    def negativeTiles(self) -> int:
+        return self.tiles - self.positiveTiles
+
+
+def countExtractionTiles(
+    table: ImageTable,
+    config: ec.ExtractionConfig,
+    camera_sizes: Sequence[Union[model.Size2d, None]],
+) -> TileCounts:
+    """Count the tiles (and the positively tagged tiles) an extraction run will produce,
+    testing all the tiles of a camera against all of the camera's regions at once
+
+    Args:
+        table (ImageTable): The images
+        config (ec.ExtractionConfig): The extraction settings
+        camera_sizes (Sequence[Union[model.Size2d, None]]): The image size of each camera
+            (see `readCameraImageSizes`)
+
+    Returns:
+        TileCounts: The tile counts
+    """
+    pairs = tiles = positive_tiles = unsized_pairs = 0
+    for camera, image_size in enumerate(camera_sizes):
+        pair_images = np.flatnonzero((table.camera == camera) & table.isPair)
+        if image_size is None:
+            unsized_pairs += len(pair_images)
+            continue
+
+        levels = sir.getTilePyramid(
+            config.blockSize, image_size, config.tileStride, config.tileScales
+        )
+        pairs += len(pair_images)
+        tiles += len(pair_images) * sum(len(level.regions) for level in levels)
+
+        # The regions of the camera's image pairs (which are in increasing image order)
+        mask = np.isin(table.regionImage, pair_images)
+        region_image = table.regionImage[mask]
+        if len(region_image) == 0:
+            continue
+        regions = model.RegionArray(table.regions.boxes[mask])
+        image_starts = np.flatnonzero(np.r_[True, region_image[1:] != region_image[:-1]])
+
+        # A tile is positive if it touches any of its image's regions
+        for level in levels:
+            touching = model.RegionArray.fromRegions(level.regions).intersects(regions)
+            per_image = np.logical_or.reduceat(touching, image_starts, axis=1)
+            positive_tiles += int(per_image.sum())
+
+    return TileCounts(pairs, tiles, positive_tiles, unsized_pairs)
+
+
+@dataclass(frozen=True)
+class TileProjection:
+    """The projected output of an extraction run"""
+
+    counts: TileCounts
+
+    # The expected fraction of the negative tiles that are saved
+    negativeKeepRate: float
+
+    positiveFiles: int
+    negativeFiles: float
+    files: float
+
+    # The training samples (each positive tile is a sample for every augmentation)
+    positiveSamples: int
+    positiveRatio: float
+
+    bytesPerFile: float
+    bytes: float
+
+
+def projectExtraction(
+    counts: TileCounts,
+    config: ec.ExtractionConfig,
+    negative_keep_rate: Union[float, None] = None,
+    bytes_per_file: Union[float, None] = None,
+) -> TileProjection:
+    """Project the output of an extraction run
+
+    Args:
+        counts (TileCounts): The tiles the run will tag (see `countExtractionTiles`)
+        config (ec.ExtractionConfig): The extraction settings
+        negative_keep_rate (Union[float, None]): The expected fraction of the negative tiles
+            that are saved (e.g. measured from an earlier run).
+            Defaults to the uniform sample rate, or the mean keep rate of the motion sampling
+            policy (a rough guess, since it depends on how much the images change)
+        bytes_per_file (Union[float, None]): The average size of a saved sub-image
+            (e.g. measured from an earlier run), defaults to `DEFAULT_BYTES_PER_PIXEL`
+
+    Returns:
+        TileProjection: The projected output
+    """
+    policy = config.negativeSamplingPolicy
+    if negative_keep_rate is None:
+        negative_keep_rate = (
+            config.negativeSampleRate if policy is None else float(np.mean(policy.keepRates))
+        )
+    if bytes_per_file is None:
+        block_area = config.blockSize.width * config.blockSize.height
+        bytes_per_file = block_area * DEFAULT_BYTES_PER_PIXEL
+
+    samples_per_positive = 1 + len(augmentation.AUGMENTATIONS)
+    files_per_positive = samples_per_positive if config.augmentationMode == "files" else 1
+    positive_files = counts.positiveTiles * files_per_positive
+    positive_samples = counts.positiveTiles * samples_per_positive
+    negative_files = counts.negativeTiles * negative_keep_rate
+    files = positive_files + negative_files
+    samples = positive_samples + negative_files
+    return TileProjection(
+        counts=counts,
+        negativeKeepRate=negative_keep_rate,
+        positiveFiles=positive_files,
+        negativeFiles=negative_files,
+        files=files,
+        positiveSamples=positive_samples,
+        positiveRatio=positive_samples / samples if samples else 0.0,
+        bytesPerFile=bytes_per_file,
+        bytes=files * bytes_per_file,
+    )
+
+
+# endregion
+
+
+# ##################################################################################################
+# region The report
+# ##################################################################################################
+
+
+def createReport(
+    table: ImageTable,
+    config: ec.ExtractionConfig,
+    camera_sizes: Sequence[Union[model.Size2d, None]],
+    store: Union[TileStoreStats, None] = None,
+    negative_keep_rate: Union[float, None] = None,
+) -> dict[str, Any]:
+    """Create the full statistics report (as JSON data).
+    With an existing sub-image store (extracted from the same images), the projection uses
+    the store's measured negative keep rate and sub-image size.
+    """
+    counts = countExtractionTiles(table, config, camera_sizes)
+    bytes_per_file = None
+    if store is not None and store.negativeFiles + store.positiveFiles > 0:
+        bytes_per_file = store.bytesPerFile
+        if negative_keep_rate is None and counts.negativeTiles > 0:
+            negative_keep_rate = min(1.0, store.negativeFiles / counts.negativeTiles)
+    projection = projectExtraction(counts, config, negative_keep_rate, bytes_per_file)
+
+    return {
+        "images": len(table),
+        "tagged": int(table.tagged.sum()),
+        "cameras": [asdict(c) for c in calculateCameraStats(table)],
+        "groups": asdict(calculateGroupStats(table)),
+        "regionSizes": asdict(calculateRegionSizeStats(table)),
+        "tileStore": asdict(store) if store is not None else None,
+        "projection": asdict(projection),
+        "config": ec.configToJson(config),
+    }
+
+
+def formatReport(report: dict[str, Any]) -> str:
+    """A printable summary of the report"""
+    lines = [f"Images: {report['images']} ({report['tagged']} tagged)", ""]
+    lines.append(
+        f"{'camera':<40} {'images':>8} {'tagged':>8} {'groups':>8} {'pairs':>8} {'regions':>8}"
+    )
+    for c in report["cameras"]:
+        lines.append(
+            f"{c['camera'][-40:]:<40} {c['images']:>8} {c['tagged']:>8} "
+            f"{c['groups']:>8} {c['pairs']:>8} {c['regions']:>8}"
+        )
+
+    groups = report["groups"]
+    lines += [
+        "",
+        f"Groups: {groups['groups']} (mean size {groups['meanSize']:.1f}), "
+        f"{groups['taggedGroups']} with tagged images, "
+        f"{groups['taggedGroupStarts']} starting with a tagged image",
+        "Group sizes: " + _formatHistogram(groups["sizeBins"], groups["sizeCounts"]),
+    ]
+
+    regions = report["regionSizes"]
+    lines += [
+        "",
+        f"Regions: {regions['regions']}",
+        "Region max side: " + _formatHistogram(regions["bins"], regions["maxSideCounts"]),
+    ]
+
+    store = report["tileStore"]
+    if store is not None:
+        lines += [
+            "",
+            f"Sub-image store: {store['positiveFiles']} positive and "
+            f"{store['negativeFiles']} negative files ({store['totalBytes'] / 1e9:.2f} GB), "
+            f"{store['positiveRatio']:.1%} positive samples after augmentation",
+        ]
+
+    projection = report["projection"]
+    counts = projection["counts"]
+    lines += [
+        "",
+        f"Projected: {counts['pairs']} image pairs, {counts['tiles']} tiles "
+        f"({counts['positiveTiles']} positive)",
+        f"  {projection['files']:.0f} files ({projection['bytes'] / 1e9:.2f} GB) keeping "
+        f"{projection['negativeKeepRate']:.1%} of the negative tiles, "
+        f"{projection['positiveRatio']:.1%} positive samples after augmentation",
+    ]
+    if counts["unsizedPairs"]:
+        lines.append(f"  {counts['unsizedPairs']} image pairs skipped (unknown image size)")
+    return "\n".join(lines)
+
+
+def _formatHistogram(bins: list[Union[float, None]], counts: list[int]) -> str:
+    return ", ".join(
+        f"{lower:g}-{upper:g}: {count}" if upper is not None else f"{lower:g}+: {count}"
+        for lower, upper, count in zip(bins, bins[1:], counts)
+    )
+
+
+# endregion
+
+
+def parseArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report the statistics of the images data set and the sub-image store"
+    )
+    parser.add_argument("images", help="The images `.json` data file (e.g. animals.json)")
+    parser.add_argument("--tiles", help="An extracted sub-image store (output folder)")
+    parser.add_argument(
+        "--config", help="The `.json` extraction configuration to project the output for"
+    )
+    parser.add_argument(
+        "--image-size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The image size to use when a camera's images can't be read",
+    )
+    parser.add_argument(
+        "--negative-keep-rate",
+        type=float,
+        help="The expected fraction of the negative sub-images that are saved",
+    )
+    parser.add_argument("--json", help="Also save the full report to this `.json` file")
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+
+    # The extraction settings default to the extraction module's settings
+    config = extraction.current_config()
+    if args.config:
+        config = ec.loadExtractionConfig(args.config, config)
+
+    table = createImageTable(ds.loadImagesCollectionFromJson(args.images).images)
+    default_size = model.Size2d(*args.image_size) if args.image_size else None
+    camera_sizes = readCameraImageSizes(table, default_size)
+    store = calculateTileStoreStats(args.tiles) if args.tiles else None
+
+    report = createReport(table, config, camera_sizes, store, args.negative_keep_rate)
+    print(formatReport(report))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Contains the configuration of a `training_sub_image_extraction` run,
+which can be saved to (and loaded from) a `.json` file, so that a sweep of extraction settings
+can be run without editing the extraction module.
+
+In the `.json` file every setting is optional - any missing setting keeps its current value,
+for example:
+
+    {
+        "outDir": "/data/nrsi/tiles_448",
+        "blockSize": [448, 448],
+        "negativeSamplingPolicy": null,
+        "negativeSampleRate": 0.1,
+        "workers": 8,
+        "seed": 1234
+    }
+"""
+from dataclasses import asdict, dataclass, fields, replace
+import json
+from typing import Any, Type, TypeVar, Union
+
+from src import frame_gate as fg
+from src import hard_negative_mining as hnm
+from src import model
+from src import tile_motion as tm
+
+# The file name of the run manifest, saved in the top-level output folder
+RUN_MANIFEST_FILE_NAME = "__extraction_run.json"
+
+_Policy = TypeVar("_Policy")
+
+
+@dataclass(frozen=True)
+class ExtractionConfig:
+    """The settings of a sub-image extraction run
+    (see the settings at the top of `training_sub_image_extraction` for what each one does)
+    """
+
+    # The output folder for the sub-images
+    outDir: str
+
+    # The images `.json` data file with the tagged regions
+    imagesFile: str
+
+    blockSize: model.Size2d
+    tileStride: Union[model.Size2d, None]
+    tileScales: tuple[float, ...]
+    negativeSampleRate: float
+    negativeSamplingPolicy: Union[tm.NegativeSamplingPolicy, None]
+    stabiliseImages: bool
+    augmentationMode: str
+    subImageBackend: str
+    subImageJpegQuality: int
+
+    # The number of pipeline worker processes (0 to extract in the main process)
+    workers: int
+
+    # The seed for the negative sampling (None for a different sample every run)
+    seed: Union[int, None]
+
+    profile: bool
+
+    # The frame level change gate (None to tile every image pair)
+    frameGate: Union[fg.FrameGatePolicy, None] = None
+
+    # Which negative sub-images are kept when they're mined with the `miningModel`
+    # (None to sample the negative sub-images without a model)
+    hardNegativeMining: Union[hnm.HardNegativePolicy, None] = None
+    miningModel: Union[str, None] = None
+
+    # "full" to decode the whole images, or "crop" to only decode the saved sub-images
+    decodeMode: str = "full"
+
+
+def configToJson(config: ExtractionConfig) -> dict[str, Any]:
+    """Convert the configuration into plain JSON data"""
+    data = {f.name: getattr(config, f.name) for f in fields(config)}
+    data["blockSize"] = [config.blockSize.width, config.blockSize.height]
+    if config.tileStride is not None:
+        data["tileStride"] = [config.tileStride.width, config.tileStride.height]
+    data["tileScales"] = list(config.tileScales)
+    if config.negativeSamplingPolicy is not None:
+        data["negativeSamplingPolicy"] = asdict(config.negativeSamplingPolicy)
+    if config.frameGate is not None:
+        data["frameGate"] = asdict(config.frameGate)
+    if config.hardNegativeMining is not None:
+        data["hardNegativeMining"] = asdict(config.hardNegativeMining)
+    return data
+
+
+def _policyFromJson(name: str, policy_type: Type[_Policy], data: Any) -> _Policy:
+    """Create a policy setting from its JSON object (any missing field keeps its default)
+
+    Raises:
+        ValueError: If the JSON isn't an object, has an unknown field, or an invalid value
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"{name} must be a JSON object, not {data!r}")
+    names = {f.name for f in fields(policy_type)}  # type: ignore
+    unknown = sorted(set(data) - names)
+    if unknown:
+        raise ValueError(f"Unknown {name} settings: {', '.join(unknown)}")
+    values = {k: tuple(v) if isinstance(v, list) else v for k, v in data.items()}
+    try:
+        return policy_type(**values)
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid {name} settings: {error}") from error
+
+
+def configFromJson(data: dict[str, Any], base: ExtractionConfig) -> ExtractionConfig:
+    """Update the base configuration with the settings in the JSON data
+
+    Args:
+        data (dict[str, Any]): The (possibly partial) JSON configuration
+        base (ExtractionConfig): The configuration that provides any missing settings
+
+    Raises:
+        ValueError: If the JSON data contains an unknown setting (including the settings of
+            the policies), or a policy with an invalid value
+
+    Returns:
+        ExtractionConfig: The updated configuration
+    """
+    names = {f.name for f in fields(ExtractionConfig)}
+    unknown = sorted(set(data) - names)
+    if unknown:
+        raise ValueError(f"Unknown extraction settings: {', '.join(unknown)}")
+
+    values = dict(data)
+    if "blockSize" in values:
+        values["blockSize"] = model.Size2d(*values["blockSize"])
+    if values.get("tileStride") is not None:
+        values["tileStride"] = model.Size2d(*values["tileStride"])
+    if "tileScales" in values:
+        values["tileScales"] = tuple(float(s) for s in values["tileScales"])
+    policy_types = {
+        "negativeSamplingPolicy": tm.NegativeSamplingPolicy,
+        "frameGate": fg.FrameGatePolicy,
+        "hardNegativeMining": hnm.HardNegativePolicy,
+    }
+    for name, policy_type in policy_types.items():
+        if values.get(name) is not None:
+            values[name] = _policyFromJson(name, policy_type, values[name])
+    return replace(base, **values)
+
+
+def validateConfig(config: ExtractionConfig) -> None:
+    """Check that every setting of the configuration has a usable value
+
+    Raises:
+        ValueError: If any setting is invalid (listing every invalid setting)
+    """
+    errors: list[str] = []
+    if config.blockSize.width <= 0 or config.blockSize.height <= 0:
+        errors.append(f"blockSize must be positive, not {config.blockSize}")
+    stride = config.tileStride
+    if stride is not None and (stride.width <= 0 or stride.height <= 0):
+        errors.append(f"tileStride must be positive, not {stride}")
+    if len(config.tileScales) == 0 or any(s <= 0 for s in config.tileScales):
+        errors.append(f"tileScales must be positive scales, not {config.tileScales}")
+    elif list(config.tileScales) != sorted(config.tileScales, reverse=True):
+        errors.append(f"tileScales must be largest first, not {config.tileScales}")
+    if not 0.0 <= config.negativeSampleRate <= 1.0:
+        errors.append(
+            f"negativeSampleRate must be from 0 to 1, not {config.negativeSampleRate}"
+        )
+    if config.augmentationMode not in ("files", "index"):
+        errors.append(
+            f"augmentationMode must be 'files' or 'index', not {config.augmentationMode!r}"
+        )
+    if config.subImageBackend not in ("pil", "cv2"):
+        errors.append(
+            f"subImageBackend must be 'pil' or 'cv2', not {config.subImageBackend!r}"
+        )
+    if not 1 <= config.subImageJpegQuality <= 100:
+        errors.append(
+            f"subImageJpegQuality must be from 1 to 100, not {config.subImageJpegQuality}"
+        )
+    if config.workers < 0:
+        errors.append(f"workers must be 0 or more, not {config.workers}")
+    if config.hardNegativeMining is not None and not config.miningModel:
+        errors.append("hardNegativeMining needs a miningModel to mine with")
+    if config.decodeMode not in ("full", "crop"):
+        errors.append(f"decodeMode must be 'full' or 'crop', not {config.decodeMode!r}")
+    if errors:
+        raise ValueError("Invalid extraction settings:\n    " + "\n    ".join(errors))
+
+
+def loadExtractionConfig(file_name: str, base: ExtractionConfig) -> ExtractionConfig:
+    """Load the (possibly partial) configuration from a `.json` file
+    (any setting missing from the file keeps its value from the base configuration)
+    """
+    with open(file_name, "rt") as f:
+        return configFromJson(json.load(f), base)
+
+
+def saveExtractionConfig(file_name: str, config: ExtractionConfig) -> None:
+    """Save the full configuration to a `.json` file (which can be loaded again)"""
+    with open(file_name, "w") as f:
+        json.dump(configToJson(config), f, indent=2)
@@ -0,0 +1,161 @@
+"""
+Contains the manifest used by `training_sub_image_extraction` to skip re-extracting
+image pairs that have not changed since the last run.
+
+For every (previous, current) image pair the manifest records a hash of the input file paths,
+their modification times, the tagged regions and the extraction parameters,
+along with the list of sub-image (tile) files that were produced for that pair
+(and the model scores of any hard negative sub-images, see `hard_negative_mining.py`).
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from src import model
+
+# The file name of the manifest, saved in the top-level output folder
+MANIFEST_FILE_NAME = "__extraction_manifest.json"
+
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """The record of a single processed image pair"""
+
+    key: str
+    tiles: list[str]
+
+    # The model scores of the mined (hard negative) sub-images
+    scores: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class ExtractionManifest:
+    """All of the image pairs processed into an output folder,
+    keyed by the file path of the current (second) image in the pair
+    """
+
+    entries: dict[str, ManifestEntry] = field(default_factory=dict)
+
+    def isUnchanged(self, pair_id: str, key: str) -> bool:
+        """Determines if the given image pair was already extracted with the exact same inputs"""
+        entry = self.entries.get(pair_id)
+        return entry is not None and entry.key == key
+
+    def allTiles(self) -> set[str]:
+        """The set of every tile file path referenced by this manifest"""
+        return {tile for entry in self.entries.values() for tile in entry.tiles}
+
+    def allScores(self) -> dict[str, float]:
+        """The model score of every scored tile file path referenced by this manifest"""
+        return {
+            tile: score
+            for entry in self.entries.values()
+            for tile, score in entry.scores.items()
+        }
+
+
+def fileModifiedTime(file_path: str) -> int:
+    """The modification time of the given file in nanoseconds (or -1 if it doesn't exist)"""
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def createPairKey(
+    previous_image: model.ImageInfo,
+    current_image: model.ImageInfo,
+    parameters: dict[str, Any],
+) -> str:
+    """Create the hash that identifies the inputs used to extract the tiles of an image pair.
+
+    Args:
+        previous_image (model.ImageInfo): The first image in the pair (the one subtracted)
+        current_image (model.ImageInfo): The second image in the pair (the one being tagged)
+        parameters (dict[str, Any]): The extraction parameters (block size, sample rates, etc.)
+            which must be JSON serializable
+
+    Returns:
+        str: A hex digest that changes if any of the inputs change
+    """
+    data = {
+        "previous": previous_image.filePath,
+        "previousModified": fileModifiedTime(previous_image.filePath),
+        "current": current_image.filePath,
+        "currentModified": fileModifiedTime(current_image.filePath),
+        "regions": [
+            [r.x, r.y, r.w, r.h] for r in model.confirmedRegions(current_image.regions)
+        ],
+        "parameters": parameters,
+    }
+    encoded = json.dumps(data, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def loadManifest(file_name: str) -> ExtractionManifest:
+    """Load the manifest from the given file (returning an empty manifest if there isn't one)"""
+    if not os.path.isfile(file_name):
+        return ExtractionManifest()
+
+    with open(file_name, "rt") as f:
+        data = json.load(f)
+
+    entries = {
+        pair_id: ManifestEntry(
+            key=entry["key"], tiles=entry["tiles"], scores=entry.get("scores", {})
+        )
+        for pair_id, entry in data["entries"].items()
+    }
+    return ExtractionManifest(entries)
+
+
+def saveManifest(file_name: str, manifest: ExtractionManifest) -> None:
+    """Save the manifest to the given file.
+    The manifest is written to a temporary file first, so that an interrupted save
+    never leaves behind a corrupt manifest.
+    """
+    assert file_name
+    data = {
+        "entries": {
+            pair_id: _entryToJson(entry) for pair_id, entry in manifest.entries.items()
+        }
+    }
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(temp_file_name, file_name)
+
+
+def _entryToJson(entry: ManifestEntry) -> dict[str, Any]:
+    data: dict[str, Any] = {"key": entry.key, "tiles": entry.tiles}
+    if entry.scores:
+        data["scores"] = entry.scores
+    return data
+
+
+def findStaleTiles(
+    previous: ExtractionManifest, current: ExtractionManifest
+) -> Iterable[str]:
+    """Find the tiles that were produced by a previous run, but are no longer produced
+    (either because their image pair changed, or was removed from the input altogether)
+    """
+    live_tiles = current.allTiles()
+    for tile in previous.allTiles():
+        if tile not in live_tiles:
+            yield tile
+
+
+def deleteStaleTiles(
+    previous: ExtractionManifest, current: ExtractionManifest
+) -> int:
+    """Delete the tiles that are no longer produced, returning the number of deleted files"""
+    count = 0
+    for tile in findStaleTiles(previous, current):
+        try:
+            os.remove(tile)
+            count += 1
+        except FileNotFoundError:
+            pass
+    return count
@@ -1,11 +1,47 @@
 import gc
+import os
 import torch  # For memory clean-up
 from pathlib import Path
 
 from fastai.vision.all import *
 
+from src import cpu_training as cpu
+from src import model_export
+from src import streaming_dataset
+from src import tile_dataset
+from src import tile_index as ti
+from src import training_sub_image_extraction as extraction
+
 in_path: str = r"d:\data\NRSI\__ai_training_images"
 
+# The tile index written by `training_sub_image_extraction`
+# When it exists we train from it, so that the positive sub-images can be augmented on the fly
+# (see `AUGMENTATION_MODE` in `training_sub_image_extraction`)
+tile_index_file: str = os.path.join(in_path, ti.TILE_INDEX_FILE_NAME)
+
+# Set to train on the CPU (see `cpu_training`), rather than on a CUDA GPU
+cpu_training: bool = not torch.cuda.is_available()
+cpu_settings = cpu.CpuTrainingConfig()
+
+# The batch size defaults to 64 - but 32 fixes the `RuntimeError: CUDA out of memory.` on the GPU
+batch_size: int = cpu_settings.batchSize if cpu_training else 32
+
+# Where the trained model is exported for inference: the fastai learner (`learn.export()`), and
+# the standalone model that loads without fastai (a `.pt` TorchScript or `.onnx` model,
+# see `model_export`), optionally with its weights quantized to 8-bit integers
+learner_file: str = os.path.join(in_path, "model.pkl")
+export_file: str = os.path.join(in_path, "model.pt")
+quantize_export: bool = False
+
+# Set to train on sub-images streamed straight from the original images (see `streaming_dataset`),
+# cut with the extraction settings of `training_sub_image_extraction`, so there's no need to run
+# the extraction first
+stream_images: bool = False
+
+# The data loader worker processes that decode and tile the streamed images
+stream_workers: int = 4
+
+
 def image_test(image_path: Path) -> bool:
     """Determine if the given image path is in the "true" folder,
     so the training / fine-tuning algorithm can learn from it.
@@ -21,22 +57,134 @@ def image_test(image_path: Path) -> bool:
     return "true" in image_path.parts
 
 
-# See: https://docs.fast.ai/vision.data.html#ImageDataLoaders.from_path_func
-data_loader = ImageDataLoaders.from_path_func(
-    path=in_path,
-    fnames=get_image_files(in_path),
-    valid_pct=0.2,
-    seed=42,
-    label_func=image_test,
-    item_tfms=Resize(224),
-    bs=32,  # Batch Size defaults to 64 - but 32 fixes the `RuntimeError: CUDA out of memory.`
-)
+def source_tile_path(image_path: Path) -> Path:
+    """The sub-image that the given (possibly augmented) sub-image was created from,
+    by removing the augmentation suffix from its file name
+    """
+    return Path(ti.sourceTilePath(str(image_path)))
+
+
+def source_tile_splitter(valid_pct: float = 0.2, seed: int = 42) -> Callable:
+    """A fastai splitter that randomly splits the sub-image files by their source sub-image,
+    so that the augmented copies of a sub-image are never split between the training and
+    validation sets
+    """
+
+    def _inner(items: list[Path]) -> tuple[list[int], list[int]]:
+        sources = [source_tile_path(Path(i)) for i in items]
+        unique_sources = sorted(set(sources))
+        rng = np.random.default_rng(seed)
+        valid_count = int(len(unique_sources) * valid_pct)
+        valid_indexes = rng.choice(len(unique_sources), size=valid_count, replace=False)
+        valid_sources = {unique_sources[i] for i in valid_indexes.tolist()}
+        train = [i for i, s in enumerate(sources) if s not in valid_sources]
+        valid = [i for i, s in enumerate(sources) if s in valid_sources]
+        return (train, valid)
+
+    return _inner
+
+
+def create_folder_data_loaders() -> DataLoaders:
+    """Create the data loaders by walking the `true`/`false` sub-image folders"""
+    # See: https://docs.fast.ai/vision.data.html#ImageDataLoaders.from_path_func
+    # (which splits per file - so the augmented copies of a sub-image would leak into the
+    # validation set)
+    data_block = DataBlock(
+        blocks=(ImageBlock, CategoryBlock),
+        splitter=source_tile_splitter(valid_pct=0.2, seed=42),
+        get_y=image_test,
+        item_tfms=Resize(224),
+    )
+    return ImageDataLoaders.from_dblock(
+        data_block, get_image_files(in_path), path=in_path, bs=batch_size
+    )
+
+
+def create_tile_batch(samples: list[Any]) -> tuple[TensorImage, TensorCategory]:
+    """Collate the tile index samples into a fastai typed batch
+    (applying each sample's rotation/flip to the whole batch at once)
+    """
+    images, labels = tile_dataset.collateTiles(samples)
+    return (TensorImage(images), TensorCategory(labels))
+
+
+def create_tile_index_data_loaders() -> DataLoaders:
+    """Create the data loaders from the tile index"""
+    train_ds, valid_ds = tile_dataset.loadTileIndexDatasets(
+        tile_index_file, valid_pct=0.2, seed=42
+    )
+    train = DataLoader(
+        train_ds, bs=batch_size, shuffle=True, drop_last=True, create_batch=create_tile_batch
+    )
+    valid = DataLoader(valid_ds, bs=batch_size, create_batch=create_tile_batch)
+    return DataLoaders(train, valid)
+
+
+def create_streaming_batch(
+    batch: tuple[torch.Tensor, torch.Tensor]
+) -> tuple[TensorImage, TensorCategory]:
+    """Type the (already collated) streamed batch for fastai"""
+    images, labels = batch
+    return (TensorImage(images), TensorCategory(labels))
+
+
+def create_streaming_data_loaders() -> DataLoaders:
+    """Create the data loaders that stream the sub-images from the original images"""
+    config = extraction.current_config()
+    train_ds, valid_ds = streaming_dataset.loadStreamingDatasets(
+        config.imagesFile, config, valid_pct=0.2, seed=42, batch_size=batch_size
+    )
+
+    # The datasets return whole batches, so one epoch is roughly one pass over the positives.
+    # Workers without an image pair to stream would cut the epochs short
+    train = DataLoader(
+        train_ds,
+        bs=None,
+        n=train_ds.estimateBatchCount(),
+        num_workers=min(stream_workers, train_ds.pairCount),
+        create_batch=create_streaming_batch,
+    )
+    valid = DataLoader(
+        valid_ds,
+        bs=None,
+        n=valid_ds.estimateBatchCount(),
+        num_workers=min(stream_workers, valid_ds.pairCount),
+        create_batch=create_streaming_batch,
+    )
+    return DataLoaders(train, valid)
+
 
 if __name__ == "__main__":
-    # Clean up the GPU memory
-    gc.collect()
-    torch.cuda.empty_cache()
+    if stream_images:
+        data_loader = create_streaming_data_loaders()
+    elif os.path.isfile(tile_index_file):
+        data_loader = create_tile_index_data_loaders()
+    else:
+        data_loader = create_folder_data_loaders()
+
+    if cpu_training:
+        cpu.configureCpuTraining(cpu_settings)
+        cpu.tuneDataLoaders(data_loader, cpu_settings)
+    else:
+        # Clean up the GPU memory
+        gc.collect()
+        torch.cuda.empty_cache()
 
     # Try and learn
-    learn = cnn_learner(data_loader, resnet34, metrics=error_rate)
-    learn.fine_tune(1)
+    learn = cnn_learner(
+        data_loader,
+        cpu.BACKBONES[cpu_settings.backbone] if cpu_training else resnet34,
+        n_out=2,
+        loss_func=CrossEntropyLossFlat(),
+        metrics=error_rate,
+    )
+    if cpu_training:
+        cpu.prepareLearner(learn, cpu_settings)
+        cpu.fineTune(learn, 1, cpu_settings)
+    else:
+        learn.fine_tune(1)
+
+    # Export the trained model for inference
+    learn.export(learner_file)
+    model_export.exportModel(learn.model, export_file, quantize_export)
+    print(f"Exported: {learner_file} and {export_file}")
@@ -0,0 +1,163 @@
+"""
+A cheap frame level change gate, run on an image pair before it is tiled (and before its
+sub-images are encoded, or run through the classifier).
+
+Most of the camera bursts are triggered by the wind or by changing light, so nothing in the
+frame has actually changed. The gate decodes both images heavily downscaled in grayscale
+(libjpeg decodes straight to 1/8 size, see `image_stabalization.loadReducedGrayImage`),
+evens out any overall change in brightness, and scores the frame by its most changed cell.
+Only the frames whose score reaches the threshold are tiled.
+
+Tagged frames always pass the gate, so the gate never loses a positive sub-image.
+"""
+from dataclasses import asdict, dataclass
+import time
+from typing import Any, Union
+
+import cv2
+import numpy as np
+
+from src import image_stabalization as stab
+from src import model
+
+
+@dataclass(frozen=True)
+class FrameGatePolicy:
+    """When a frame passes the gate
+
+    The images are halved `levels` times (3 is 1/8 size), blurred to hide small camera sway,
+    and split into cells of `cellSize` pixels (at the reduced size - 28 pixels at 1/8 size is
+    a 224 pixel sub-image). A frame passes when the mean absolute difference of any cell
+    (0 to 255) is at least the `threshold`.
+    """
+
+    threshold: float = 6.0
+    levels: int = 3
+    cellSize: int = 28
+    blurSize: int = 5
+
+    def __post_init__(self):
+        if self.threshold < 0:
+            raise ValueError(f"The threshold must be 0 or more, not {self.threshold}")
+        if self.levels < 0:
+            raise ValueError(f"The levels must be 0 or more, not {self.levels}")
+        if self.cellSize <= 0:
+            raise ValueError(f"The cell size must be positive, not {self.cellSize}")
+        if self.blurSize <= 0 or self.blurSize % 2 != 1:
+            raise ValueError(
+                f"The blur size must be a positive odd number, not {self.blurSize}"
+            )
+
+
+def loadGateImage(file_path: str, policy: FrameGatePolicy) -> Union[np.ndarray, None]:
+    """Load the reduced size, blurred, grayscale image the gate compares"""
+    image = stab.loadReducedGrayImage(file_path, policy.levels)
+    if image is None:
+        return None
+    return cv2.GaussianBlur(image, (policy.blurSize, policy.blurSize), 0)
+
+
+def calculateFrameChangeScore(
+    previous_image: np.ndarray, current_image: np.ndarray, cell_size: int
+) -> float:
+    """Calculate the mean absolute difference of the most changed cell of the two
+    (grayscale) images, after scaling the previous image to the current image's brightness
+
+    Returns:
+        float: The change score (0 to 255)
+    """
+    previous = previous_image.astype(np.float32)
+    current = current_image.astype(np.float32)
+    previous *= current.mean() / max(float(previous.mean()), 1.0)
+    diff = cv2.absdiff(current, previous)
+
+    height, width = diff.shape[0], diff.shape[1]
+    cells = (max(1, round(width / cell_size)), max(1, round(height / cell_size)))
+    cell_means = cv2.resize(diff, cells, interpolation=cv2.INTER_AREA)
+    return float(cell_means.max())
+
+
+@dataclass
+class FrameGateStats:
+    """The frames seen by a frame gate"""
+
+    frames: int = 0
+    passed: int = 0
+
+    # The passed frames that weren't scored, because they were tagged
+    tagged: int = 0
+
+    # The time spent scoring the frames
+    seconds: float = 0.0
+
+    @property
+    def skipped(self) -> int:
+        return self.frames - self.passed
+
+    @property
+    def skippedFraction(self) -> float:
+        return self.skipped / self.frames if self.frames > 0 else 0.0
+
+    def toJson(self) -> dict[str, Any]:
+        return {**asdict(self), "skipped": self.skipped}
+
+
+class FrameGate:
+    """Decides which frames (image pairs) are worth tiling, and counts the skipped frames.
+    The reduced previous image is remembered, so consecutive pairs only load one new image.
+    """
+
+    def __init__(self, policy: FrameGatePolicy):
+        self._policy = policy
+        self._file_path: Union[str, None] = None
+        self._image: Union[np.ndarray, None] = None
+        self.stats = FrameGateStats()
+
+    @property
+    def policy(self) -> FrameGatePolicy:
+        return self._policy
+
+    def _load(self, file_path: str) -> Union[np.ndarray, None]:
+        if file_path != self._file_path:
+            self._image = loadGateImage(file_path, self._policy)
+            self._file_path = file_path
+        return self._image
+
+    def score(self, previous_path: str, current_path: str) -> Union[float, None]:
+        """The frame's change score (or None if the images can't be compared)"""
+        previous_image = self._load(previous_path)
+        current_image = self._load(current_path)
+        if (
+            previous_image is None
+            or current_image is None
+            or previous_image.shape != current_image.shape
+        ):
+            return None
+        return calculateFrameChangeScore(
+            previous_image, current_image, self._policy.cellSize
+        )
+
+    def passes(self, previous_info: model.ImageInfo, image_info: model.ImageInfo) -> bool:
+        """Determines if the frame changed enough to be tiled
+        (tagged frames, and frames that can't be compared, always pass)
+        """
+        self.stats.frames += 1
+        if image_info.tagged or len(model.confirmedRegions(image_info.regions)) > 0:
+            self.stats.passed += 1
+            self.stats.tagged += 1
+            return True
+
+        start_time = time.perf_counter()
+        score = self.score(previous_info.filePath, image_info.filePath)
+        self.stats.seconds += time.perf_counter() - start_time
+
+        passed = score is None or score >= self._policy.threshold
+        self.stats.passed += int(passed)
+        return passed
+
+    def summary(self) -> str:
+        """A one line summary of the frames the gate skipped"""
+        return (
+            f"Frame gate skipped {self.stats.skipped} of {self.stats.frames} frames "
+            f"({self.stats.skippedFraction:.1%}) in {self.stats.seconds:.1f}s"
+        )
@@ -0,0 +1,174 @@
+"""
+Hard negative mining: choosing the negative sub-images to train on by how wrong the current model
+is about them, rather than uniformly at random (or by their motion, see `tile_motion.py`).
+
+Most of the negative sub-images are empty ground that any trained model already scores close to 0,
+so sampling them uniformly floods the training set with easy examples. When mining, every
+negative sub-image of an image pair is scored by the current model (in batches), and only the
+highest scoring false positives are kept, along with a small random remainder of the rest
+(so the model still sees some ordinary background).
+
+The kept sub-images are saved by `training_sub_image_extraction` with their scores,
+which are recorded in the extraction manifest and the tile index.
+"""
+from dataclasses import asdict, dataclass
+import time
+from typing import Any
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class HardNegativePolicy:
+    """Which of an image pair's negative sub-images are kept
+
+    The negative sub-images that score at least `minScore` are false positives, and the
+    `maxPerPair` highest scoring of those are kept. Each of the other negative sub-images is
+    kept with a chance of `randomRate`. The sub-images are scored `batchSize` at a time.
+    """
+
+    minScore: float = 0.5
+    maxPerPair: int = 16
+    randomRate: float = 0.01
+    batchSize: int = 64
+
+    def __post_init__(self):
+        if not 0.0 <= self.minScore <= 1.0:
+            raise ValueError(
+                f"The minimum score must be from 0 to 1, not {self.minScore}"
+            )
+        if self.maxPerPair < 0:
+            raise ValueError(
+                f"The maximum per pair must be 0 or more, not {self.maxPerPair}"
+            )
+        if not 0.0 <= self.randomRate <= 1.0:
+            raise ValueError(
+                f"The random rate must be from 0 to 1, not {self.randomRate}"
+            )
+        if self.batchSize <= 0:
+            raise ValueError(f"The batch size must be positive, not {self.batchSize}")
+
+
+def scoreTiles(classifier: Any, tiles: np.ndarray, batch_size: int) -> np.ndarray:
+    """Score the NxHxWxC uint8 sub-images with a `tile_classifier.TileClassifier`,
+    `batch_size` at a time
+
+    Returns:
+        np.ndarray: The probability that each sub-image contains an animal
+    """
+    scores = [
+        classifier.predict(tiles[start : start + batch_size])
+        for start in range(0, len(tiles), batch_size)
+    ]
+    if len(scores) == 0:
+        return np.zeros(0, dtype=np.float32)
+    return np.concatenate(scores)
+
+
+def selectHardNegatives(
+    scores: np.ndarray, policy: HardNegativePolicy, rng: np.random.Generator
+) -> tuple[np.ndarray, np.ndarray]:
+    """Choose the negative sub-images to keep from their model scores
+
+    Args:
+        scores (np.ndarray): The model score of each negative sub-image
+        policy (HardNegativePolicy): How many of the sub-images to keep
+        rng (np.random.Generator): The random number generator for the random remainder
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Which sub-images are kept because they are hard
+            (top-scoring false positives), and which are kept at random
+    """
+    hard = np.zeros(len(scores), dtype=bool)
+    candidates = np.flatnonzero(scores >= policy.minScore)
+    if len(candidates) > 0 and policy.maxPerPair > 0:
+        # The highest scores first (a stable sort, so ties keep the sub-image order)
+        order = np.argsort(-scores[candidates], kind="stable")
+        hard[candidates[order[: policy.maxPerPair]]] = True
+
+    random = ~hard & (rng.random(len(scores)) < policy.randomRate)
+    return (hard, random)
+
+
+@dataclass
+class MiningStats:
+    """The negative sub-images seen while mining"""
+
+    scored: int = 0
+    hard: int = 0
+    random: int = 0
+
+    # The time spent scoring the sub-images
+    seconds: float = 0.0
+
+    def add(self, other: "MiningStats") -> None:
+        """Add the counts (e.g. from another process) to these counts"""
+        self.scored += other.scored
+        self.hard += other.hard
+        self.random += other.random
+        self.seconds += other.seconds
+
+    @property
+    def kept(self) -> int:
+        return self.hard + self.random
+
+    @property
+    def keptFraction(self) -> float:
+        return self.kept / self.scored if self.scored > 0 else 0.0
+
+    def toJson(self) -> dict[str, Any]:
+        return {**asdict(self), "kept": self.kept}
+
+    def summary(self) -> str:
+        """A one line summary of the mined sub-images"""
+        return (
+            f"Hard negative mining kept {self.hard} hard and {self.random} random "
+            f"of {self.scored} negative sub-images ({self.keptFraction:.1%}) "
+            f"in {self.seconds:.1f}s"
+        )
+
+
+class HardNegativeMiner:
+    """Scores the negative sub-images of each image pair with the current model,
+    and chooses which of them to keep
+    """
+
+    def __init__(self, classifier: Any, policy: HardNegativePolicy):
+        self._classifier = classifier
+        self._policy = policy
+        self.stats = MiningStats()
+
+    @property
+    def policy(self) -> HardNegativePolicy:
+        return self._policy
+
+    def mine(
+        self, tiles: np.ndarray, rng: np.random.Generator
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Score an image pair's negative sub-images, and choose which of them to keep
+
+        Args:
+            tiles (np.ndarray): The NxHxWxC uint8 negative sub-images (image differences)
+            rng (np.random.Generator): The random number generator for the random remainder
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Which sub-images are kept, and the score of each
+        """
+        start_time = time.perf_counter()
+        scores = scoreTiles(self._classifier, tiles, self._policy.batchSize)
+        self.stats.seconds += time.perf_counter() - start_time
+
+        hard, random = selectHardNegatives(scores, self._policy, rng)
+        self.stats.scored += len(scores)
+        self.stats.hard += int(hard.sum())
+        self.stats.random += int(random.sum())
+        return (hard | random, scores)
+
+
+def loadMiner(model_file: str, policy: HardNegativePolicy) -> HardNegativeMiner:
+    """Load the model to mine with (any model `tile_classifier.loadClassifier` can load).
+    PyTorch is only imported when the miner is loaded, so extracting without mining doesn't need it.
+    """
+    from src import tile_classifier as tc
+
+    return HardNegativeMiner(tc.loadClassifier(model_file), policy)
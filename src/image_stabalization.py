@@ -1,63 +1,344 @@
-# See: https://learnopencv.com/video-stabilization-using-point-feature-matching-in-opencv/
+"""
+Image stabilisation for groups (bursts) of camera images.
+
+The outdoor cameras sway in the wind, so consecutive images are often slightly shifted and
+rotated, which creates huge (false) differences when the previous image is subtracted from
+the current image.  This module estimates the rigid (rotation, translation and uniform scale)
+transform between consecutive images, so that the previous image can be warped to line up with
+the current image before subtracting.
+
+The transform is estimated on a downscaled grayscale version of the images (which is much faster,
+and plenty accurate for whole-image motion) and then scaled back up to full resolution.
+When estimating the transforms for a whole group of images, the points tracked into each image
+are re-used as the starting points for the next image (rather than detecting new feature
+points in every image), and new points are only detected when too few points survive.
+
+Based on:
+    https://learnopencv.com/video-stabilization-using-point-feature-matching-in-opencv/
+but using `cv2.estimateAffinePartial2D` (`cv2.estimateRigidTransform` was removed in OpenCV 4).
+"""
+import json
+import os
+from typing import Any, Union
 
-# Import numpy and OpenCV
-import numpy as np
 import cv2
+import numpy as np
+
+from src import model
+
+# The number of times the images are halved in size before estimating the transform
+# (2 levels is 1/4 of the full image width and height)
+DEFAULT_PYRAMID_LEVELS = 2
 
+# The minimum number of tracked points required to trust an estimated transform
+MIN_TRACKED_POINTS = 10
 
-# Pre-define transformation-store array
-transforms = np.zeros((n_frames - 1, 3), np.float32)
+# When re-using the tracked points as the next image's starting points, new feature points are
+# detected once fewer than this many points survive
+MIN_SEED_POINTS = 50
 
-for i in range(n_frames - 2):
-    # Detect feature points in previous frame
-    prev_pts = cv2.goodFeaturesToTrack(
-        prev_gray, maxCorners=200, qualityLevel=0.01, minDistance=30, blockSize=3
+# The file name of the transform cache, saved in the top-level output folder
+TRANSFORM_CACHE_FILE_NAME = "__stabilisation_transforms.json"
+
+
+def createGrayPyramidLevel(image: Any, levels: int) -> np.ndarray:
+    """Convert the image to grayscale and halve its size `levels` times"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    for _ in range(levels):
+        gray = cv2.pyrDown(gray)
+    return gray
+
+
+def detectFeatures(gray: np.ndarray) -> Union[np.ndarray, None]:
+    """Detect the feature points (corners) to track in the given grayscale image
+    (the minimum distance between points is relative to the image size,
+    so that the points are just as spread out on any pyramid level)
+    """
+    min_distance = max(5, gray.shape[1] // 64)
+    return cv2.goodFeaturesToTrack(
+        gray, maxCorners=200, qualityLevel=0.01, minDistance=min_distance, blockSize=3
     )
 
-    # Read next frame
-    success, curr = cap.read()
-    if not success:
-        break
 
-    # Convert to grayscale
-    curr_gray = cv2.cvtColor(curr, cv2.COLOR_BGR2GRAY)
+def trackTransform(
+    previous_gray: np.ndarray,
+    current_gray: np.ndarray,
+    previous_points: Union[np.ndarray, None] = None,
+) -> tuple[Union[np.ndarray, None], Union[np.ndarray, None]]:
+    """Estimate the rigid transform that maps points in the previous image onto the current image
+    by tracking feature points from the previous image into the current image.
+
+    Args:
+        previous_gray (np.ndarray): The previous (grayscale) image
+        current_gray (np.ndarray): The current (grayscale) image, the same size as the previous
+        previous_points (Union[np.ndarray, None]): The points to track from the previous image
+            (usually the points tracked into the previous image from the image before it),
+            or None to detect new feature points in the previous image
+
+    Returns:
+        tuple[Union[np.ndarray, None], Union[np.ndarray, None]]: The 2x3 affine transform matrix
+            (or None if not enough points could be tracked between the images),
+            and the points that were successfully tracked into the current image
+            (excluding any outliers, such as points on a moving animal)
+    """
+    # Detect feature points in previous frame (if we weren't given any to track)
+    if previous_points is None or len(previous_points) < MIN_SEED_POINTS:
+        previous_points = detectFeatures(previous_gray)
+    if previous_points is None or len(previous_points) < MIN_TRACKED_POINTS:
+        return (None, None)
 
     # Calculate optical flow (i.e. track feature points)
-    curr_pts, status, err = cv2.calcOpticalFlowPyrLK(
-        prev_gray, curr_gray, prev_pts, None
+    current_points, status, _ = cv2.calcOpticalFlowPyrLK(
+        previous_gray, current_gray, previous_points, None
     )
 
-    # Sanity check
-    assert prev_pts.shape == curr_pts.shape
-
     # Filter only valid points
-    idx = np.where(status == 1)[0]
-    prev_pts = prev_pts[idx]
-    curr_pts = curr_pts[idx]
-
-    # Find transformation matrix
-    m = cv2.estimateRigidTransform(
-        prev_pts, curr_pts, fullAffine=False
-    )  # will only work with OpenCV-3 or less
-
-    # Extract traslation
-    dx = m[0, 2]
-    dy = m[1, 2]
-
-    # Extract rotation angle
-    da = np.arctan2(m[1, 0], m[0, 0])
-
-    # Store transformation
-    transforms[i] = [dx, dy, da]
-
-    # Move to next frame
-    prev_gray = curr_gray
-
-    print(
-        "Frame: "
-        + str(i)
-        + "/"
-        + str(n_frames)
-        + " -  Tracked points : "
-        + str(len(prev_pts))
+    idx = np.flatnonzero(status == 1)
+    if len(idx) < MIN_TRACKED_POINTS:
+        return (None, None)
+
+    # Find the rotation + translation + uniform scale transformation matrix
+    transform, inliers = cv2.estimateAffinePartial2D(
+        previous_points[idx], current_points[idx], method=cv2.RANSAC
     )
+    if transform is None:
+        return (None, None)
+    tracked_points = current_points[idx][inliers.ravel() == 1]
+    return (transform, tracked_points)
+
+
+def estimateTransform(
+    previous_gray: np.ndarray, current_gray: np.ndarray
+) -> Union[np.ndarray, None]:
+    """Estimate the rigid transform that maps points in the previous image onto the current image
+
+    Args:
+        previous_gray (np.ndarray): The previous (grayscale) image
+        current_gray (np.ndarray): The current (grayscale) image, the same size as the previous
+
+    Returns:
+        Union[np.ndarray, None]: The 2x3 affine transform matrix,
+            or None if not enough points could be tracked between the images
+    """
+    transform, _ = trackTransform(previous_gray, current_gray)
+    return transform
+
+
+def upscaleTransform(transform: np.ndarray, levels: int) -> np.ndarray:
+    """Scale a transform estimated on a pyramid level back up to the full image resolution
+    (the rotation/scale part is unchanged, but the translation must be scaled up)
+    """
+    result = transform.astype(np.float64, copy=True)
+    result[:, 2] *= 2**levels
+    return result
+
+
+def estimateImagePairTransform(
+    previous_image: Any, current_image: Any, levels: int = DEFAULT_PYRAMID_LEVELS
+) -> Union[np.ndarray, None]:
+    """Estimate the full resolution transform from the previous image onto the current image"""
+    previous_gray = createGrayPyramidLevel(previous_image, levels)
+    current_gray = createGrayPyramidLevel(current_image, levels)
+    transform = estimateTransform(previous_gray, current_gray)
+    if transform is None:
+        return None
+    return upscaleTransform(transform, levels)
+
+
+def warpImage(image: Any, transform: np.ndarray) -> Any:
+    """Warp the (previous) image with the given transform so that it lines up with the
+    current image.  The edges are filled by repeating the border pixels (rather than black)
+    so that the warp doesn't create large differences around the edges of the image.
+    """
+    height, width = image.shape[0], image.shape[1]
+    return cv2.warpAffine(
+        image, transform, (width, height), borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+class TransformCache:
+    """Caches the estimated transform between each pair of images on disk,
+    so the transforms don't have to be re-estimated every time the images are processed.
+    A cached transform is only used if neither image was modified since it was estimated.
+    """
+
+    def __init__(self, file_name: str, levels: int = DEFAULT_PYRAMID_LEVELS):
+        self._file_name = file_name
+        self._levels = levels
+        self._entries: dict[str, dict[str, Any]] = {}
+        self._modified = False
+        if os.path.isfile(file_name):
+            with open(file_name, "rt") as f:
+                self._entries = json.load(f)
+
+    def _createKey(self, previous_path: str, current_path: str) -> str:
+        """The key that identifies the inputs used to estimate a transform"""
+        previous_modified = _fileModifiedTime(previous_path)
+        current_modified = _fileModifiedTime(current_path)
+        return f"{previous_path}|{previous_modified}|{current_modified}|{self._levels}"
+
+    def contains(self, previous_path: str, current_path: str) -> bool:
+        """Determines if there's an up to date transform cached for the image pair"""
+        entry = self._entries.get(current_path)
+        return entry is not None and entry["key"] == self._createKey(
+            previous_path, current_path
+        )
+
+    def get(self, current_path: str) -> Union[np.ndarray, None]:
+        """Get the cached transform onto the given image from the image before it
+        (None if the transform could not be estimated - check `contains()` first)
+        """
+        entry = self._entries[current_path]
+        transform = entry["transform"]
+        return None if transform is None else np.array(transform, dtype=np.float64)
+
+    def put(
+        self,
+        previous_path: str,
+        current_path: str,
+        transform: Union[np.ndarray, None],
+    ) -> None:
+        """Cache the transform for the image pair"""
+        self._entries[current_path] = {
+            "key": self._createKey(previous_path, current_path),
+            "transform": None if transform is None else transform.tolist(),
+        }
+        self._modified = True
+
+    def save(self) -> None:
+        """Save the cached transforms (if any were added)"""
+        if not self._modified:
+            return
+        temp_file_name = self._file_name + ".tmp"
+        with open(temp_file_name, "w") as f:
+            json.dump(self._entries, f)
+        os.replace(temp_file_name, self._file_name)
+        self._modified = False
+
+
+def _fileModifiedTime(file_path: str) -> int:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def loadReducedGrayImage(file_path: str, levels: int) -> Union[np.ndarray, None]:
+    """Load the image already downscaled and in grayscale.
+    For 1/2, 1/4 and 1/8 scales libjpeg can decode straight to the smaller size,
+    which is much faster than decoding the full image and then shrinking it.
+    """
+    reduced_flags = {
+        1: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+        2: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        3: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    }
+    if levels in reduced_flags:
+        return cv2.imread(file_path, reduced_flags[levels])
+
+    image = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+    return None if image is None else createGrayPyramidLevel(image, levels)
+
+
+class PairTransformEstimator:
+    """Estimates the transforms of image pairs one at a time, in their group order:
+    when a pair starts with the image the last pair ended with (the next pair in the group),
+    that image isn't converted to grayscale and downscaled again, and the points tracked into it
+    are re-used as the points to track into the next image (like `estimateGroupTransforms`).
+    """
+
+    def __init__(self, levels: int = DEFAULT_PYRAMID_LEVELS, reuse_points: bool = True):
+        self._levels = levels
+        self._reuse_points = reuse_points
+        self._last_path: Union[str, None] = None
+        self._last_gray: Union[np.ndarray, None] = None
+        self._last_points: Union[np.ndarray, None] = None
+
+    def _reducedGray(self, file_path: str, image: Any) -> Union[np.ndarray, None]:
+        if image is None:
+            return loadReducedGrayImage(file_path, self._levels)
+        return createGrayPyramidLevel(image, self._levels)
+
+    def estimate(
+        self,
+        previous_path: str,
+        current_path: str,
+        previous_image: Any = None,
+        current_image: Any = None,
+    ) -> Union[np.ndarray, None]:
+        """Estimate the full resolution transform from the previous image onto the current image
+
+        Args:
+            previous_path (str): The previous image file
+            current_path (str): The current image file
+            previous_image (Any): The decoded previous image, or None to decode the file
+                at the reduced size (see `loadReducedGrayImage`)
+            current_image (Any): The decoded current image, or None to decode the file
+
+        Returns:
+            Union[np.ndarray, None]: The 2x3 affine transform matrix,
+                or None if not enough points could be tracked between the images
+        """
+        if previous_path == self._last_path:
+            previous_gray, seed_points = self._last_gray, self._last_points
+        else:
+            previous_gray, seed_points = self._reducedGray(previous_path, previous_image), None
+        current_gray = self._reducedGray(current_path, current_image)
+
+        transform, tracked_points = None, None
+        if (
+            previous_gray is not None
+            and current_gray is not None
+            and previous_gray.shape == current_gray.shape
+        ):
+            transform, tracked_points = trackTransform(
+                previous_gray, current_gray, seed_points
+            )
+        self._last_path, self._last_gray = current_path, current_gray
+        self._last_points = tracked_points if self._reuse_points else None
+        return None if transform is None else upscaleTransform(transform, self._levels)
+
+
+def estimateImageFilePairTransform(
+    previous_path: str, current_path: str, levels: int = DEFAULT_PYRAMID_LEVELS
+) -> Union[np.ndarray, None]:
+    """Estimate the full resolution transform from the previous image onto the current image,
+    from the image files (which are only decoded at the reduced size, see `loadReducedGrayImage`)
+    """
+    return PairTransformEstimator(levels).estimate(previous_path, current_path)
+
+
+def estimateGroupTransforms(
+    group: list[model.ImageInfo],
+    cache: Union[TransformCache, None] = None,
+    levels: int = DEFAULT_PYRAMID_LEVELS,
+    reuse_points: bool = True,
+) -> list[Union[np.ndarray, None]]:
+    """Estimate the transform from each image in the group (burst) to the next image
+
+    Args:
+        group (list[model.ImageInfo]): The group of consecutive images (see `grouping`)
+        cache (Union[TransformCache, None]): The optional cache of previously estimated transforms
+        levels (int): The number of times the images are halved before estimating the transform
+            (0 for full resolution, 2 for 1/4 and 3 for 1/8 scale)
+        reuse_points (bool): Use the points tracked into each image as the points to track
+            into the next image, rather than detecting new feature points in every image
+
+    Returns:
+        list[Union[np.ndarray, None]]: The full resolution transform onto each image from the
+            image before it, the first image (with no image before it) is always None,
+            as is any image that the transform could not be estimated for.
+    """
+    results: list[Union[np.ndarray, None]] = [None] * len(group)
+    estimator = PairTransformEstimator(levels, reuse_points)
+    for i in range(1, len(group)):
+        previous_path, current_path = group[i - 1].filePath, group[i].filePath
+        if cache is not None and cache.contains(previous_path, current_path):
+            # (the estimator starts again from the next image it's given)
+            results[i] = cache.get(current_path)
+            continue
+
+        results[i] = estimator.estimate(previous_path, current_path)
+        if cache is not None:
+            cache.put(previous_path, current_path, results[i])
+    return results
@@ -0,0 +1,357 @@
+#!python
+"""
+Runs a trained sub-image classifier over full camera frames (on the CPU), to triage
+entire camera seasons for images that contain animals.
+
+Every frame is differenced with the previous frame in its group (exactly like the training
+sub-images from `training_sub_image_extraction`), broken into 224x224 sub-images, and all the
+sub-images of the frame are scored in a single batch.
+The per-frame scores (and the sub-images above the threshold - the "hot" tiles) are streamed
+to a JSON-lines (`.jsonl`/`.json`) or `.csv` output file.
+
+Usage:
+    python -m src.inference --model model.pt --output scores.csv D:\\data\\some\\camera\\folder
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Container, Iterable, TextIO, Union
+
+import numpy as np
+import torch
+
+from src import model
+from src import data_serialization_json as ds
+from src import frame_gate as fg
+from src import grouping
+from src import sub_image_regions as sir
+from src import tile_classifier as tc
+from src import training_sub_image_extraction as extraction
+
+# The default probability above which a sub-image is considered to contain an animal
+DEFAULT_THRESHOLD = 0.5
+
+
+@dataclass(frozen=True)
+class TileScore:
+    """The score of a single sub-image within a frame"""
+
+    region: model.Region2d
+    score: float
+
+
+@dataclass(frozen=True)
+class FramePrediction:
+    """The prediction for an entire frame"""
+
+    filePath: str
+    previousFilePath: str
+    score: float
+    hotTiles: list[TileScore]
+
+    # Whether the frame was skipped by the frame gate (so it wasn't scored)
+    gated: bool = False
+
+    @property
+    def isAnimal(self) -> bool:
+        """`True` if any sub-image of this frame is hot"""
+        return len(self.hotTiles) > 0
+
+
+def loadImageGroups(input_path: str) -> list[list[model.ImageInfo]]:
+    """Load the groups of frames to process, from either an images `.json` file
+    or from all the images in a folder
+    """
+    if os.path.isfile(input_path):
+        images = ds.loadImagesCollectionFromJson(input_path).images
+    else:
+        file_names: set[str] = set()
+        for ext in ("*.jpg", "*.JPG", "*.jpeg", "*.png"):
+            file_names.update(glob.glob(os.path.join(input_path, ext)))
+        images = [model.ImageInfo(False, f, []) for f in sorted(file_names)]
+    return grouping.groupImages(images)
+
+
+def scoreImagePair(
+    classifier: tc.TileClassifier, previous_image: Any, current_image: Any
+) -> tuple[list[model.Region2d], np.ndarray]:
+    """Score every sub-image of the difference between the two images in one batch
+    (using exactly the same sub-images, at the same scales, as the training sub-images)
+
+    Returns:
+        tuple[list[model.Region2d], np.ndarray]: The sub-image regions
+            (in full size image coordinates), and the score of each
+    """
+    height, width = current_image.shape[0], current_image.shape[1]
+    image_size = model.Size2d(width, height)
+    levels = sir.getTilePyramid(
+        extraction.BLOCK_SIZE, image_size, extraction.TILE_STRIDE, extraction.TILE_SCALES
+    )
+    previous_images = sir.createImagePyramid(previous_image, levels)
+    current_images = sir.createImagePyramid(current_image, levels)
+
+    regions: list[model.Region2d] = []
+    tiles: list[np.ndarray] = []
+    for level, previous_level, current_level in zip(
+        levels, previous_images, current_images
+    ):
+        image_diff = extraction.calculate_image_diff(previous_level, current_level)
+        tiles.append(level.grid.extractTiles(image_diff))
+        regions.extend(level.regions)
+    if len(tiles) == 0:
+        return (regions, np.zeros(0, dtype=np.float32))
+    return (regions, classifier.predict(np.concatenate(tiles)))
+
+
+def predictImagePair(
+    classifier: tc.TileClassifier,
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    previous_image: Any,
+    current_image: Any,
+    threshold: float,
+) -> FramePrediction:
+    """Create the prediction for a single frame (and the previous frame in its group)"""
+    regions, scores = scoreImagePair(classifier, previous_image, current_image)
+    hot_tiles = [
+        TileScore(regions[i], float(scores[i])) for i in np.flatnonzero(scores >= threshold)
+    ]
+    frame_score = float(scores.max()) if len(scores) > 0 else 0.0
+    return FramePrediction(
+        image_info.filePath, previous_info.filePath, frame_score, hot_tiles
+    )
+
+
+def predictImageGroups(
+    classifier: tc.TileClassifier,
+    image_groups: list[list[model.ImageInfo]],
+    threshold: float,
+    frame_gate: Union[fg.FrameGate, None] = None,
+    frames: Union[Container[str], None] = None,
+) -> Iterable[FramePrediction]:
+    """Create the predictions for every frame (except the first) in each group of frames
+    (the frames the optional frame gate skips aren't decoded or scored, and have a score of 0).
+    Only the frames whose file paths are in `frames` are predicted, when it's given - the
+    other frames are only decoded as the previous frame of a predicted frame.
+    """
+    image_cache = extraction.ImageCache()
+    for group in image_groups:
+        for previous_info, image_info in zip(group, group[1:]):
+            if frames is not None and image_info.filePath not in frames:
+                continue
+            if frame_gate is not None and not frame_gate.passes(
+                previous_info, image_info
+            ):
+                yield FramePrediction(
+                    image_info.filePath, previous_info.filePath, 0.0, [], gated=True
+                )
+                continue
+
+            previous_image = image_cache.load(previous_info.filePath)
+            current_image = image_cache.load(image_info.filePath)
+            if previous_image is None or current_image is None:
+                print(f"Failed to load: {image_info.filePath} - skipping")
+                continue
+            if previous_image.shape != current_image.shape:
+                print(f"Different image sizes: {image_info.filePath} - skipping")
+                continue
+
+            # Line the images up exactly like the training sub-images were
+            previous_image = extraction.stabilise_previous_image(
+                previous_info, image_info, previous_image, current_image
+            )
+            yield predictImagePair(
+                classifier,
+                previous_info,
+                image_info,
+                previous_image,
+                current_image,
+                threshold,
+            )
+
+
+# ##################################################################################################
+# region Prediction output writers
+# ##################################################################################################
+
+
+class JsonLinesPredictionWriter:
+    """Writes each frame prediction as a single line of JSON"""
+
+    def __init__(self, file: TextIO):
+        self._file = file
+
+    def write(self, prediction: FramePrediction) -> None:
+        data = {
+            "filePath": prediction.filePath,
+            "previousFilePath": prediction.previousFilePath,
+            "score": round(prediction.score, 5),
+            "animal": prediction.isAnimal,
+            "gated": prediction.gated,
+            "hotTiles": [
+                {
+                    "x": t.region.x,
+                    "y": t.region.y,
+                    "w": t.region.w,
+                    "h": t.region.h,
+                    "score": round(t.score, 5),
+                }
+                for t in prediction.hotTiles
+            ],
+        }
+        self._file.write(json.dumps(data) + "\n")
+
+
+class CsvPredictionWriter:
+    """Writes each frame prediction as a CSV row, with the hot tiles as `x:y:w:h:score`
+    separated by `;`
+    """
+
+    def __init__(self, file: TextIO):
+        self._writer = csv.writer(file)
+        self._writer.writerow(
+            ["filePath", "previousFilePath", "score", "animal", "hotTiles", "gated"]
+        )
+
+    def write(self, prediction: FramePrediction) -> None:
+        hot_tiles = ";".join(
+            f"{t.region.x}:{t.region.y}:{t.region.w}:{t.region.h}:{t.score:.5f}"
+            for t in prediction.hotTiles
+        )
+        self._writer.writerow(
+            [
+                prediction.filePath,
+                prediction.previousFilePath,
+                f"{prediction.score:.5f}",
+                prediction.isAnimal,
+                hot_tiles,
+                prediction.gated,
+            ]
+        )
+
+
+PredictionWriter = Union[JsonLinesPredictionWriter, CsvPredictionWriter]
+
+
+def createPredictionWriter(file_name: str, file: TextIO) -> PredictionWriter:
+    """Create the prediction writer for the given output file name (by its extension)"""
+    if file_name.lower().endswith(".csv"):
+        return CsvPredictionWriter(file)
+    return JsonLinesPredictionWriter(file)
+
+
+# endregion
+
+
+def configureThreads(threads: int) -> None:
+    """Use a fixed number of CPU threads for inference"""
+    torch.set_num_threads(threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # Can only be set before any inference has run
+
+
+def addFrameGateArgument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--frame-gate",
+        type=float,
+        metavar="THRESHOLD",
+        help="Skip (without scoring) the frames whose most changed (1/8 size) cell changed "
+        "less than this (0 to 255)",
+    )
+
+
+def createFrameGate(args: argparse.Namespace) -> Union[fg.FrameGate, None]:
+    """The frame gate from the `--frame-gate` argument (if there is one)"""
+    if args.frame_gate is None:
+        return None
+    return fg.FrameGate(fg.FrameGatePolicy(threshold=args.frame_gate))
+
+
+def parseArguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Score camera frames with a trained sub-image classifier (on the CPU)"
+    )
+    parser.add_argument(
+        "input", help="A folder of camera images, or an images `.json` file"
+    )
+    parser.add_argument(
+        "--model",
+        required=True,
+        help="The exported fastai learner (`learn.export()`), "
+        "or a `.pt`/`.onnx` model exported by `model_export`",
+    )
+    parser.add_argument(
+        "--output", required=True, help="The output `.jsonl` or `.csv` file"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="The sub-image score above which a sub-image is hot",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of CPU threads to use for inference",
+    )
+    addFrameGateArgument(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parseArguments()
+    configureThreads(args.threads)
+    classifier = tc.loadClassifier(args.model)
+    image_groups = loadImageGroups(args.input)
+    frame_gate = createFrameGate(args)
+
+    # When the input images have been tagged (e.g. `animals.json`), measure how well the hot
+    # sub-images overlap the tagged regions
+    tagged_regions = {
+        i.filePath: model.RegionIndex(model.confirmedRegions(i.regions))
+        for group in image_groups
+        for i in group
+        if i.tagged
+    }
+    overlap = model.OverlapMetrics(0, 0, 0, 0)
+
+    frame_count = 0
+    animal_count = 0
+    start_time = time.perf_counter()
+    with open(args.output, "w", newline="") as f:
+        writer = createPredictionWriter(args.output, f)
+        predictions = predictImageGroups(
+            classifier, image_groups, args.threshold, frame_gate
+        )
+        for prediction in predictions:
+            writer.write(prediction)
+            frame_count += 1
+            animal_count += int(prediction.isAnimal)
+            region_index = tagged_regions.get(prediction.filePath)
+            if region_index is not None:
+                hot_regions = [t.region for t in prediction.hotTiles]
+                overlap += model.calculateOverlapMetrics(hot_regions, region_index)
+            if frame_count % 100 == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"{frame_count} frames - {frame_count / elapsed:.2f} frames/s")
+
+    elapsed = time.perf_counter() - start_time
+    frames_per_second = frame_count / elapsed if elapsed > 0 else 0.0
+    print(f"Scored {frame_count} frames in {elapsed:.1f}s ({frames_per_second:.2f} frames/s)")
+    print(f"Frames with animals: {animal_count}")
+    if frame_gate is not None:
+        print(frame_gate.summary())
+    if overlap.actualCount > 0:
+        print(f"Tagged regions found: {overlap.recall:.1%} of {overlap.actualCount}")
+        print(f"Hot sub-images (in tagged frames) on a tagged region: {overlap.precision:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 from .image import *
 from .region2d import *
+from .region_array import *
+from .region_index import *
 from .size2d import *
@@ -1,9 +1,10 @@
 from dataclasses import dataclass
+from typing import Union
 
 from .region2d import Region2d
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class ImageInfo:
     """Information about a particular image in our data set"""
 
@@ -11,8 +12,12 @@ class ImageInfo:
     filePath: str
     regions: list[Region2d]
 
+    # The AI model's confidence (0 to 1) that this image contains an animal
+    # (only set when the image was pre-annotated by the model)
+    confidence: Union[float, None] = None
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class ImagesCollection:
     """The information stored in the `animals.json` file, including metadata"""
 
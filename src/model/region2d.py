@@ -2,7 +2,7 @@ from dataclasses import dataclass
 from typing import Union
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Region2d:
     """The basic Region (rectangle) in an image
     Top left is (0,0) and x increases to the right while
@@ -88,7 +88,10 @@ def intersects(a: Region2d, b: Region2d) -> bool:
     Returns:
         bool: `True` if the two regions intersect at all, `False` if they do not
     """
-    return not ((a.x2 < b.x1 or a.x1 > b.x2) or (a.y1 > b.y2 or a.y2 < b.y1))
+    # (uses the fields directly rather than the x1/x2/y1/y2 properties, this is a hot loop)
+    return not (
+        (a.x + a.w < b.x or a.x > b.x + b.w) or (a.y > b.y + b.h or a.y + a.h < b.y)
+    )
 
 
 def intersectsAny(a: Region2d, testRegions: list[Region2d]) -> bool:
@@ -105,8 +108,22 @@ def intersectsAny(a: Region2d, testRegions: list[Region2d]) -> bool:
     return any(intersects(a, b) for b in testRegions)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class TaggedRegion2d(Region2d):
     """Represents a tagged region - either `True` or `False` there is an animal in the region"""
 
     tag: bool
+
+
+@dataclass(frozen=True, slots=True)
+class PredictedRegion2d(Region2d):
+    """Represents a draft region predicted by an AI model (that a human has not yet confirmed)
+    with the model's confidence (0 to 1) that there is an animal in the region
+    """
+
+    confidence: float
+
+
+def confirmedRegions(regions: list[Region2d]) -> list[Region2d]:
+    """Returns only the regions that were confirmed by a human (skipping predicted draft regions)"""
+    return [r for r in regions if not isinstance(r, PredictedRegion2d)]
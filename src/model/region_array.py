@@ -0,0 +1,107 @@
+from typing import Iterable, Iterator, Union
+
+import numpy as np
+
+from .region2d import Region2d
+
+
+class RegionArray:
+    """Many regions (rectangles) stored compactly as a single `int32[N, 4]` array of
+    (x, y, w, h) - a fraction of the memory of the same number of `Region2d` objects,
+    and the geometric operations work on every region at once.
+    """
+
+    def __init__(self, boxes: Union[np.ndarray, Iterable[Iterable[int]]]):
+        self._boxes = np.array(boxes, dtype=np.int32).reshape(-1, 4)
+
+    @staticmethod
+    def fromRegions(regions: Iterable[Region2d]) -> "RegionArray":
+        """Create the region array from a collection of regions"""
+        return RegionArray([(r.x, r.y, r.w, r.h) for r in regions])
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """The underlying `int32[N, 4]` array of (x, y, w, h)"""
+        return self._boxes
+
+    @property
+    def x1(self) -> np.ndarray:
+        return self._boxes[:, 0]
+
+    @property
+    def y1(self) -> np.ndarray:
+        return self._boxes[:, 1]
+
+    @property
+    def x2(self) -> np.ndarray:
+        return self._boxes[:, 0] + self._boxes[:, 2]
+
+    @property
+    def y2(self) -> np.ndarray:
+        return self._boxes[:, 1] + self._boxes[:, 3]
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    def __getitem__(self, index: int) -> Region2d:
+        x, y, w, h = self._boxes[index]
+        return Region2d(int(x), int(y), int(w), int(h))
+
+    def __iter__(self) -> Iterator[Region2d]:
+        for x, y, w, h in self._boxes.tolist():
+            yield Region2d(x, y, w, h)
+
+    def toRegions(self) -> list[Region2d]:
+        """Convert back into a list of regions"""
+        return list(self)
+
+    def area(self) -> np.ndarray:
+        """The area of each region (as 64-bit integers, so large regions can't overflow)"""
+        return np.abs(self._boxes[:, 2].astype(np.int64) * self._boxes[:, 3])
+
+    def scale(self, scaleFactor: float) -> "RegionArray":
+        """Scale every region by the given scale (in both x and y directions),
+        truncating exactly like `model.scale`
+        """
+        return RegionArray(np.trunc(self._boxes * scaleFactor))
+
+    def normalize(self) -> "RegionArray":
+        """Flip around any region with a negative width or height (like `model.normalize`)"""
+        boxes = self._boxes.copy()
+        for axis in (0, 1):
+            negative = boxes[:, axis + 2] < 0
+            boxes[negative, axis] += boxes[negative, axis + 2]
+            boxes[negative, axis + 2] *= -1
+        return RegionArray(boxes)
+
+    def intersects(self, other: Union[Region2d, "RegionArray"]) -> np.ndarray:
+        """Determines which regions intersect (or touch) the other region(s),
+        exactly like `model.intersects`
+
+        Args:
+            other (Union[Region2d, RegionArray]): A single region, or another region array
+
+        Returns:
+            np.ndarray: A `bool[N]` array when given a single region,
+                or a `bool[N, M]` array (for every pair of regions) when given M regions
+        """
+        if isinstance(other, Region2d):
+            other = RegionArray.fromRegions([other])
+            return self.intersects(other)[:, 0]
+
+        ax1, ay1 = self.x1[:, None], self.y1[:, None]
+        ax2, ay2 = self.x2[:, None], self.y2[:, None]
+        bx1, by1, bx2, by2 = other.x1, other.y1, other.x2, other.y2
+        return ~((ax2 < bx1) | (ax1 > bx2) | (ay1 > by2) | (ay2 < by1))
+
+    def intersectsAny(self, other: Union[Iterable[Region2d], "RegionArray"]) -> np.ndarray:
+        """Determines which regions intersect (or touch) any of the other regions
+
+        Returns:
+            np.ndarray: A `bool[N]` array
+        """
+        if not isinstance(other, RegionArray):
+            other = RegionArray.fromRegions(other)
+        if len(other) == 0:
+            return np.zeros(len(self), dtype=bool)
+        return self.intersects(other).any(axis=1)
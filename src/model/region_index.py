@@ -0,0 +1,231 @@
+from dataclasses import dataclass
+from typing import Iterable, Sequence, Union
+
+import numpy as np
+
+from .region2d import Region2d, normalize
+from .region_array import RegionArray
+
+# The default size of each (square) grid cell of the region index
+# (about the size of a sub-image, so a sub-image touches at most 4 cells)
+DEFAULT_CELL_SIZE = 256
+
+# Up to this many regions, testing a batch of boxes against every region at once
+# (`RegionArray.intersectsAny`) is faster than gathering the regions in each box's cells
+# (the crossover measured by `benchmarks/run_benchmarks.py`, with the sub-images of a
+# 4000x3000 image)
+BATCH_INDEX_THRESHOLD = 200
+
+
+def _expand(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Expand each item into `counts[i]` rows
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The item of each row, and the row's position (from 0)
+            within its item
+    """
+    owners = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    return (owners, np.arange(len(owners)) - starts[owners])
+
+
+class RegionIndex:
+    """A uniform grid spatial index over a collection of regions, which quickly answers
+    "which regions touch this box" without testing every region.
+
+    Each region is added to the bucket of every grid cell it covers, so a query only needs
+    to test the regions in the cells the query box covers.
+    Build it once per image (the regions can't be changed afterwards) and re-use it for
+    every query on that image.
+    Regions that touch (share an edge) count as intersecting, exactly like `intersects`.
+    """
+
+    def __init__(self, regions: Sequence[Region2d], cell_size: int = DEFAULT_CELL_SIZE):
+        assert cell_size > 0
+        self._regions = list(regions)
+        self._cell_size = cell_size
+        self._array = RegionArray.fromRegions(normalize(r) for r in self._regions)
+        self._buckets: dict[tuple[int, int], list[int]] = {}
+        for i, (x, y, w, h) in enumerate(self._array.boxes.tolist()):
+            for cell in self._cells(x, y, x + w, y + h):
+                self._buckets.setdefault(cell, []).append(i)
+        self._buildGrid()
+
+    def _buildGrid(self) -> None:
+        """Flatten the buckets into arrays for the batch queries, over the grid of the cells
+        that have regions: the regions in (flat) cell `c` are
+        `_cellRegions[_cellStarts[c] : _cellStarts[c + 1]]`
+        """
+        cells = np.array(list(self._buckets.keys()) or [(0, 0)]).reshape(-1, 2)
+        self._gridOrigin = (int(cells[:, 0].min()), int(cells[:, 1].min()))
+        self._gridSize = (
+            int(cells[:, 0].max()) - self._gridOrigin[0] + 1,
+            int(cells[:, 1].max()) - self._gridOrigin[1] + 1,
+        )
+        counts = np.zeros(self._gridSize[0] * self._gridSize[1], dtype=np.int64)
+        flat_cells = self._flatCell(cells[:, 0], cells[:, 1])[: len(self._buckets)]
+        buckets = list(self._buckets.values())
+        counts[flat_cells] = [len(bucket) for bucket in buckets]
+        self._cellStarts = np.concatenate([[0], np.cumsum(counts)])
+        self._cellRegions = np.zeros(self._cellStarts[-1], dtype=np.int64)
+        for flat_cell, bucket in zip(flat_cells.tolist(), buckets):
+            start = self._cellStarts[flat_cell]
+            self._cellRegions[start : start + len(bucket)] = bucket
+
+    def _flatCell(self, cx: np.ndarray, cy: np.ndarray) -> np.ndarray:
+        """The position of the grid cells in the flattened grid"""
+        return (cy - self._gridOrigin[1]) * self._gridSize[0] + (cx - self._gridOrigin[0])
+
+    @property
+    def regions(self) -> list[Region2d]:
+        """The indexed regions (in their original order)"""
+        return self._regions
+
+    def __len__(self) -> int:
+        return len(self._regions)
+
+    def _cells(self, x1: int, y1: int, x2: int, y2: int) -> Iterable[tuple[int, int]]:
+        """The grid cells covered by the box (including the cells its edges touch)"""
+        size = self._cell_size
+        for cy in range(y1 // size, y2 // size + 1):
+            for cx in range(x1 // size, x2 // size + 1):
+                yield (cx, cy)
+
+    def _candidates(self, box: Region2d) -> list[int]:
+        """The indexes of the regions that share a grid cell with the box"""
+        box = normalize(box)
+        candidates: set[int] = set()
+        for cell in self._cells(box.x, box.y, box.x + box.w, box.y + box.h):
+            candidates.update(self._buckets.get(cell, ()))
+        return sorted(candidates)
+
+    def query(self, box: Region2d) -> list[int]:
+        """The indexes of all the regions that touch the given box (in their original order)"""
+        candidates = self._candidates(box)
+        if len(candidates) == 0:
+            return []
+        touching = RegionArray(self._array.boxes[candidates]).intersects(normalize(box))
+        return [c for c, t in zip(candidates, touching.tolist()) if t]
+
+    def queryPoint(self, x: int, y: int) -> list[int]:
+        """The indexes of all the regions that contain the given point"""
+        return self.query(Region2d(x, y, 0, 0))
+
+    def intersectsAny(self, box: Region2d) -> bool:
+        """Determines if any region touches the given box"""
+        return len(self.query(box)) > 0
+
+    def intersectsAnyBatch(
+        self, boxes: Union[RegionArray, Iterable[Region2d]]
+    ) -> np.ndarray:
+        """Determines which of the boxes touch any region, all at once
+        (only gathering the regions in each box's cells when there are lots of regions)
+
+        Returns:
+            np.ndarray: A `bool[N]` array
+        """
+        if not isinstance(boxes, RegionArray):
+            boxes = RegionArray.fromRegions(boxes)
+        if len(self._regions) <= BATCH_INDEX_THRESHOLD:
+            return boxes.normalize().intersectsAny(self._array)
+
+        # The range of grid cells each box covers (clipped to the cells with regions)
+        boxes = boxes.normalize()
+        size = self._cell_size
+        (left, top), (width, height) = self._gridOrigin, self._gridSize
+        cx1 = np.maximum(boxes.x1 // size, left)
+        cy1 = np.maximum(boxes.y1 // size, top)
+        cx2 = np.minimum(boxes.x2 // size, left + width - 1)
+        cy2 = np.minimum(boxes.y2 // size, top + height - 1)
+        columns = np.maximum(cx2 - cx1 + 1, 0)
+        rows = np.maximum(cy2 - cy1 + 1, 0)
+
+        # Every (box, cell) pair, then every (box, candidate region) pair
+        box_of_cell, offset = _expand(columns * rows)
+        cells = self._flatCell(
+            cx1[box_of_cell] + offset % columns[box_of_cell],
+            cy1[box_of_cell] + offset // columns[box_of_cell],
+        )
+        starts = self._cellStarts[cells]
+        cell_of_pair, offset = _expand(self._cellStarts[cells + 1] - starts)
+        box = box_of_cell[cell_of_pair]
+        region = self._cellRegions[starts[cell_of_pair] + offset]
+
+        # Test all the candidate pairs at once (exactly like `RegionArray.intersects`)
+        regions = self._array
+        touching = ~(
+            (boxes.x2[box] < regions.x1[region])
+            | (boxes.x1[box] > regions.x2[region])
+            | (boxes.y1[box] > regions.y2[region])
+            | (boxes.y2[box] < regions.y1[region])
+        )
+        result = np.zeros(len(boxes), dtype=bool)
+        result[box[touching]] = True
+        return result
+
+
+@dataclass(frozen=True, slots=True)
+class OverlapMetrics:
+    """How well a set of predicted regions overlaps a set of actual (human tagged) regions"""
+
+    # The predicted regions that touch at least one actual region
+    truePositives: int
+
+    # The predicted regions that don't touch any actual region
+    falsePositives: int
+
+    # The actual regions that no predicted region touches
+    falseNegatives: int
+
+    # The total number of actual regions
+    actualCount: int
+
+    @property
+    def precision(self) -> float:
+        """The fraction of the predicted regions that touch an actual region"""
+        predicted = self.truePositives + self.falsePositives
+        return self.truePositives / predicted if predicted > 0 else 0.0
+
+    @property
+    def recall(self) -> float:
+        """The fraction of the actual regions that are touched by a predicted region"""
+        found = self.actualCount - self.falseNegatives
+        return found / self.actualCount if self.actualCount > 0 else 0.0
+
+    def __add__(self, other: "OverlapMetrics") -> "OverlapMetrics":
+        return OverlapMetrics(
+            self.truePositives + other.truePositives,
+            self.falsePositives + other.falsePositives,
+            self.falseNegatives + other.falseNegatives,
+            self.actualCount + other.actualCount,
+        )
+
+
+def calculateOverlapMetrics(
+    predicted: Sequence[Region2d], actual: Union[RegionIndex, Sequence[Region2d]]
+) -> OverlapMetrics:
+    """Compare the predicted regions (e.g. the AI model's hot sub-images)
+    with the actual (human tagged) regions of an image
+
+    Args:
+        predicted (Sequence[Region2d]): The predicted regions
+        actual (Union[RegionIndex, Sequence[Region2d]]): The actual regions
+            (or the already built index of them)
+
+    Returns:
+        OverlapMetrics: The overlap metrics
+    """
+    index = actual if isinstance(actual, RegionIndex) else RegionIndex(actual)
+    found: set[int] = set()
+    true_positives = 0
+    for region in predicted:
+        touching = index.query(region)
+        if touching:
+            true_positives += 1
+            found.update(touching)
+    return OverlapMetrics(
+        truePositives=true_positives,
+        falsePositives=len(predicted) - true_positives,
+        falseNegatives=len(index) - len(found),
+        actualCount=len(index),
+    )
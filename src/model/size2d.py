@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Size2d:
     """A width/height combination - used to describe the width and height of an image
     or pair of images
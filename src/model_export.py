@@ -0,0 +1,162 @@
+#!python
+"""
+Exports a trained sub-image classifier as a standalone TorchScript (`.pt`) or ONNX (`.onnx`)
+model, so that inference (see `inference.py` and `pre_annotation.py`) can load it with
+`tile_classifier.loadClassifier` without importing the fastai training stack.
+
+The ImageNet normalization that fastai adds to its data loaders is baked into the exported model,
+so it takes the float NxCxHxW sub-images (0 to 1) straight from `TileClassifier.createBatch`
+and returns the logits.
+
+The optional int8 dynamic quantization stores the weights as 8-bit integers:
+    - TorchScript: PyTorch's dynamic quantization only covers the linear layers (the head),
+      the convolutions of the backbone stay as floats
+    - ONNX: ONNX Runtime's dynamic quantization also covers the convolutions
+      (this needs the optional `onnx` and `onnxruntime` packages)
+
+Usage:
+    python -m src.model_export model.pkl model.pt --quantize
+"""
+import argparse
+import copy
+import os
+import tempfile
+
+import torch
+
+from src import model
+from src import tile_classifier as tc
+
+# The name of the exported model's input and output (for ONNX)
+INPUT_NAME = "images"
+OUTPUT_NAME = "logits"
+
+# The ONNX operator set the models are exported with
+ONNX_OPSET_VERSION = 17
+
+
+class NormalizedModel(torch.nn.Module):
+    """A classifier with the ImageNet normalization of its (0 to 1) input images built in"""
+
+    def __init__(self, module: torch.nn.Module):
+        super().__init__()
+        self.module = module
+        self.register_buffer("mean", torch.tensor(tc.IMAGENET_MEAN).view(1, 3, 1, 1))
+        self.register_buffer("std", torch.tensor(tc.IMAGENET_STD).view(1, 3, 1, 1))
+
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        return self.module((images - self.mean) / self.std)
+
+
+def createExportModel(module: torch.nn.Module, quantize: bool = False) -> torch.nn.Module:
+    """A copy of the classifier, ready to export
+    (on the CPU, in evaluation mode, with the normalization built in, and optionally with its
+    linear layers quantized)
+    """
+    result: torch.nn.Module = NormalizedModel(copy.deepcopy(module)).cpu().eval()
+    result.to(memory_format=torch.contiguous_format)
+    if quantize:
+        result = torch.ao.quantization.quantize_dynamic(
+            result, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return result
+
+
+def _exampleInput(block_size: model.Size2d) -> torch.Tensor:
+    return torch.rand(2, 3, block_size.height, block_size.width)
+
+
+def exportTorchScript(
+    module: torch.nn.Module,
+    file_name: str,
+    quantize: bool = False,
+    block_size: model.Size2d = model.Size2d(224, 224),
+) -> None:
+    """Export the classifier as a (traced and frozen) TorchScript model"""
+    export_model = createExportModel(module, quantize)
+    with torch.no_grad():
+        traced = torch.jit.trace(export_model, _exampleInput(block_size))
+        traced = torch.jit.freeze(traced)
+    torch.jit.save(traced, file_name)
+
+
+def exportOnnx(
+    module: torch.nn.Module,
+    file_name: str,
+    quantize: bool = False,
+    block_size: model.Size2d = model.Size2d(224, 224),
+) -> None:
+    """Export the classifier as an ONNX model (with a variable batch size)"""
+    export_file_name = file_name
+    if quantize:
+        handle, export_file_name = tempfile.mkstemp(suffix=tc.ONNX_EXTENSION)
+        os.close(handle)
+
+    try:
+        torch.onnx.export(
+            createExportModel(module),
+            (_exampleInput(block_size),),
+            export_file_name,
+            dynamo=False,
+            input_names=[INPUT_NAME],
+            output_names=[OUTPUT_NAME],
+            dynamic_axes={INPUT_NAME: {0: "batch"}, OUTPUT_NAME: {0: "batch"}},
+            opset_version=ONNX_OPSET_VERSION,
+        )
+        if quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+            quantize_dynamic(export_file_name, file_name, weight_type=QuantType.QInt8)
+    finally:
+        if quantize:
+            os.remove(export_file_name)
+
+
+def exportModel(
+    module: torch.nn.Module,
+    file_name: str,
+    quantize: bool = False,
+    block_size: model.Size2d = model.Size2d(224, 224),
+) -> None:
+    """Export the classifier as a TorchScript or ONNX model, depending on the file extension
+
+    Args:
+        module (torch.nn.Module): The trained classifier (e.g. a fastai learner's `model`)
+        file_name (str): The `.pt` (TorchScript) or `.onnx` file to export to
+        quantize (bool): Whether to quantize the weights to 8-bit integers
+        block_size (model.Size2d): The size of the sub-images (used to trace the model)
+    """
+    if file_name.lower().endswith(tc.ONNX_EXTENSION):
+        exportOnnx(module, file_name, quantize, block_size)
+    else:
+        exportTorchScript(module, file_name, quantize, block_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export a trained fastai learner as a TorchScript or ONNX model"
+    )
+    parser.add_argument("learner", help="The exported fastai learner (`learn.export()`)")
+    parser.add_argument("output", help="The `.pt` (TorchScript) or `.onnx` file to export to")
+    parser.add_argument(
+        "--quantize", action="store_true", help="Quantize the weights to 8-bit integers"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        nargs=2,
+        default=[224, 224],
+        metavar=("WIDTH", "HEIGHT"),
+        help="The size of the sub-images",
+    )
+    args = parser.parse_args()
+
+    classifier = tc.loadFastaiLearner(args.learner)
+    exportModel(
+        classifier.module, args.output, args.quantize, model.Size2d(*args.block_size)
+    )
+    print(f"Exported: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
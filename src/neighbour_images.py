@@ -0,0 +1,151 @@
+"""
+Finds the images taken just before and after each tagged image (its "neighbours"),
+so that a few negative images surrounding each positively tagged image can be added to
+the data set (see `utils/addSurroundingImages.py`).
+
+The camera images are numbered consecutively within each folder (e.g. `IMG_0123.JPG`),
+so rather than checking whether each possible neighbour file exists (one file system call
+per neighbour, which is very slow over a network share), every folder is listed once into an
+index of `(folder, prefix, number width, image number) -> path`, and the neighbours are found
+with set operations. An image's neighbours only come from its own series: the images with the
+same file name prefix and zero-padding (so `A_0001.JPG` and `B_0002.JPG` aren't neighbours).
+"""
+from itertools import groupby
+import os
+import re
+from typing import Iterable, Iterator, Union
+
+from src import model
+
+# An image's folder, file name prefix (before its image number), the width of its (zero-padded)
+# image number, and its image number (the first number in its file name, like `grouping`)
+ImageKey = tuple[str, str, int, int]
+
+# The file extensions of the images that are indexed
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+_NUMBER_PATTERN = re.compile(r"\d+")
+
+
+def createImageKey(file_path: str) -> Union[ImageKey, None]:
+    """The image's folder, prefix, number width and image number
+    (or None if its file name has no number)
+    """
+    folder, file_name = os.path.split(file_path)
+    stem = os.path.splitext(file_name)[0]
+    match = _NUMBER_PATTERN.search(stem)
+    if match is None:
+        return None
+    number = match.group()
+    return (os.path.normpath(folder), stem[: match.start()], len(number), int(number))
+
+
+def _offsetKey(key: ImageKey, offset: int) -> ImageKey:
+    """The key of the image `offset` images away in the same series
+    (with the number zero-padded to the same width, which it can outgrow)
+    """
+    folder, prefix, width, number = key
+    return (folder, prefix, len(f"{number + offset:0{width}}"), number + offset)
+
+
+def indexFolders(folders: Iterable[str]) -> dict[ImageKey, str]:
+    """List each folder once, and index every image in them by its folder, prefix, number width
+    and image number (if two images share all of these, the first file name alphabetically is
+    indexed)
+
+    Args:
+        folders (Iterable[str]): The folders to index (missing folders are ignored)
+
+    Returns:
+        dict[ImageKey, str]: The path of each image, by its folder and image number
+    """
+    index: dict[ImageKey, str] = {}
+    for folder in set(os.path.normpath(f) for f in folders):
+        try:
+            file_names = sorted(os.listdir(folder))
+        except OSError:
+            continue
+        for file_name in file_names:
+            if not file_name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            key = createImageKey(os.path.join(folder, file_name))
+            if key is not None:
+                index.setdefault(key, os.path.join(folder, file_name))
+    return index
+
+
+def findNeighbourImages(
+    image_paths: Iterable[str],
+    distance: int,
+    image_index: Union[dict[ImageKey, str], None] = None,
+) -> list[str]:
+    """Find the existing images within `distance` images before or after any of the given images
+    (not including the given images themselves)
+
+    Args:
+        image_paths (Iterable[str]): The (tagged) images
+        distance (int): How many images before and after each image to include
+        image_index (Union[dict[ImageKey, str], None]): The index of the images' folders
+            (see `indexFolders`), created from the images' folders if not given
+
+    Returns:
+        list[str]: The neighbour images, in the order `grouping.groupImages` expects
+            (by folder, then by series, then by image number)
+    """
+    keys = {k for k in (createImageKey(p) for p in image_paths) if k is not None}
+    if image_index is None:
+        image_index = indexFolders(key[0] for key in keys)
+
+    candidates = {
+        _offsetKey(key, offset)
+        for key in keys
+        for offset in range(-min(distance, key[3]), distance + 1)
+    }
+    neighbours = (candidates - keys) & image_index.keys()
+    return [image_index[key] for key in sorted(neighbours)]
+
+
+def _sortKey(path: str) -> tuple[bool, ImageKey, str]:
+    key = createImageKey(path)
+    return (key is None, key or ("", "", 0, 0), path)
+
+
+def sortImagePaths(image_paths: Iterable[str]) -> list[str]:
+    """Sort the images in the order `grouping.groupImages` expects
+    (by folder, then by series, then by image number, with any un-numbered images last)
+    """
+    return sorted(image_paths, key=_sortKey)
+
+
+def expandNeighbourImages(
+    images: Iterable[model.ImageInfo], distance: int
+) -> Iterator[model.ImageInfo]:
+    """Stream the images with their neighbours added (as untagged images), one folder at a time,
+    so only a single folder's images are ever held in memory.
+    Each folder is listed once, and its images are returned in the order
+    `grouping.groupImages` expects.
+
+    Args:
+        images (Iterable[model.ImageInfo]): The images, grouped by folder
+            (e.g. sorted by file path)
+        distance (int): How many images before and after each image to include
+
+    Raises:
+        ValueError: If the images aren't grouped by folder
+
+    Returns:
+        Iterator[model.ImageInfo]: The images and their neighbours
+    """
+    finished_folders: set[str] = set()
+    for folder, group in groupby(
+        images, key=lambda i: os.path.normpath(os.path.dirname(i.filePath))
+    ):
+        if folder in finished_folders:
+            raise ValueError(f"The images aren't grouped by folder: {folder}")
+        finished_folders.add(folder)
+
+        folder_images = list(group)
+        paths = {i.filePath for i in folder_images}
+        neighbour_paths = findNeighbourImages(paths, distance, indexFolders([folder]))
+        added = [model.ImageInfo(False, p, []) for p in neighbour_paths if p not in paths]
+        yield from sorted(folder_images + added, key=lambda i: _sortKey(i.filePath))
@@ -0,0 +1,142 @@
+#!python
+"""
+Pre-annotates a folder of camera images with a trained sub-image classifier,
+so that the human taggers don't have to start from empty images.
+
+The sub-images the model scores above the threshold are written into the folder's
+`__annotations.json` file (the file the tagger UI loads for the folder) as draft regions
+with the model's confidence, along with the model's confidence for each image.
+Images that a human has already tagged are left untouched.
+
+Usage:
+    python -m src.pre_annotation --model model.pt D:\\data\\some\\camera\\folder
+"""
+import argparse
+import os
+from typing import Union
+
+from src import model
+from src import data_serialization_json as json_serializer
+from src import frame_gate as fg
+from src import grouping
+from src import inference
+from src import tile_classifier as tc
+import tagger_ui.data_access_layer as dal
+
+
+def isHumanAnnotated(image_info: model.ImageInfo, viewed: bool = False) -> bool:
+    """Determines if a human has already tagged (or drawn regions on) the given image,
+    or looked at it in the tagger UI (`viewed`: at or before the collection's `maxViewed`),
+    where an image without any regions means that the human found nothing in it
+    """
+    return (
+        viewed
+        or image_info.tagged
+        or len(model.confirmedRegions(image_info.regions)) > 0
+    )
+
+
+def createDraftImageInfo(prediction: inference.FramePrediction) -> model.ImageInfo:
+    """Create the draft (untagged) image information from the model's prediction"""
+    regions: list[model.Region2d] = [
+        model.PredictedRegion2d(
+            t.region.x, t.region.y, t.region.w, t.region.h, confidence=t.score
+        )
+        for t in prediction.hotTiles
+    ]
+    return model.ImageInfo(False, prediction.filePath, regions, prediction.score)
+
+
+def preAnnotateDirectory(
+    classifier: tc.TileClassifier,
+    directory: str,
+    threshold: float,
+    frame_gate: Union[fg.FrameGate, None] = None,
+) -> model.ImagesCollection:
+    """Create the pre-annotated images collection for all the images in the given directory
+    (merged with the directory's existing annotations file, if there is one)
+    """
+    # Use the same list of images the tagger UI would use
+    file_paths = [a.filePath for a in dal.createAnnotatedImagesFromDirectory(directory)]
+
+    # The images a human has already annotated (or reviewed) are kept as they are
+    human_annotated: dict[str, model.ImageInfo] = {}
+    max_viewed, current_index = 0, 0
+    annotations_file = os.path.join(directory, dal.DIR_ANNOTATIONS_FILE_NAME)
+    if os.path.isfile(annotations_file):
+        collection = json_serializer.loadImagesCollectionFromJson(annotations_file)
+        human_annotated = {
+            info.filePath: info
+            for index, info in enumerate(collection.images)
+            if isHumanAnnotated(info, viewed=index <= collection.maxViewed)
+        }
+        max_viewed, current_index = collection.maxViewed, collection.currentIndex
+
+    # Only run the model over the images that a human hasn't already looked at
+    # (we still need their previous image in the group to calculate the difference)
+    image_groups = grouping.groupImages(
+        [model.ImageInfo(False, f, []) for f in file_paths]
+    )
+    frames = {f for f in file_paths if f not in human_annotated}
+    predictions: dict[str, inference.FramePrediction] = {
+        prediction.filePath: prediction
+        for prediction in inference.predictImageGroups(
+            classifier, image_groups, threshold, frame_gate, frames
+        )
+    }
+
+    images: list[model.ImageInfo] = []
+    for file_path in file_paths:
+        if file_path in human_annotated:
+            images.append(human_annotated[file_path])
+        elif file_path in predictions:
+            images.append(createDraftImageInfo(predictions[file_path]))
+        else:
+            images.append(model.ImageInfo(False, file_path, []))
+
+    return model.ImagesCollection(max_viewed, current_index, images)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Pre-annotate a folder of images with draft regions from a trained model"
+    )
+    parser.add_argument("directory", help="The folder of camera images to pre-annotate")
+    parser.add_argument(
+        "--model",
+        required=True,
+        help="The exported fastai learner (`learn.export()`), "
+        "or a `.pt`/`.onnx` model exported by `model_export`",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=inference.DEFAULT_THRESHOLD,
+        help="The sub-image score above which a draft region is created",
+    )
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="The number of CPU threads to use for inference",
+    )
+    inference.addFrameGateArgument(parser)
+    args = parser.parse_args()
+
+    inference.configureThreads(args.threads)
+    classifier = tc.loadClassifier(args.model)
+    frame_gate = inference.createFrameGate(args)
+    collection = preAnnotateDirectory(
+        classifier, args.directory, args.threshold, frame_gate
+    )
+
+    annotations_file = os.path.join(args.directory, dal.DIR_ANNOTATIONS_FILE_NAME)
+    json_serializer.saveImagesCollectionToJson(annotations_file, collection)
+    drafts = sum(1 for i in collection.images if i.confidence is not None)
+    print(f"Pre-annotated {drafts} of {len(collection.images)} images: {annotations_file}")
+    if frame_gate is not None:
+        print(frame_gate.summary())
+
+
+if __name__ == "__main__":
+    main()
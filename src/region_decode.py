@@ -0,0 +1,174 @@
+"""
+Decodes only the regions (sub-images) of a camera image that are actually needed,
+rather than the whole 12 MP frame.
+
+The image is opened lazily with Pillow, which only reads its header (the image size),
+then the regions are decoded with one of two backends:
+    - "turbojpeg": the optional `PyTurboJPEG` package (libjpeg-turbo) losslessly crops the JPEG
+      down to the MCUs (the 8 or 16 pixel blocks a JPEG is coded in) covering the region,
+      and only those are decoded. The decoded MCUs include a margin of one MCU around the
+      region where there is one, so that the upsampled colour at the edges of the region
+      is exactly the same as in the full image.
+    - "lazy": the whole image is decoded (by OpenCV, which is faster than Pillow) when the first
+      region is needed, and kept for the image's other regions. This is the fallback for when
+      TurboJPEG isn't installed, or the image isn't a JPEG.
+
+Both backends return the same BGR pixels as `cv2.imread`.
+Images that OpenCV would rotate (with an EXIF orientation), and images that aren't RGB or
+grayscale, can't be decoded one region at a time (`openRegionImage` returns None).
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Union
+
+import cv2
+import numpy as np
+from PIL import Image as pilImage
+
+from src import model
+
+# The EXIF orientation tag (`cv2.imread` rotates the image to this orientation)
+_EXIF_ORIENTATION = 0x0112
+
+# The MCU size (width, height) of each TurboJPEG chroma subsampling (`TJSAMP_*`)
+_MCU_SIZES = [(8, 8), (16, 8), (16, 16), (8, 8), (8, 16), (32, 8), (8, 32)]
+
+# The pixels around a warped region that are decoded for the bilinear interpolation
+_WARP_MARGIN = 2
+
+
+class RegionImage(ABC):
+    """An image that is decoded one region at a time"""
+
+    def __init__(self, file_path: str, size: model.Size2d):
+        self.filePath = file_path
+        self.size = size
+
+    @abstractmethod
+    def decode(self, box: model.Region2d) -> np.ndarray:
+        """Decode the region (which must be within the image) as a BGR image"""
+
+
+class LazyRegionImage(RegionImage):
+    """Decodes the whole image when the first region is needed, and crops the regions from it"""
+
+    def __init__(self, file_path: str, size: model.Size2d):
+        super().__init__(file_path, size)
+        self._image: Union[np.ndarray, None] = None
+
+    def decode(self, box: model.Region2d) -> np.ndarray:
+        if self._image is None:
+            self._image = cv2.imread(self.filePath)
+            if self._image is None:
+                raise OSError(f"Failed to decode: {self.filePath}")
+        return self._image[box.y : box.y + box.h, box.x : box.x + box.w].copy()
+
+
+class TurboJpegRegionImage(RegionImage):
+    """Losslessly crops each region's MCUs out of the JPEG, and only decodes those"""
+
+    def __init__(self, file_path: str, data: bytes, jpeg: Any):
+        width, height, subsample, _ = jpeg.decode_header(data)
+        super().__init__(file_path, model.Size2d(width, height))
+        self._data = data
+        self._jpeg = jpeg
+        self._mcu_size = _MCU_SIZES[subsample]
+
+    def _alignedRange(
+        self, start: int, length: int, mcu: int, size: int
+    ) -> tuple[int, int]:
+        """The MCU aligned range (start, length) covering the given range, plus one MCU"""
+        aligned_start = max(0, (start // mcu - 1) * mcu)
+        aligned_end = min(size, ((start + length + mcu - 1) // mcu + 1) * mcu)
+        return (aligned_start, aligned_end - aligned_start)
+
+    def decode(self, box: model.Region2d) -> np.ndarray:
+        from turbojpeg import TJPF_BGR  # type: ignore
+
+        mcu_width, mcu_height = self._mcu_size
+        x, w = self._alignedRange(box.x, box.w, mcu_width, self.size.width)
+        y, h = self._alignedRange(box.y, box.h, mcu_height, self.size.height)
+        cropped = self._jpeg.crop(self._data, x, y, w, h)
+        image = self._jpeg.decode(cropped, pixel_format=TJPF_BGR)
+        left, top = box.x - x, box.y - y
+        return np.ascontiguousarray(image[top : top + box.h, left : left + box.w])
+
+
+_turbo_jpeg: Any = None
+
+
+def loadTurboJpeg() -> Any:
+    """The shared `TurboJPEG` decoder (or None if `PyTurboJPEG` or libjpeg-turbo isn't installed)"""
+    global _turbo_jpeg
+    if _turbo_jpeg is None:
+        try:
+            from turbojpeg import TurboJPEG  # type: ignore
+
+            _turbo_jpeg = TurboJPEG()
+        except (ImportError, OSError, RuntimeError):
+            _turbo_jpeg = False
+    return _turbo_jpeg or None
+
+
+def openRegionImage(file_path: str, backend: str = "auto") -> Union[RegionImage, None]:
+    """Open an image to decode one region at a time (only its header is read)
+
+    Args:
+        file_path (str): The image file
+        backend (str): "turbojpeg", "lazy", or "auto" for TurboJPEG when it is installed
+            (and the image is a JPEG), otherwise lazy
+
+    Returns:
+        Union[RegionImage, None]: The image, or None if it can't be decoded one region at a time
+            (or at all)
+    """
+    assert backend in ("auto", "turbojpeg", "lazy")
+    try:
+        with pilImage.open(file_path) as image:
+            size = model.Size2d(*image.size)
+            is_jpeg = image.format == "JPEG"
+            supported = image.mode in ("RGB", "L") and (
+                image.getexif().get(_EXIF_ORIENTATION, 1) == 1
+            )
+    except OSError:
+        return None
+    if not supported:
+        return None
+
+    jpeg = loadTurboJpeg() if backend != "lazy" else None
+    if is_jpeg and jpeg is not None:
+        with open(file_path, "rb") as f:
+            return TurboJpegRegionImage(file_path, f.read(), jpeg)
+    if backend == "turbojpeg":
+        return None
+    return LazyRegionImage(file_path, size)
+
+
+def decodeWarpedRegion(
+    image: RegionImage, box: model.Region2d, transform: Union[np.ndarray, None]
+) -> np.ndarray:
+    """Decode the region of the image once it is warped with the (stabilisation) transform,
+    which matches the same region of the whole image warped by `image_stabalization.warpImage`
+    (to within the rounding of the interpolation)
+    """
+    if transform is None:
+        return image.decode(box)
+
+    # Find the area of the unwarped image that the region's pixels come from
+    # (at least one pixel of the image, for regions that are entirely outside of it)
+    inverse = cv2.invertAffineTransform(transform)
+    x = [box.x, box.x + box.w]
+    y = [box.y, box.y + box.h]
+    corners = np.array([[x[i], y[j]] for i in (0, 1) for j in (0, 1)], dtype=np.float64)
+    source = corners @ inverse[:, :2].T + inverse[:, 2]
+    width, height = image.size.width, image.size.height
+    left = min(max(int(np.floor(source[:, 0].min())) - _WARP_MARGIN, 0), width - 1)
+    top = min(max(int(np.floor(source[:, 1].min())) - _WARP_MARGIN, 0), height - 1)
+    right = min(max(int(np.ceil(source[:, 0].max())) + _WARP_MARGIN, left + 1), width)
+    bottom = min(max(int(np.ceil(source[:, 1].max())) + _WARP_MARGIN, top + 1), height)
+
+    # Warp the decoded area (with the transform moved to the area and region origins)
+    # so that the replicated border is the image's border
+    area = image.decode(model.Region2d(left, top, right - left, bottom - top))
+    local = transform.astype(np.float64).copy()
+    local[:, 2] += transform[:, :2] @ np.array([left, top]) - np.array([box.x, box.y])
+    return cv2.warpAffine(area, local, (box.w, box.h), borderMode=cv2.BORDER_REPLICATE)
@@ -0,0 +1,129 @@
+"""
+A ring of shared memory buffers ("slots") for passing decoded images between processes
+without pickling them.
+
+The producer process writes the images of a task into a free slot and sends the small
+`FrameHandle` to a worker process (through a normal multiprocessing queue),
+the worker reads the images straight out of the shared memory, and releases the slot
+(back onto the free slot queue) once it is finished with them.
+Since there are only a fixed number of slots, the producer automatically waits for the workers
+whenever it gets too far ahead of them.
+"""
+from dataclasses import dataclass
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Any, Sequence, Union
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class FrameHandle:
+    """Identifies the images written into a slot of the shared frame ring (cheap to pickle)"""
+
+    slot: int
+    shapes: tuple[tuple[int, ...], ...]
+    dtype: str
+
+
+def _readImages(buffer: memoryview, handle: FrameHandle) -> list[np.ndarray]:
+    """Create the image views of the images in the given slot buffer"""
+    images: list[np.ndarray] = []
+    offset = 0
+    dtype = np.dtype(handle.dtype)
+    for shape in handle.shapes:
+        image = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        images.append(image)
+        offset += image.nbytes
+    return images
+
+
+class SharedFrameRing:
+    """The producer side of the shared frame ring, which owns the shared memory"""
+
+    def __init__(self, slot_count: int, slot_bytes: int, context: Any = None):
+        """Create the shared memory ring
+
+        Args:
+            slot_count (int): The number of slots (the most tasks that can be in flight at once)
+            slot_bytes (int): The size of each slot (all the images of a task must fit)
+            context (Any): The multiprocessing context the workers are started with
+        """
+        assert slot_count > 0 and slot_bytes > 0
+        context = context or multiprocessing.get_context()
+        self._slot_bytes = slot_bytes
+        self._buffers = [
+            shared_memory.SharedMemory(create=True, size=slot_bytes)
+            for _ in range(slot_count)
+        ]
+        self._free_slots = context.Queue()
+        for slot in range(slot_count):
+            self._free_slots.put(slot)
+
+    @property
+    def names(self) -> list[str]:
+        """The names of the shared memory buffers (for the workers to attach to)"""
+        return [b.name for b in self._buffers]
+
+    @property
+    def freeSlots(self) -> Any:
+        """The queue of free slots (the workers put their slots back on this queue)"""
+        return self._free_slots
+
+    def fits(self, images: Sequence[np.ndarray]) -> bool:
+        """Determines if the images fit within a single slot"""
+        return sum(i.nbytes for i in images) <= self._slot_bytes
+
+    def write(
+        self, images: Sequence[np.ndarray], timeout: Union[float, None] = None
+    ) -> FrameHandle:
+        """Copy the images into the next free slot (waiting for a free slot if need be)
+
+        Args:
+            images (Sequence[np.ndarray]): The images (all with the same dtype) to copy
+            timeout (Union[float, None]): How long to wait for a free slot (forever if None)
+
+        Returns:
+            FrameHandle: The handle to send to a worker
+        """
+        assert self.fits(images)
+        assert len({i.dtype for i in images}) <= 1
+        slot = self._free_slots.get(timeout=timeout)
+        handle = FrameHandle(
+            slot,
+            tuple(tuple(i.shape) for i in images),
+            str(images[0].dtype) if images else "uint8",
+        )
+        for target, image in zip(_readImages(self._buffers[slot].buf, handle), images):
+            target[...] = image
+        return handle
+
+    def close(self) -> None:
+        """Release (and delete) all the shared memory"""
+        for buffer in self._buffers:
+            buffer.close()
+            buffer.unlink()
+        self._buffers = []
+
+
+class SharedFrameReader:
+    """The worker side of the shared frame ring"""
+
+    def __init__(self, names: list[str], free_slots: Any):
+        self._buffers = [shared_memory.SharedMemory(name=name) for name in names]
+        self._free_slots = free_slots
+
+    def read(self, handle: FrameHandle) -> list[np.ndarray]:
+        """The images in the handle's slot.
+        These are views of the shared memory, so they are only valid until the slot is released.
+        """
+        return _readImages(self._buffers[handle.slot].buf, handle)
+
+    def release(self, handle: FrameHandle) -> None:
+        """Give the slot back to the producer (the slot's images must no longer be used)"""
+        self._free_slots.put(handle.slot)
+
+    def close(self) -> None:
+        for buffer in self._buffers:
+            buffer.close()
+        self._buffers = []
@@ -0,0 +1,353 @@
+"""
+A PyTorch dataset that streams the training sub-images (tiles) straight from the original
+images in `animals.json`, so the model can be trained without first extracting the sub-images
+to disk (see `training_sub_image_extraction.py`).
+
+Each image pair is decoded, stabilised, diffed and tiled on the fly in the same way as the
+extraction, with the image groups shared out between the data loader's worker processes.
+The positive and (sampled) negative tiles are pooled, and returned as ready-made batches that
+are half positive and half negative - so training starts within seconds of launching it,
+rather than after a full extraction run and a walk of the sub-image folders.
+"""
+from typing import Any, Iterator, Sequence, Union
+
+import numpy as np
+import torch
+from torch.utils.data import IterableDataset, get_worker_info
+
+from src import augmentation
+from src import data_serialization_json as ds
+from src import dataset_stats as stats
+from src import extraction_config as ec
+from src import grouping
+from src import image_stabalization as stab
+from src import model
+from src import sub_image_regions as sir
+from src import tile_dataset
+from src import tile_motion as tm
+from src import training_sub_image_extraction as extraction
+
+# A tile sample: the (uint8 HxWxC) tile, its transform ID and its tag (like `TileIndexDataset`)
+TileSample = tuple[np.ndarray, int, bool]
+
+# The default number of samples each worker holds in each of its positive and negative pools
+DEFAULT_POOL_SIZE = 1024
+
+
+def splitImageGroups(
+    groups: Sequence[list[model.ImageInfo]], valid_pct: float, seed: int
+) -> tuple[list[list[model.ImageInfo]], list[list[model.ImageInfo]]]:
+    """Randomly split the image groups into training and validation groups.
+    The split is done by group, since the images within a group are nearly identical.
+    """
+    rng = np.random.default_rng(seed)
+    valid_count = int(len(groups) * valid_pct)
+    valid_groups = set(rng.choice(len(groups), size=valid_count, replace=False).tolist())
+
+    train: list[list[model.ImageInfo]] = []
+    valid: list[list[model.ImageInfo]] = []
+    for i, group in enumerate(groups):
+        (valid if i in valid_groups else train).append(group)
+    return (train, valid)
+
+
+def stabilisePreviousImage(
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    previous_image: Any,
+    current_image: Any,
+    transform_cache: Union[stab.TransformCache, None] = None,
+    estimator: Union[stab.PairTransformEstimator, None] = None,
+) -> Any:
+    """Warp the previous image so that it lines up with the current image
+    (using the transform cached by an earlier extraction run, if there is one,
+    otherwise estimated with the given estimator, which re-uses the previous pair's image)
+    """
+    previous_path, current_path = previous_info.filePath, image_info.filePath
+    if transform_cache is not None and transform_cache.contains(
+        previous_path, current_path
+    ):
+        transform = transform_cache.get(current_path)
+    else:
+        estimator = estimator or stab.PairTransformEstimator()
+        transform = estimator.estimate(
+            previous_path, current_path, previous_image, current_image
+        )
+
+    if transform is None:
+        return previous_image
+    return stab.warpImage(previous_image, transform)
+
+
+def createPairTileSamples(
+    image_info: model.ImageInfo,
+    previous_image: Any,
+    current_image: Any,
+    config: ec.ExtractionConfig,
+    rng: np.random.Generator,
+    augment: bool = True,
+) -> list[TileSample]:
+    """Diff and tile a decoded (and stabilised) image pair, into the same tiles
+    `training_sub_image_extraction` would save.
+    Only the positive tiles and the sampled negative tiles are sliced and diffed.
+
+    Args:
+        image_info (model.ImageInfo): The current image information (with the tagged regions)
+        previous_image (Any): The previous image (which is subtracted from the current image)
+        current_image (Any): The current image
+        config (ec.ExtractionConfig): The tiling and negative sampling settings
+        rng (np.random.Generator): The random number generator to sample the negatives with
+        augment (bool): Whether each positive tile is a sample for every transform
+            (like the extraction's augmentation), or just once
+
+    Returns:
+        list[TileSample]: The positive and sampled negative tiles
+    """
+    height, width = current_image.shape[0], current_image.shape[1]
+    levels = sir.getTilePyramid(
+        config.blockSize, model.Size2d(width, height), config.tileStride, config.tileScales
+    )
+    previous_images = sir.createImagePyramid(previous_image, levels)
+    current_images = sir.createImagePyramid(current_image, levels)
+    region_index = model.RegionIndex(model.confirmedRegions(image_info.regions))
+    positive_transforms = range(len(augmentation.TRANSFORMS)) if augment else range(1)
+
+    samples: list[TileSample] = []
+    for level, previous_level, current_level in zip(
+        levels, previous_images, current_images
+    ):
+        tags = region_index.intersectsAnyBatch(level.regions)
+        if config.negativeSamplingPolicy is not None:
+            motion_image = tm.createMotionImage(previous_level, current_level)
+            motion_scores = tm.calculateTileMotionScores(motion_image, level.grid.boxes)
+            keep = tm.sampleNegativeTiles(motion_scores, config.negativeSamplingPolicy, rng)
+        else:
+            keep = rng.random(len(tags)) < config.negativeSampleRate
+
+        indexes = np.flatnonzero(tags | keep)
+        if len(indexes) == 0:
+            continue
+        tiles = extraction.calculate_image_diff(
+            level.grid.extractTiles(previous_level, indexes),
+            level.grid.extractTiles(current_level, indexes),
+        )
+        for tile, tagged in zip(tiles, tags[indexes].tolist()):
+            if tagged:
+                samples.extend((tile, t, True) for t in positive_transforms)
+            else:
+                samples.append((tile, 0, False))
+    return samples
+
+
+def _addToPool(
+    pool: list[TileSample], sample: TileSample, pool_size: int, rng: np.random.Generator
+) -> None:
+    """Add the sample to the pool, replacing a random sample once the pool is full"""
+    if len(pool) < pool_size:
+        pool.append(sample)
+    else:
+        pool[int(rng.integers(pool_size))] = sample
+
+
+def _takeSamples(
+    pool: list[TileSample], count: int, rng: np.random.Generator
+) -> list[TileSample]:
+    """Remove (and return) random samples from the pool"""
+    indexes = rng.choice(len(pool), size=count, replace=False).tolist()
+    taken: list[TileSample] = []
+    for i in sorted(indexes, reverse=True):
+        taken.append(pool[i])
+        pool[i] = pool[-1]
+        pool.pop()
+    return taken
+
+
+class StreamingTileDataset(IterableDataset):  # type: ignore
+    """Streams balanced batches of tiles from image groups.
+    Each item is a whole batch: a tuple of the float NxCxHxW images (0 to 1) and the integer
+    labels (1 for tagged, 0 otherwise), like `tile_dataset.collateTiles` - so use it with a data
+    loader that doesn't batch (e.g. `batch_size=None`).
+
+    With data loader worker processes, each worker streams its own share of the image groups
+    (or of the image pairs, when there are fewer groups than workers).
+    Every pass visits the groups in a new random order, unless there's a `seed`, in which case
+    every pass returns exactly the same batches (which is what's wanted for validation).
+    """
+
+    def __init__(
+        self,
+        groups: Sequence[list[model.ImageInfo]],
+        config: ec.ExtractionConfig,
+        batch_size: int = 32,
+        augment: bool = True,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        seed: Union[int, None] = None,
+        repeat: bool = True,
+        transform_cache_file: Union[str, None] = None,
+    ):
+        """
+        Args:
+            groups (Sequence[list[model.ImageInfo]]): The image groups (see `grouping.groupImages`)
+            config (ec.ExtractionConfig): The tiling, stabilisation and negative sampling settings
+            batch_size (int): The number of tiles in each batch (half of them positive)
+            augment (bool): Whether the positive tiles are augmented with every transform
+            pool_size (int): The samples each worker holds in each of its positive and
+                negative pools (the batches are drawn at random from the pools)
+            seed (Union[int, None]): The seed for a repeatable stream
+            repeat (bool): Whether to keep streaming the groups once they've all been visited
+                (the data loader then decides how many batches are in an epoch)
+            transform_cache_file (Union[str, None]): The stabilisation transforms cached by an
+                earlier extraction run (see `image_stabalization.TransformCache`)
+        """
+        assert batch_size >= 2
+        assert pool_size >= batch_size
+        self._groups = [list(g) for g in groups if len(g) > 1]
+        self._config = config
+        self._batch_size = batch_size
+        self._augment = augment
+        self._pool_size = pool_size
+        self._seed = seed
+        self._repeat = repeat
+        self._transform_cache_file = transform_cache_file
+
+    @property
+    def groups(self) -> list[list[model.ImageInfo]]:
+        """The image groups with at least one image pair"""
+        return self._groups
+
+    @property
+    def pairCount(self) -> int:
+        """The number of image pairs (the most data loader workers that can share the stream)"""
+        return sum(len(g) - 1 for g in self._groups)
+
+    def _workerGroups(
+        self, worker_id: int, worker_count: int
+    ) -> list[list[model.ImageInfo]]:
+        """The worker's share of the image groups, or of the image pairs (as two image groups)
+        when there are too few groups to give every worker some (which would cut epochs short)
+        """
+        if len(self._groups) >= worker_count:
+            return self._groups[worker_id::worker_count]
+        pairs = [list(p) for g in self._groups for p in zip(g, g[1:])]
+        return pairs[worker_id::worker_count]
+
+    def _createRng(self, worker_info: Any) -> np.random.Generator:
+        worker_id = 0 if worker_info is None else worker_info.id
+        if self._seed is not None:
+            return np.random.default_rng([self._seed, worker_id])
+        if worker_info is not None:
+            # PyTorch gives each worker a different seed for every pass
+            return np.random.default_rng(worker_info.seed)
+        return np.random.default_rng()
+
+    def __iter__(self) -> Iterator[tuple[torch.Tensor, torch.Tensor]]:
+        worker_info = get_worker_info()
+        worker_id, worker_count = (
+            (0, 1) if worker_info is None else (worker_info.id, worker_info.num_workers)
+        )
+        rng = self._createRng(worker_info)
+        groups = self._workerGroups(worker_id, worker_count)
+        transform_cache = (
+            stab.TransformCache(self._transform_cache_file)
+            if self._transform_cache_file and self._config.stabiliseImages
+            else None
+        )
+
+        positives: list[TileSample] = []
+        negatives: list[TileSample] = []
+        positive_count = self._batch_size // 2
+        negative_count = self._batch_size - positive_count
+        image_cache = extraction.ImageCache()
+        estimator = stab.PairTransformEstimator()
+        while groups:
+            batch_count = 0
+            for group_index in rng.permutation(len(groups)).tolist():
+                group = groups[group_index]
+                for previous_info, image_info in zip(group, group[1:]):
+                    previous_image = image_cache.load(previous_info.filePath)
+                    current_image = image_cache.load(image_info.filePath)
+                    if (
+                        previous_image is None
+                        or current_image is None
+                        or previous_image.shape != current_image.shape
+                    ):
+                        continue
+
+                    if self._config.stabiliseImages:
+                        previous_image = stabilisePreviousImage(
+                            previous_info,
+                            image_info,
+                            previous_image,
+                            current_image,
+                            transform_cache,
+                            estimator,
+                        )
+                    for sample in createPairTileSamples(
+                        image_info,
+                        previous_image,
+                        current_image,
+                        self._config,
+                        rng,
+                        self._augment,
+                    ):
+                        pool = positives if sample[2] else negatives
+                        _addToPool(pool, sample, self._pool_size, rng)
+
+                    while (
+                        len(positives) >= positive_count
+                        and len(negatives) >= negative_count
+                    ):
+                        batch_count += 1
+                        yield tile_dataset.collateTiles(
+                            _takeSamples(positives, positive_count, rng)
+                            + _takeSamples(negatives, negative_count, rng)
+                        )
+
+            # Stop if a whole pass didn't produce a single batch (e.g. nothing is tagged)
+            if not self._repeat or batch_count == 0:
+                return
+
+    def new_empty(self) -> "StreamingTileDataset":
+        """An empty copy of this dataset (fastai uses this when exporting a learner)"""
+        return StreamingTileDataset([], self._config, self._batch_size, self._augment)
+
+    def estimateBatchCount(self) -> int:
+        """Estimate the number of batches in a single pass over the image groups
+        (the positive samples over the positive samples in each batch), without decoding
+        the images (see `dataset_stats.countExtractionTiles`)
+        """
+        table = stats.createImageTable(image for group in self._groups for image in group)
+        counts = stats.countExtractionTiles(
+            table, self._config, stats.readCameraImageSizes(table)
+        )
+        transform_count = len(augmentation.TRANSFORMS) if self._augment else 1
+        return max(1, counts.positiveTiles * transform_count // (self._batch_size // 2))
+
+
+def loadStreamingDatasets(
+    images_file: str,
+    config: ec.ExtractionConfig,
+    valid_pct: float = 0.2,
+    seed: int = 42,
+    batch_size: int = 32,
+    transform_cache_file: Union[str, None] = None,
+) -> tuple[StreamingTileDataset, StreamingTileDataset]:
+    """Load the training and validation datasets from the given images `.json` data file
+    (the validation dataset isn't augmented, and returns the same batches every pass)
+    """
+    collection = ds.loadImagesCollectionFromJson(images_file)
+    groups = grouping.groupImages(collection.images)
+    train, valid = splitImageGroups(groups, valid_pct, seed)
+    return (
+        StreamingTileDataset(
+            train, config, batch_size, transform_cache_file=transform_cache_file
+        ),
+        StreamingTileDataset(
+            valid,
+            config,
+            batch_size,
+            augment=False,
+            seed=seed,
+            transform_cache_file=transform_cache_file,
+        ),
+    )
@@ -1,9 +1,16 @@
-from typing import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Union
+
+import cv2
+import numpy as np
 
 import src.model as model
 
 
-def createSubImageOffsets(block_size: int, image_size: int) -> Iterable[int]:
+def createSubImageOffsets(
+    block_size: int, image_size: int, stride: Union[int, None] = None
+) -> Iterable[int]:
     """Create the list of x/y-offsets within a larger image where we should extract
         smaller sub-images.
         This function is generic, and can be used for either the x or y offsets.
@@ -21,18 +28,23 @@ def createSubImageOffsets(block_size: int, image_size: int) -> Iterable[int]:
         image_size (int): The size of the larger image
                           (either the width or the height of the image).
 
+        stride (Union[int, None]): The distance between the offsets
+                          (defaults to the block size, so the sub-images don't overlap)
+
     Returns:
         Iterable[int]: The collection of offsets all the smaller images to extract
     """
     assert block_size < image_size
+    stride = block_size if stride is None else stride
+    assert stride > 0
 
-    endRange = image_size - (image_size % block_size)
-    for i in range(0, endRange, block_size):
+    lastOffset = image_size - block_size
+    for i in range(0, lastOffset + 1, stride):
         yield i
 
     # Optional last entry if left over pixels
-    if image_size % block_size > 0:
-        yield image_size - block_size
+    if lastOffset % stride > 0:
+        yield lastOffset
 
 
 def createSubImageRegions(
@@ -48,21 +60,142 @@ def createSubImageRegions(
     Returns:
         Iterable[model.Region]: All of the region within the larger image to extract
     """
-    assert block_size.width < image_size.width
-    assert block_size.height < image_size.height
+    return iter(getTileGrid(block_size, image_size).regions)
+
+
+class TileGrid:
+    """All of the sub-image (tile) regions of an image of a particular size.
+
+    The tile offsets are held as NumPy arrays (for batch operations), and the tile regions
+    are only created once, so use `getTileGrid` to share the same grid between all the
+    images of the same size.
+    The tiles are ordered row by row (top to bottom), left to right within each row.
+    """
+
+    def __init__(
+        self,
+        block_size: model.Size2d,
+        image_size: model.Size2d,
+        stride: Union[model.Size2d, None] = None,
+    ):
+        assert block_size.width < image_size.width
+        assert block_size.height < image_size.height
+        stride = block_size if stride is None else stride
+
+        self._block_size = block_size
+        self._image_size = image_size
+        self._stride = stride
+        self._x_offsets = np.fromiter(
+            createSubImageOffsets(block_size.width, image_size.width, stride.width),
+            dtype=np.int32,
+        )
+        self._y_offsets = np.fromiter(
+            createSubImageOffsets(block_size.height, image_size.height, stride.height),
+            dtype=np.int32,
+        )
+
+        # Every tile's (x, y, w, h), in the same row by row order as the regions
+        ys, xs = np.meshgrid(self._y_offsets, self._x_offsets, indexing="ij")
+        count = xs.size
+        self._boxes = np.empty((count, 4), dtype=np.int32)
+        self._boxes[:, 0] = xs.ravel()
+        self._boxes[:, 1] = ys.ravel()
+        self._boxes[:, 2] = block_size.width
+        self._boxes[:, 3] = block_size.height
+        for array in (self._x_offsets, self._y_offsets, self._boxes):
+            array.setflags(write=False)
+
+        self._regions = tuple(
+            model.Region2d(x=int(x), y=int(y), w=block_size.width, h=block_size.height)
+            for x, y, _, _ in self._boxes
+        )
+
+    @property
+    def blockSize(self) -> model.Size2d:
+        """The size of each tile"""
+        return self._block_size
+
+    @property
+    def imageSize(self) -> model.Size2d:
+        """The size of the image the tiles cover"""
+        return self._image_size
+
+    @property
+    def stride(self) -> model.Size2d:
+        """The distance between neighbouring tiles"""
+        return self._stride
 
-    # Grab all the offsets once (and turn them into lists, we'll reuse them)
-    xOffsets = list(createSubImageOffsets(block_size.width, image_size.width))
-    yOffsets = list(createSubImageOffsets(block_size.height, image_size.height))
+    @property
+    def xOffsets(self) -> np.ndarray:
+        """The (read-only) x offset of each column of tiles"""
+        return self._x_offsets
+
+    @property
+    def yOffsets(self) -> np.ndarray:
+        """The (read-only) y offset of each row of tiles"""
+        return self._y_offsets
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """The (read-only) `int32[N, 4]` array of every tile's (x, y, w, h)"""
+        return self._boxes
+
+    @property
+    def regions(self) -> tuple[model.Region2d, ...]:
+        """Every tile's region"""
+        return self._regions
+
+    def __len__(self) -> int:
+        return len(self._regions)
+
+    def __iter__(self) -> Iterator[model.Region2d]:
+        return iter(self._regions)
+
+    def extractTiles(
+        self, image: Any, indexes: Union[Iterable[int], None] = None
+    ) -> np.ndarray:
+        """Copy the tiles out of the image into a single `N x H x W (x C)` array
+
+        Args:
+            image (Any): The image (or image difference) the size of this grid's image
+            indexes (Union[Iterable[int], None]): The indexes of the tiles to extract
+                (defaults to all of them)
+
+        Returns:
+            np.ndarray: The tiles, in the same order as the indexes
+        """
+        boxes = self._boxes if indexes is None else self._boxes[list(indexes)]
+        w, h = self._block_size.width, self._block_size.height
+        tiles = np.empty((len(boxes), h, w) + image.shape[2:], dtype=image.dtype)
+        for i, (x, y, _, _) in enumerate(boxes):
+            tiles[i] = image[y : y + h, x : x + w]
+        return tiles
+
+
+@lru_cache(maxsize=32)
+def getTileGrid(
+    block_size: model.Size2d,
+    image_size: model.Size2d,
+    stride: Union[model.Size2d, None] = None,
+) -> TileGrid:
+    """Get the (shared) tile grid for images of the given size
+    (the grid is only created the first time it's asked for)
+
+    Args:
+        block_size (model.Size2d): The size of each tile
+        image_size (model.Size2d): The size of the image
+        stride (Union[model.Size2d, None]): The distance between neighbouring tiles
+            (defaults to the block size, so the tiles don't overlap)
 
-    # Convert our offsets into regions
-    for y in yOffsets:
-        for x in xOffsets:
-            yield model.Region2d(x=x, y=y, w=block_size.width, h=block_size.height)
+    Returns:
+        TileGrid: The tile grid
+    """
+    return TileGrid(block_size, image_size, stride)
 
 
 def createSubImageTaggedRegions(
-    sub_image_regions: Iterable[model.Region2d], tagged_regions: list[model.Region2d]
+    sub_image_regions: Iterable[model.Region2d],
+    tagged_regions: Union[list[model.Region2d], model.RegionIndex],
 ) -> Iterable[model.TaggedRegion2d]:
     """Generates the various regions (and tags them based on the given tagged_regions in the
         original image) that can now be be extracted from the image,
@@ -71,14 +204,114 @@ def createSubImageTaggedRegions(
     Args:
         block_size (model.Size): The size of the sub-images to extract
         image_size (model.Size): The size of the larger image
-        tagged_regions (list[model.Region]):
+        tagged_regions (Union[list[model.Region], model.RegionIndex]):
             The list of tagged regions within the image
             that will cause the sub-images to also be tagged
+            (or the spatial index of them, which is much faster with lots of tagged regions)
 
     Returns:
         Iterable[model.TaggedRegion]: A collection of tagged sub-regions for the image
             that can now be extracted and saved as training data.
     """
-    for r in sub_image_regions:
-        tagged = model.intersectsAny(r, tagged_regions)
+    # Test every sub-image against every tagged region in one batch
+    # (or against only the nearby tagged regions, with the spatial index)
+    regions = list(sub_image_regions)
+    if isinstance(tagged_regions, model.RegionIndex):
+        tags = tagged_regions.intersectsAnyBatch(regions)
+    else:
+        tags = model.RegionArray.fromRegions(regions).intersectsAny(tagged_regions)
+    for r, tagged in zip(regions, tags.tolist()):
         yield model.TaggedRegion2d(x=r.x, y=r.y, w=r.w, h=r.h, tag=tagged)
+
+
+# ##################################################################################################
+# region Multi-scale tiling
+# ##################################################################################################
+
+
+def scaleImageSize(image_size: model.Size2d, scale: float) -> model.Size2d:
+    """The size of the image once it is scaled by the given factor"""
+    return model.Size2d(
+        int(round(image_size.width * scale)), int(round(image_size.height * scale))
+    )
+
+
+@dataclass(frozen=True)
+class TilePyramidLevel:
+    """The tiles of a single (scaled) level of an image pyramid"""
+
+    # The scale of this level's image compared to the full size image
+    scale: float
+
+    # The tiles within this level's (scaled) image
+    grid: TileGrid
+
+    # The tiles' regions scaled back up to the full size image
+    # (these are the regions used for tagging, and for naming the sub-image files)
+    regions: tuple[model.Region2d, ...]
+
+
+@lru_cache(maxsize=32)
+def getTilePyramid(
+    block_size: model.Size2d,
+    image_size: model.Size2d,
+    stride: Union[model.Size2d, None] = None,
+    scales: tuple[float, ...] = (1.0,),
+) -> tuple[TilePyramidLevel, ...]:
+    """Get the (shared) tiles of each level of an image pyramid.
+    The same block size (and stride) is used at every level, so the tiles of the smaller
+    levels cover larger areas of the full size image (to find larger animals),
+    and an overlapping stride stops smaller animals being split across tile borders.
+
+    Args:
+        block_size (model.Size2d): The size of each tile
+        image_size (model.Size2d): The size of the full size image
+        stride (Union[model.Size2d, None]): The distance between neighbouring tiles
+            (defaults to the block size, so the tiles don't overlap)
+        scales (tuple[float, ...]): The scale of each level (largest first), e.g. (1.0, 0.5, 0.25)
+            Any level smaller than a single tile is left out.
+
+    Returns:
+        tuple[TilePyramidLevel, ...]: The tiles of each level
+    """
+    assert list(scales) == sorted(scales, reverse=True)
+
+    levels: list[TilePyramidLevel] = []
+    for scale in scales:
+        level_size = scaleImageSize(image_size, scale)
+        if level_size.width <= block_size.width or level_size.height <= block_size.height:
+            continue
+
+        grid = getTileGrid(block_size, level_size, stride)
+        regions = tuple(
+            model.Region2d(
+                x=int(round(x / scale)),
+                y=int(round(y / scale)),
+                w=int(round(w / scale)),
+                h=int(round(h / scale)),
+            )
+            for x, y, w, h in grid.boxes
+        )
+        levels.append(TilePyramidLevel(scale, grid, regions))
+    return tuple(levels)
+
+
+def createImagePyramid(image: Any, levels: Iterable[TilePyramidLevel]) -> list[Any]:
+    """Create the scaled image for each pyramid level.
+    Each level is shrunk from the previous (larger) level rather than from the full size image,
+    so the full size image is only decoded (and read) once.
+    """
+    image_size = model.Size2d(image.shape[1], image.shape[0])
+    results: list[Any] = []
+    current = image
+    for level in levels:
+        size = scaleImageSize(image_size, level.scale)
+        if (current.shape[1], current.shape[0]) != (size.width, size.height):
+            current = cv2.resize(
+                current, (size.width, size.height), interpolation=cv2.INTER_AREA
+            )
+        results.append(current)
+    return results
+
+
+# endregion
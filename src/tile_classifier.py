@@ -0,0 +1,128 @@
+"""
+Runs a trained sub-image (tile) classifier over batches of sub-images.
+
+The classifier is a plain PyTorch module, so running it doesn't need the fastai training stack
+(other than `loadFastaiLearner`, which imports fastai only when it is called).
+The models exported by `model_export.py` (TorchScript or ONNX) load without fastai at all.
+"""
+import os
+from typing import Any
+
+import numpy as np
+import torch
+
+# The ImageNet normalization statistics fastai uses for pre-trained models
+# (fastai adds this normalization to the data loaders, not to the model itself)
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# The output index of the "there is an animal" (`True`) class
+ANIMAL_CLASS_INDEX = 1
+
+# The file extensions of the models exported by `model_export.py`
+TORCHSCRIPT_EXTENSION = ".pt"
+ONNX_EXTENSION = ".onnx"
+
+
+class TileClassifier:
+    """Wraps a trained PyTorch classifier to score batches of uint8 sub-images.
+
+    The sub-images must have the same channel order as the training sub-images.
+    The training sub-images are the OpenCV (BGR) image differences saved directly by Pillow,
+    so fastai loads them back in that same order - which means the BGR image differences
+    from `training_sub_image_extraction` can be passed in as-is.
+    """
+
+    def __init__(self, module: torch.nn.Module, normalize: bool = True):
+        self._module = module.eval()
+        self._normalize = normalize
+        self._mean = torch.tensor(IMAGENET_MEAN).view(1, 3, 1, 1)
+        self._std = torch.tensor(IMAGENET_STD).view(1, 3, 1, 1)
+
+    @property
+    def module(self) -> torch.nn.Module:
+        """The underlying PyTorch module"""
+        return self._module
+
+    def createBatch(self, tiles: np.ndarray) -> torch.Tensor:
+        """Convert NxHxWxC uint8 sub-images into the model's NxCxHxW float input tensor"""
+        batch = torch.from_numpy(np.ascontiguousarray(tiles))
+        batch = batch.permute(0, 3, 1, 2).float().div_(255.0)
+        if self._normalize:
+            batch = (batch - self._mean) / self._std
+        return batch
+
+    def predict(self, tiles: np.ndarray) -> np.ndarray:
+        """Score a batch of sub-images
+
+        Args:
+            tiles (np.ndarray): NxHxWxC uint8 sub-images
+
+        Returns:
+            np.ndarray: The probability that each sub-image contains an animal
+        """
+        if len(tiles) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        with torch.inference_mode():
+            logits = self._module(self.createBatch(tiles))
+            probabilities = torch.softmax(logits, dim=1)[:, ANIMAL_CLASS_INDEX]
+        return probabilities.numpy()
+
+
+def loadFastaiLearner(file_name: str) -> TileClassifier:
+    """Load a fastai learner exported with `learn.export()`
+    (this imports the entire fastai stack, which is slow)
+    """
+    from fastai.learner import load_learner  # type: ignore
+
+    learn: Any = load_learner(file_name, cpu=True)
+    return TileClassifier(learn.model.cpu())
+
+
+def loadTorchScriptModel(file_name: str) -> TileClassifier:
+    """Load a TorchScript model exported by `model_export.py`
+    (the normalization is built into the model)
+    """
+    module = torch.jit.load(file_name, map_location="cpu")
+    return TileClassifier(module, normalize=False)
+
+
+class OnnxModule(torch.nn.Module):
+    """Runs an ONNX model exported by `model_export.py` with ONNX Runtime,
+    as if it were a PyTorch module
+    """
+
+    def __init__(self, file_name: str):
+        super().__init__()
+        import onnxruntime  # type: ignore
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        self._session = onnxruntime.InferenceSession(
+            file_name, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def forward(self, images: torch.Tensor) -> torch.Tensor:
+        outputs = self._session.run(None, {self._input_name: images.numpy()})
+        return torch.from_numpy(outputs[0])
+
+
+def loadOnnxModel(file_name: str) -> TileClassifier:
+    """Load an ONNX model exported by `model_export.py`
+    (this needs the optional `onnxruntime` package)
+    """
+    return TileClassifier(OnnxModule(file_name), normalize=False)
+
+
+def loadClassifier(file_name: str) -> TileClassifier:
+    """Load an exported TorchScript (`.pt`) or ONNX (`.onnx`) model,
+    or a fastai learner exported with `learn.export()` (any other file)
+    """
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension == TORCHSCRIPT_EXTENSION:
+        return loadTorchScriptModel(file_name)
+    if extension == ONNX_EXTENSION:
+        return loadOnnxModel(file_name)
+    return loadFastaiLearner(file_name)
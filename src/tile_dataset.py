@@ -0,0 +1,93 @@
+"""
+A PyTorch dataset over the tile index (see `tile_index.py`) of the extracted sub-images.
+
+Each sample is loaded from its sub-image file, and the rotation/flip recorded in the tile index
+is applied to the whole batch at once by `collateTiles`, so the positive sub-images only have
+to be encoded and stored once, no matter how many ways they are augmented.
+"""
+from typing import Sequence
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+
+from src import augmentation
+from src import tile_index as ti
+
+
+class TileIndexDataset(Dataset):  # type: ignore
+    """The training samples from a tile index.
+    Each item is a tuple of (uint8 HxWxC image, transform ID, tag)
+    """
+
+    def __init__(self, entries: Sequence[ti.TileIndexEntry]):
+        self._entries = list(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, int, bool]:
+        entry = self._entries[index]
+        with Image.open(entry.filePath) as image:
+            pixels = np.asarray(image.convert("RGB"))
+        return (pixels, augmentation.transformId(entry.transform), entry.tag)
+
+    @property
+    def entries(self) -> list[ti.TileIndexEntry]:
+        """The tile index entries for each sample in this dataset"""
+        return self._entries
+
+    def new_empty(self) -> "TileIndexDataset":
+        """An empty copy of this dataset (fastai uses this when exporting a learner)"""
+        return TileIndexDataset([])
+
+
+def collateTiles(
+    samples: Sequence[tuple[np.ndarray, int, bool]]
+) -> tuple[torch.Tensor, torch.Tensor]:
+    """Collate the samples from a `TileIndexDataset` into a batch,
+    applying each sample's rotation/flip to the whole batch at once.
+
+    Returns:
+        tuple[torch.Tensor, torch.Tensor]: The float NxCxHxW images (0 to 1), and the
+            integer labels (1 for tagged, 0 otherwise)
+    """
+    images = np.stack([s[0] for s in samples])
+    transform_ids = [s[1] for s in samples]
+    images = augmentation.applyTransformsToBatch(images, transform_ids, axes=(1, 2))
+
+    batch = torch.from_numpy(images).permute(0, 3, 1, 2).float().div_(255.0)
+    labels = torch.tensor([int(s[2]) for s in samples], dtype=torch.long)
+    return (batch, labels)
+
+
+def splitTileIndex(
+    entries: Sequence[ti.TileIndexEntry], valid_pct: float, seed: int
+) -> tuple[list[ti.TileIndexEntry], list[ti.TileIndexEntry]]:
+    """Randomly split the tile index into training and validation entries.
+    The split is done by source sub-image, so that the augmented copies of a sub-image
+    (whether they're transformed when loaded, or saved to their own files) are never split
+    between the training and validation sets.
+    """
+    sources = sorted({ti.sourceTilePath(e.filePath) for e in entries})
+    rng = np.random.default_rng(seed)
+    valid_count = int(len(sources) * valid_pct)
+    valid_sources = set(rng.choice(sources, size=valid_count, replace=False).tolist())
+
+    train: list[ti.TileIndexEntry] = []
+    valid: list[ti.TileIndexEntry] = []
+    for entry in entries:
+        is_valid = ti.sourceTilePath(entry.filePath) in valid_sources
+        (valid if is_valid else train).append(entry)
+    return (train, valid)
+
+
+def loadTileIndexDatasets(
+    index_file: str, valid_pct: float = 0.2, seed: int = 42
+) -> tuple[TileIndexDataset, TileIndexDataset]:
+    """Load the training and validation datasets from the given tile index file"""
+    entries = ti.loadTileIndex(index_file)
+    train, valid = splitTileIndex(entries, valid_pct, seed)
+    return (TileIndexDataset(train), TileIndexDataset(valid))
+
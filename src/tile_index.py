@@ -0,0 +1,108 @@
+"""
+The tile index is a CSV file listing every training sample in the extracted sub-image store:
+the sub-image file, its tag, the transform (rotation/flip) to apply when loading it,
+and the model score of the mined (hard negative) sub-images (see `hard_negative_mining.py`).
+
+When the positive sub-images are augmented by the data loader (rather than by saving
+a copy of the sub-image for every transform) each positive sub-image appears once
+for every transform.
+"""
+import csv
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Mapping, Union
+
+from src import augmentation
+
+# The file name of the tile index, saved in the top-level output folder
+TILE_INDEX_FILE_NAME = "__tile_index.csv"
+
+_FIELD_NAMES = ["filePath", "tag", "transform", "score"]
+
+
+@dataclass(frozen=True)
+class TileIndexEntry:
+    """A single training sample"""
+
+    filePath: str
+    tag: bool
+    transform: str = augmentation.IDENTITY
+
+    # The model score the sub-image was mined with (None if it wasn't mined)
+    score: Union[float, None] = None
+
+
+def isTaggedTilePath(tile_path: str) -> bool:
+    """Determines if the given sub-image was saved in the `true` (tagged) folder"""
+    return Path(tile_path).parent.name == "true"
+
+
+def sourceTilePath(tile_path: str) -> str:
+    """The sub-image that the given (possibly augmented) sub-image file was created from,
+    by removing the augmentation suffix from its file name (see `createOutputFilePath` in
+    `training_sub_image_extraction`)
+    """
+    path = Path(tile_path)
+    stem = path.stem
+    for name in augmentation.AUGMENTATIONS:
+        if stem.endswith("_" + name):
+            stem = stem[: -len(name) - 1]
+            break
+    return str(path.with_name(stem + path.suffix))
+
+
+def createTileIndexEntries(
+    tile_paths: Iterable[str],
+    augment_positives: bool,
+    scores: Union[Mapping[str, float], None] = None,
+) -> Iterable[TileIndexEntry]:
+    """Create the index entries for the given sub-images
+
+    Args:
+        tile_paths (Iterable[str]): The sub-image file paths (from their `true`/`false` folders)
+        augment_positives (bool): `True` to add an entry for every augmentation
+            of each positively tagged sub-image
+        scores (Union[Mapping[str, float], None]): The model scores of the mined sub-images
+
+    Returns:
+        Iterable[TileIndexEntry]: The tile index entries
+    """
+    for tile_path in tile_paths:
+        tag = isTaggedTilePath(tile_path)
+        score = scores.get(tile_path) if scores is not None else None
+        yield TileIndexEntry(tile_path, tag, score=score)
+        if tag and augment_positives:
+            for transform in augmentation.AUGMENTATIONS:
+                yield TileIndexEntry(tile_path, tag, transform)
+
+
+def saveTileIndex(file_name: str, entries: Iterable[TileIndexEntry]) -> None:
+    """Save the tile index entries to the given CSV file"""
+    assert file_name
+    temp_file_name = file_name + ".tmp"
+    with open(temp_file_name, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(_FIELD_NAMES)
+        for entry in entries:
+            score = "" if entry.score is None else f"{entry.score:.5f}"
+            writer.writerow([entry.filePath, int(entry.tag), entry.transform, score])
+    os.replace(temp_file_name, file_name)
+
+
+def loadTileIndex(file_name: str) -> list[TileIndexEntry]:
+    """Load all the tile index entries from the given CSV file
+    (older tile indexes don't have the score column)
+    """
+    assert os.path.isfile(file_name)
+    with open(file_name, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return [
+            TileIndexEntry(
+                row["filePath"],
+                row["tag"] == "1",
+                row["transform"],
+                float(row["score"]) if row.get("score") else None,
+            )
+            for row in reader
+        ]
@@ -0,0 +1,113 @@
+"""
+Cheap per sub-image (tile) motion scores, used to decide which negative (untagged)
+sub-images are worth saving as training data.
+
+The motion score of a tile is the mean absolute (grayscale) difference between the
+current and previous image within that tile.  The scores of every tile in an image are
+computed at once from a single integral image, so each tile costs 4 lookups.
+"""
+from dataclasses import dataclass
+from typing import Any, Sequence, Union
+
+import cv2
+import numpy as np
+
+from src import model
+
+
+def createMotionImage(previous_image: Any, current_image: Any) -> np.ndarray:
+    """Create the single channel absolute difference between the two (BGR) images
+
+    Args:
+        previous_image (Any): The previous image in the image group
+        current_image (Any): The current image in the image group
+
+    Returns:
+        np.ndarray: A uint8 grayscale image of the absolute differences
+    """
+    diff = cv2.absdiff(current_image, previous_image)
+    if diff.ndim == 3:
+        diff = cv2.cvtColor(diff, cv2.COLOR_BGR2GRAY)
+    return diff
+
+
+def calculateTileMotionScores(
+    motion_image: np.ndarray, regions: Union[Sequence[model.Region2d], np.ndarray]
+) -> np.ndarray:
+    """Calculate the mean absolute difference within each of the given regions
+
+    Args:
+        motion_image (np.ndarray): The single channel absolute difference image
+            (see `createMotionImage`)
+        regions (Union[Sequence[model.Region2d], np.ndarray]): The sub-image regions
+            within the image, or an `[N, 4]` array of their (x, y, w, h)
+            (such as `sub_image_regions.TileGrid.boxes`)
+
+    Returns:
+        np.ndarray: A float array with the motion score of each region (0 to 255)
+    """
+    if len(regions) == 0:
+        return np.zeros(0, dtype=np.float64)
+
+    # 64-bit sums, a 12MP image of 255 values overflows 32-bit integers
+    integral = cv2.integral(motion_image, sdepth=cv2.CV_64F)
+
+    if isinstance(regions, np.ndarray):
+        boxes = regions.astype(np.int64)
+    else:
+        boxes = np.array([(r.x, r.y, r.w, r.h) for r in regions], dtype=np.int64)
+    x1, y1 = boxes[:, 0], boxes[:, 1]
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+    return sums / (boxes[:, 2] * boxes[:, 3])
+
+
+@dataclass(frozen=True)
+class NegativeSamplingPolicy:
+    """How negative sub-images are sampled, stratified by their motion score.
+
+    Tiles with a motion score below `thresholds[0]` use `keepRates[0]`,
+    tiles between `thresholds[0]` and `thresholds[1]` use `keepRates[1]`, and so on,
+    with tiles above the last threshold using the last keep rate.
+    So there must be exactly one more keep rate than there are thresholds.
+
+    The defaults drop (almost) static tiles, and keep the tiles with a lot of change -
+    the "hard" negatives like grass moving in the wind - much more often.
+    """
+
+    thresholds: tuple[float, ...] = (2.0, 8.0, 24.0)
+    keepRates: tuple[float, ...] = (0.0, 0.04, 0.15, 0.5)
+
+    def __post_init__(self):
+        if len(self.keepRates) != len(self.thresholds) + 1:
+            raise ValueError(
+                "There must be one more keep rate than there are thresholds, not "
+                f"{self.keepRates} for {self.thresholds}"
+            )
+        if list(self.thresholds) != sorted(self.thresholds):
+            raise ValueError(f"The thresholds must be in order, not {self.thresholds}")
+        if any(not 0.0 <= r <= 1.0 for r in self.keepRates):
+            raise ValueError(
+                f"The keep rates must be from 0 to 1, not {self.keepRates}"
+            )
+
+    def keepProbabilities(self, scores: np.ndarray) -> np.ndarray:
+        """The probability of keeping each tile with the given motion scores"""
+        strata = np.searchsorted(self.thresholds, scores, side="right")
+        return np.asarray(self.keepRates)[strata]
+
+
+def sampleNegativeTiles(
+    scores: np.ndarray, policy: NegativeSamplingPolicy, rng: np.random.Generator
+) -> np.ndarray:
+    """Decide which negative tiles to keep
+
+    Args:
+        scores (np.ndarray): The motion score of each tile
+        policy (NegativeSamplingPolicy): The stratified sampling policy
+        rng (np.random.Generator): The random number generator to sample with
+
+    Returns:
+        np.ndarray: A boolean array, `True` for each tile that should be kept
+    """
+    return rng.random(len(scores)) < policy.keepProbabilities(scores)
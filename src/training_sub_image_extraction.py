@@ -5,38 +5,146 @@ This is the final pre-training application that takes the original images
 and cuts them into 224x224 sub-images, saving the tens of thousands
 of sub-images into `true` and `false` sub-folders according to the
 tagging data from `animals.json`
+
+The settings below can be overridden with a `.json` configuration file and/or command line
+options (see `python -m src.training_sub_image_extraction --help`), for example:
+
+    python -m src.training_sub_image_extraction --config sweep_448.json --workers 8 --seed 1
 """
-from dataclasses import dataclass
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
 import cv2
+import io
+import json
+import multiprocessing
+import numpy as np
+import queue
 import random
 import os
+import platform
+import time
+import traceback
 from PIL import Image as pilImage
 import piexif
 from pathlib import Path
-from typing import Any, Callable, Union
+from typing import Any, Callable, Iterable, Sequence, Union
+import zlib
 
 from src import model
+from src import augmentation
 from src import data_serialization_json as ds
+from src import extraction_config as ec
+from src import extraction_manifest as em
+from src import frame_gate as fg
 from src import grouping
+from src import hard_negative_mining as hnm
+from src import image_stabalization as stab
+from src import region_decode as rd
+from src import shared_frame_ring as sfr
 from src import sub_image_regions as sir
-from tagger_ui.ui_model.timer import Timer
-
-print(f"OpenCV version: {cv2.__version__}")
+from src import tile_index as ti
+from src import tile_motion as tm
+from tagger_ui.ui_model.timer import Timer, profiler
 
 # The image output directory
 out_dir = r"D:\data\NRSI\__ai_training_images"
 
+# The images `.json` data file with the tagged regions (relative to the working folder)
+IMAGES_FILE = "animals.json"
+
 # The image dimensions that we'll produce for training an AI
 IMAGE_WIDTH = 224
 IMAGE_HEIGHT = 224
 BLOCK_SIZE = model.Size2d(IMAGE_WIDTH, IMAGE_HEIGHT)
 
+# The distance between neighbouring sub-images
+# (`None` for no overlap, or e.g. `model.Size2d(112, 112)` for sub-images that overlap by half,
+# so that small animals aren't split across the sub-image borders)
+TILE_STRIDE: Union[model.Size2d, None] = None
+
+# The image scales the sub-images are taken from, largest first
+# (e.g. `(1.0, 0.5, 0.25)` to also take sub-images from the half and quarter size images,
+# so that large animals fit within a single sub-image)
+TILE_SCALES: tuple[float, ...] = (1.0,)
+
+# The chance that a negatively (false) tagged sub-image is saved
+# (only used when we're not sampling the negative sub-images by their motion)
+NEGATIVE_SAMPLE_RATE = 0.075
+
+# How negative sub-images are sampled according to how much they changed from the previous image
+# (set to `None` to go back to uniformly sampling with the NEGATIVE_SAMPLE_RATE)
+NEGATIVE_SAMPLING_POLICY: Union[tm.NegativeSamplingPolicy, None] = (
+    tm.NegativeSamplingPolicy()
+)
+
+# The random number generator used to sample the negative sub-images
+rng = np.random.default_rng()
+
+# The seed for sampling the negative sub-images (`None` for a different sample every run).
+# Each image pair is sampled with its own seed (from this seed and the image's file path),
+# so a seeded run saves the same sub-images no matter how many pipeline workers there are
+SEED: Union[int, None] = None
+
+# Warp the previous image to line up with the current image before subtracting
+# (so that cameras swaying in the wind don't create huge false differences)
+STABILISE_IMAGES = True
+
+# How the positive sub-images are augmented with rotated and flipped copies:
+#   "files" - save a separate sub-image file for every rotation/flip
+#   "index" - only save the original sub-image, and record the rotations/flips in the
+#             tile index, so that the training data loader can apply them on the fly
+AUGMENTATION_MODE = "files"
+
+# How the sub-images are encoded as JPEGs:
+#   "pil" - encode with Pillow
+#   "cv2" - encode with OpenCV (usually faster), then insert the EXIF metadata with piexif
+# Both backends save the channels in the same order, at equivalent quality (see `encode_sub_image`)
+SUB_IMAGE_BACKEND = "pil"
+
+# The JPEG quality of the saved sub-images (Pillow's default quality)
+SUB_IMAGE_JPEG_QUALITY = 75
+
+# Profile the extraction (decode, stabilise, diff, tile, encode and save), saving the aggregate
+# timings to `__profile.json` and every span to `__profile.trace.json` (for `chrome://tracing`)
+# in the output folder
+PROFILE = False
+
+# The frame level change gate: the untagged image pairs where nothing changed (wind and light
+# triggers) are skipped before they're decoded at full size (`None` to extract every image pair).
+# The tagged image pairs are always extracted.
+FRAME_GATE: Union[fg.FrameGatePolicy, None] = None
+
+# Hard negative mining: every negative sub-image is scored by the MINING_MODEL (a model saved by
+# `fastai_test` or `model_export`), and only the highest scoring false positives (plus a small
+# random remainder) are saved, with their scores recorded in the manifest and the tile index
+# (`None` to sample the negative sub-images by their motion, or uniformly, instead)
+HARD_NEGATIVE_MINING: Union[hnm.HardNegativePolicy, None] = None
+MINING_MODEL: Union[str, None] = None
+
+# How the images are decoded:
+#   "full" - decode the whole of both images, then stabilise, diff and tile the whole frame
+#   "crop" - only decode the sub-images that are saved (the tagged sub-images and the sampled
+#            negatives) from both images, with TurboJPEG when it's installed (see `region_decode`)
+# The negative sub-images must be chosen before anything is decoded, so cropping only works with
+# the uniform NEGATIVE_SAMPLE_RATE (no NEGATIVE_SAMPLING_POLICY or HARD_NEGATIVE_MINING), and the
+# cropped sub-images are extracted in this process. Otherwise (and for any image that can't be
+# cropped) the whole images are decoded.
+DECODE_MODE = "full"
+
+# The number of worker processes that stabilise, tile and encode the image pairs
+# (0 to do everything in this process).
+# The images are decoded in this process and handed to the workers through shared memory,
+# so the decoded images are never pickled.  The profile only covers this process.
+PIPELINE_WORKERS = 0
+
 
 def createOutputFilePath(
     out_dir: str,
     image_info: model.ImageInfo,
     region: model.TaggedRegion2d,
     rotation: str = "",
+    scale: float = 1.0,
 ) -> str:
     """Creates the complete output file path for the given tagged region
 
@@ -44,6 +152,8 @@ def createOutputFilePath(
         out_dir (str): The output folder where we want to save the sub-images
         image_info (model.ImageInfo): The original input image
         region (model.TaggedRegion): The tag result
+        rotation (str): The optional rotational information for the output file name
+        scale (float): The scale of the image the sub-image was taken from
 
     Returns:
         str: The new complete output file path
@@ -58,7 +168,8 @@ def createOutputFilePath(
     # Now we can build the complete output file path (including the file name and ext)
     if rotation:
         rotation = "_" + rotation
-    dest_file_name = f"{path.stem}_@{x}x{y}{rotation}{path.suffix}"
+    scale_name = "" if scale == 1.0 else f"_scale{scale:g}"
+    dest_file_name = f"{path.stem}_@{x}x{y}{scale_name}{rotation}{path.suffix}"
     result = os.path.join(out_dir, sub_folder, dest_file_name)
     return result
 
@@ -156,11 +267,45 @@ class OutputImageInfo:
     image_info: model.ImageInfo
     sub_region: model.TaggedRegion2d
 
+    # The scale of the image the sub-image was taken from
+    scale: float = 1.0
+
+
+def encode_sub_image(sub_image_diff: Any, exif_metadata_bytes: bytes) -> bytes:
+    """Encode the sub-image as a JPEG (with the given EXIF metadata),
+    using the `SUB_IMAGE_BACKEND`
+
+    Pillow treats the OpenCV (BGR) image as RGB, so the saved sub-images have their
+    channels in BGR order (which is what the AI model is trained on).
+    OpenCV expects BGR and swaps the channels when encoding, so the channels are
+    reversed first to save them in the same order as Pillow. The two JPEG encoders (and the
+    libjpeg builds they're linked with) can differ, so the pixels are of equivalent quality,
+    but aren't guaranteed to be identical.
+    """
+    if SUB_IMAGE_BACKEND == "cv2":
+        succeeded, encoded = cv2.imencode(
+            ".jpg",
+            np.ascontiguousarray(sub_image_diff[:, :, ::-1]),
+            [cv2.IMWRITE_JPEG_QUALITY, SUB_IMAGE_JPEG_QUALITY],
+        )
+        assert succeeded
+        buffer = io.BytesIO()
+        piexif.insert(exif_metadata_bytes, encoded.tobytes(), buffer)
+        return buffer.getvalue()
+
+    # Create a PIL/Pillow image from our OpenCV2 image (so that we can save it with metadata)
+    pillow_image = pilImage.fromarray(sub_image_diff)
+    buffer = io.BytesIO()
+    pillow_image.save(
+        buffer, format="JPEG", quality=SUB_IMAGE_JPEG_QUALITY, exif=exif_metadata_bytes
+    )
+    return buffer.getvalue()
+
 
 def save_sub_image(
     output_info: OutputImageInfo, sub_image_diff: Any, rotation: str = ""
-) -> None:
-    """Saves a sub-image
+) -> str:
+    """Saves a sub-image, returning the output file path
 
     Args:
         out_dir (str): The top-level output folder where we're saving all sub-images
@@ -169,26 +314,35 @@ def save_sub_image(
             this sub-image is being taken from
         sub_image_diff (Any): The actual sub-image pre-calculated diff to save
         rotation (str): The optional rotational information for the output file name
+
+    Returns:
+        str: The file path of the saved sub-image
     """
     assert output_info
 
     # Determine which folder to save the file in
     output_file = createOutputFilePath(
-        output_info.out_dir, output_info.image_info, output_info.sub_region, rotation
+        output_info.out_dir,
+        output_info.image_info,
+        output_info.sub_region,
+        rotation,
+        output_info.scale,
     )
 
     # Create the image metadata (which contains the original image source file path)
     exif_metadata_bytes = create_image_exif_metadata(output_info.image_info)
 
-    # Create a PIL/Pillow image from our OpenCV2 image (so that we can save it with metadata)
-    pillow_image = pilImage.fromarray(sub_image_diff)
-    pillow_image.save(output_file, format="JPEG", exif=exif_metadata_bytes)
-    # cv2.imwrite(output_file, sub_image_diff)   # Can't save metadata with OpenCV2
+    with profiler.span("encode"):
+        encoded = encode_sub_image(sub_image_diff, exif_metadata_bytes)
+    with profiler.span("save"):
+        with open(output_file, "wb") as f:
+            f.write(encoded)
+    return output_file
 
 
 def save_sub_image_tagged_true(
     output_info: OutputImageInfo, sub_image_diff: Any
-) -> None:
+) -> list[str]:
     """
     Saves a positively (true) tagged sub-image.
     To generate more positive examples this function also saves copies of the sub-region
@@ -203,45 +357,47 @@ def save_sub_image_tagged_true(
         sub_region (model.TaggedRegion2d): The tagged region within the main image where
             this sub-image is being taken from
         sub_image_diff (Any): The actual sub-image pre-calculated diff to save
+
+    Returns:
+        list[str]: The file paths of all the saved sub-images
     """
     # First save the original image
-    save_sub_image(output_info, sub_image_diff)
-
-    # Rotate the image 90° clockwise
-    img_rotate_90_c = cv2.rotate(sub_image_diff, cv2.ROTATE_90_CLOCKWISE)
-    save_sub_image(output_info, img_rotate_90_c, "rotate_90°c")
+    results = [save_sub_image(output_info, sub_image_diff)]
 
-    # Rotate the image 90° counter-clockwise
-    img_rotate_90_cc = cv2.rotate(sub_image_diff, cv2.ROTATE_90_COUNTERCLOCKWISE)
-    save_sub_image(output_info, img_rotate_90_cc, "rotate_90°cc")
+    # Then save each rotated/flipped copy of the image
+    # (rotating 180° is the same as flipping in both the x and y axis, so we skip that one)
+    for name in augmentation.AUGMENTATIONS:
+        transformed_image = augmentation.applyTransform(sub_image_diff, name)
+        results.append(save_sub_image(output_info, transformed_image, name))
+    return results
 
-    # Same as flipping in both x and y axis
-    # img_rotate_180 = cv2.rotate(sub_image_diff, cv2.ROTATE_180)
-    # save_sub_image(output_info, img_rotate_180, "rotate_180°")
 
-    # Flip the image along the x axis
-    img_flip_x = cv2.flip(sub_image_diff, 1)  # > 0 is flip horizontally
-    save_sub_image(output_info, img_flip_x, "flipped_x")
-
-    # Flip the image along the y axis
-    img_flip_y = cv2.flip(sub_image_diff, 0)  # = 0 is flip vertically
-    save_sub_image(output_info, img_flip_y, "flipped_y")
+def save_sub_image_tagged(
+    output_info: OutputImageInfo, sub_image_diff: Any
+) -> list[str]:
+    """Saves a positively (true) tagged sub-image, with a copy for every rotation/flip
+    (unless the rotations/flips are only recorded in the tile index, see `AUGMENTATION_MODE`)
 
-    # Flip the image along both the x and y axis
-    img_flip_xy = cv2.flip(sub_image_diff, -1)  # < 0 is flip both x and y
-    save_sub_image(output_info, img_flip_xy, "flipped_xy")
+    Returns:
+        list[str]: The file paths of all the saved sub-images
+    """
+    if AUGMENTATION_MODE == "index":
+        return [save_sub_image(output_info, sub_image_diff)]
+    return save_sub_image_tagged_true(output_info, sub_image_diff)
 
 
 def save_sub_image_tagged_false(
     output_info: OutputImageInfo,
     sub_image_diff: Any,
-) -> None:
+) -> list[str]:
     """
     Saves a positively (true) tagged sub-image.
     To generate fewer negative examples for AI training this function may or may not
     save the given sub-image.
 
-    Currently it only has a 7.5% chance of actually saving the negative example
+    It only has a NEGATIVE_SAMPLE_RATE (7.5%) chance of actually saving the negative example
+    (see `NEGATIVE_SAMPLING_POLICY` for sampling according to the sub-image's motion instead,
+    or `HARD_NEGATIVE_MINING` for choosing them with the current model)
 
     Args:
         out_dir (str): The top-level output folder where we're saving all sub-images
@@ -249,19 +405,808 @@ def save_sub_image_tagged_false(
         sub_region (model.TaggedRegion2d): The tagged region within the main image where
             this sub-image is being taken from
         sub_image_diff (Any): The actual sub-image pre-calculated diff to save
+
+    Returns:
+        list[str]: The file path of the saved sub-image (or an empty list if it wasn't saved)
     """
     value: float = random.random()
-    if value < 0.075:
-        save_sub_image(output_info, sub_image_diff)
+    if value < NEGATIVE_SAMPLE_RATE:
+        return [save_sub_image(output_info, sub_image_diff)]
+    return []
 
 
-def main():
-    """Process the main images `.json` data file to create 224x224 training sub-images."""
+def calculate_image_diff(previous_image: Any, current_image: Any) -> Any:
+    """Calculate the difference between the current image and the previous image
+    (the sub-images of this difference are what the AI model is trained on)
+    """
+    return current_image - previous_image
 
-    # Load the list of animals from the animals JSON file
-    images_data_file: model.ImagesCollection = ds.loadImagesCollectionFromJson(
-        "animals.json"
+
+# Estimates the stabilisation transforms, re-using the last image of the previous image pair
+# (when the image pairs are extracted in their group order)
+transform_estimator = stab.PairTransformEstimator()
+
+
+def estimate_pair_transform(
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    transform_cache: Union[stab.TransformCache, None] = None,
+    previous_image: Any = None,
+    current_image: Any = None,
+) -> Union[np.ndarray, None]:
+    """The stabilisation transform of the image pair, from the cache or estimated
+    (from the decoded images, or from the reduced size images when they aren't given)
+    """
+    previous_path, current_path = previous_info.filePath, image_info.filePath
+    if transform_cache is not None and transform_cache.contains(
+        previous_path, current_path
+    ):
+        return transform_cache.get(current_path)
+
+    transform = transform_estimator.estimate(
+        previous_path, current_path, previous_image, current_image
     )
+    if transform_cache is not None:
+        transform_cache.put(previous_path, current_path, transform)
+    return transform
+
+
+def stabilise_previous_image(
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    previous_image: Any,
+    current_image: Any,
+    transform_cache: Union[stab.TransformCache, None] = None,
+) -> Any:
+    """Warp the previous image so that it lines up with the current image
+    (or return the previous image as-is if we're not stabilising, or the images can't be aligned)
+
+    Args:
+        previous_info (model.ImageInfo): The previous image information
+        image_info (model.ImageInfo): The current image information
+        previous_image (Any): The previous image
+        current_image (Any): The current image
+        transform_cache (Union[stab.TransformCache, None]): The optional on disk cache of
+            previously estimated transforms
+
+    Returns:
+        Any: The (possibly warped) previous image
+    """
+    if not STABILISE_IMAGES:
+        return previous_image
+
+    with profiler.span("stabilise"):
+        transform = estimate_pair_transform(
+            previous_info, image_info, transform_cache, previous_image, current_image
+        )
+        if transform is None:
+            return previous_image
+        return stab.warpImage(previous_image, transform)
+
+
+# The mined negative sub-images of a pyramid level: which of the level's sub-images to keep,
+# the model score of each (NaN for the positive sub-images, which aren't scored),
+# and the level's image difference the scored sub-images were sliced from
+MinedTiles = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+# The hard negative miner (loaded when it's first used, by each process that extracts image pairs)
+miner: Union[hnm.HardNegativeMiner, None] = None
+
+# The scores of the mined sub-images saved by this process, until they're collected
+tile_scores: dict[str, float] = {}
+
+
+def get_miner() -> hnm.HardNegativeMiner:
+    """The hard negative miner for the current settings (loading the MINING_MODEL the first time)"""
+    global miner
+    assert HARD_NEGATIVE_MINING is not None
+    assert MINING_MODEL, "Hard negative mining needs a MINING_MODEL"
+    if miner is None:
+        miner = hnm.loadMiner(MINING_MODEL, HARD_NEGATIVE_MINING)
+    return miner
+
+
+def mine_negative_tiles(
+    levels: Sequence[sir.TilePyramidLevel],
+    previous_images: Sequence[Any],
+    current_images: Sequence[Any],
+    region_index: model.RegionIndex,
+) -> list[MinedTiles]:
+    """Score the negative sub-images of every pyramid level with the mining model (in batches),
+    and choose which of them to keep
+
+    Args:
+        levels (Sequence[sir.TilePyramidLevel]): The tiles of each pyramid level
+        previous_images (Sequence[Any]): The previous image, scaled to each level
+        current_images (Sequence[Any]): The current image, scaled to each level
+        region_index (model.RegionIndex): The spatial index of the image's tagged regions
+
+    Returns:
+        list[MinedTiles]: The sub-images to keep, their scores, and the image difference,
+            for each level
+    """
+    negatives = [~region_index.intersectsAnyBatch(level.regions) for level in levels]
+    with profiler.span("diff"):
+        image_diffs = [
+            calculate_image_diff(previous_image, current_image)
+            for previous_image, current_image in zip(previous_images, current_images)
+        ]
+    tiles = [
+        level.grid.extractTiles(image_diff, np.flatnonzero(negative))
+        for level, image_diff, negative in zip(levels, image_diffs, negatives)
+    ]
+    if not any(negative.any() for negative in negatives):
+        keep, scores = np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float32)
+    else:
+        keep, scores = get_miner().mine(np.concatenate(tiles), rng)
+
+    # Split the results back up into the sub-images of each level
+    results: list[MinedTiles] = []
+    start = 0
+    for negative, image_diff in zip(negatives, image_diffs):
+        count = int(negative.sum())
+        level_keep = np.zeros(len(negative), dtype=bool)
+        level_keep[negative] = keep[start : start + count]
+        level_scores = np.full(len(negative), np.nan, dtype=np.float32)
+        level_scores[negative] = scores[start : start + count]
+        results.append((level_keep, level_scores, image_diff))
+        start += count
+    return results
+
+
+def take_tile_scores(tiles: Iterable[str]) -> dict[str, float]:
+    """Collect (and forget) the scores of the given mined sub-images"""
+    return {tile: tile_scores.pop(tile) for tile in tiles if tile in tile_scores}
+
+
+def take_mining_stats() -> Union[hnm.MiningStats, None]:
+    """Collect (and reset) the mining statistics of this process (None if it hasn't mined)"""
+    if miner is None:
+        return None
+    stats, miner.stats = miner.stats, hnm.MiningStats()
+    return stats
+
+
+def extract_image_pair(
+    out_dir: str, image_info: model.ImageInfo, previous_image: Any, current_image: Any
+) -> list[str]:
+    """Break the difference between the two images into tagged sub-images and save them
+
+    Args:
+        out_dir (str): The top-level output folder where we're saving all sub-images
+        image_info (model.ImageInfo): The current image information (with the tagged regions)
+        previous_image (Any): The previous image (which is subtracted from the current image)
+        current_image (Any): The current image
+
+    Returns:
+        list[str]: The file paths of all the saved sub-images
+    """
+    height, width = current_image.shape[0], current_image.shape[1]
+    image_size = model.Size2d(width, height)
+    print("Processing: ", image_info.filePath)
+
+    # The sub-image tiles at each scale (shared by every image of the same size)
+    levels = sir.getTilePyramid(BLOCK_SIZE, image_size, TILE_STRIDE, TILE_SCALES)
+    with profiler.span("pyramid"):
+        previous_images = sir.createImagePyramid(previous_image, levels)
+        current_images = sir.createImagePyramid(current_image, levels)
+
+    # Index the tagged regions once, for tagging the sub-images at every scale
+    region_index = model.RegionIndex(model.confirmedRegions(image_info.regions))
+
+    # Choose the negative sub-images of every scale together, so the hardest are kept
+    mined: list[Union[MinedTiles, None]] = [None] * len(levels)
+    if HARD_NEGATIVE_MINING is not None:
+        with profiler.span("mine"):
+            mined = list(
+                mine_negative_tiles(
+                    levels, previous_images, current_images, region_index
+                )
+            )
+
+    tiles: list[str] = []
+    for level, previous_level, current_level, level_mined in zip(
+        levels, previous_images, current_images, mined
+    ):
+        tiles.extend(
+            extract_pyramid_level(
+                out_dir,
+                image_info,
+                level,
+                previous_level,
+                current_level,
+                region_index,
+                level_mined,
+            )
+        )
+    return tiles
+
+
+def extract_pyramid_level(
+    out_dir: str,
+    image_info: model.ImageInfo,
+    level: sir.TilePyramidLevel,
+    previous_image: Any,
+    current_image: Any,
+    region_index: Union[model.RegionIndex, None] = None,
+    mined: Union[MinedTiles, None] = None,
+) -> list[str]:
+    """Break the difference between the two (scaled) images of a single pyramid level
+    into tagged sub-images and save them
+
+    Args:
+        out_dir (str): The top-level output folder where we're saving all sub-images
+        image_info (model.ImageInfo): The current image information (with the tagged regions)
+        level (sir.TilePyramidLevel): The tiles of this pyramid level
+        previous_image (Any): The previous image, scaled to this level
+        current_image (Any): The current image, scaled to this level
+        region_index (Union[model.RegionIndex, None]): The spatial index of the image's
+            tagged regions (created from the image information if not given)
+        mined (Union[MinedTiles, None]): The negative sub-images to keep, their scores,
+            and the image difference, if they were chosen by hard negative mining
+
+    Returns:
+        list[str]: The file paths of all the saved sub-images
+    """
+    # Calculate the difference with the previous image (unless the mining already did)
+    if mined is not None:
+        image_diff = mined[2]
+    else:
+        with profiler.span("diff"):
+            image_diff = calculate_image_diff(previous_image, current_image)
+
+    # Tag the sub-regions that we need to break the large image into
+    # (in full size image coordinates, which is what the tagged regions are in)
+    if region_index is None:
+        region_index = model.RegionIndex(model.confirmedRegions(image_info.regions))
+    with profiler.span("tile"):
+        sub_image_tagged_regions = list(
+            sir.createSubImageTaggedRegions(level.regions, region_index)
+        )
+
+    # Decide which negative sub-images to keep from how much they changed,
+    # before we spend any time slicing or encoding them
+    keep_negatives: Union[np.ndarray, None] = None
+    negative_scores: Union[np.ndarray, None] = None
+    if mined is not None:
+        keep_negatives, negative_scores, _ = mined
+    elif NEGATIVE_SAMPLING_POLICY is not None:
+        with profiler.span("motion scores"):
+            motion_image = tm.createMotionImage(previous_image, current_image)
+            motion_scores = tm.calculateTileMotionScores(motion_image, level.grid.boxes)
+            keep_negatives = tm.sampleNegativeTiles(
+                motion_scores, NEGATIVE_SAMPLING_POLICY, rng
+            )
+
+    # Loop over each sub-image region
+    tiles: list[str] = []
+    for i, sub_region in enumerate(sub_image_tagged_regions):
+        if not sub_region.tag and keep_negatives is not None and not keep_negatives[i]:
+            continue
+
+        # Numpy uses row, col notation instead of col, row
+        # From: https://stackoverflow.com/questions/67353650/extract-part-of-a-image-using-opencv
+        # or: https://stackoverflow.com/questions/15589517/how-to-crop-an-image-in-opencv-using-python
+        # or: https://stackoverflow.com/questions/9084609/how-to-copy-a-image-region-using-opencv-in-python
+        # (the tile is sliced from this level's scaled image, not the full size image)
+        x, y, w, h = level.grid.boxes[i]
+        sub_image_diff = image_diff[y : y + h, x : x + w]
+
+        output_info = OutputImageInfo(out_dir, image_info, sub_region, level.scale)
+        if sub_region.tag:
+            tiles.extend(save_sub_image_tagged(output_info, sub_image_diff))
+        elif keep_negatives is None:
+            tiles.extend(save_sub_image_tagged_false(output_info, sub_image_diff))
+        else:
+            tiles.append(save_sub_image(output_info, sub_image_diff))
+            if negative_scores is not None:
+                tile_scores[tiles[-1]] = float(negative_scores[i])
+    return tiles
+
+
+def extraction_parameters() -> dict[str, Any]:
+    """The extraction parameters that affect the produced sub-images
+    (any change to these causes every image pair to be re-extracted)
+    """
+    parameters: dict[str, Any] = {
+        "blockSize": [BLOCK_SIZE.width, BLOCK_SIZE.height],
+        "tileStride": [TILE_STRIDE.width, TILE_STRIDE.height] if TILE_STRIDE else None,
+        "tileScales": list(TILE_SCALES),
+        "negativeSampleRate": NEGATIVE_SAMPLE_RATE,
+        "negativeSamplingPolicy": (
+            asdict(NEGATIVE_SAMPLING_POLICY) if NEGATIVE_SAMPLING_POLICY else None
+        ),
+        "augmentationMode": AUGMENTATION_MODE,
+        "stabiliseImages": STABILISE_IMAGES,
+        "subImageBackend": SUB_IMAGE_BACKEND,
+        "subImageJpegQuality": SUB_IMAGE_JPEG_QUALITY,
+        # The seed decides which negative sub-images are sampled
+        # (an unseeded run only re-extracts the pairs that changed, like any other run)
+        "seed": SEED,
+    }
+    # The frame gate isn't a parameter, it only decides which image pairs are worth extracting
+    # (see `gated_pair_parameters`)
+    if HARD_NEGATIVE_MINING is not None:
+        # A newly trained model mines every image pair again
+        parameters["hardNegativeMining"] = {
+            **asdict(HARD_NEGATIVE_MINING),
+            "model": MINING_MODEL,
+            "modelModified": em.fileModifiedTime(MINING_MODEL) if MINING_MODEL else -1,
+        }
+    if DECODE_MODE != "full":
+        parameters["decodeMode"] = DECODE_MODE
+    return parameters
+
+
+def gated_pair_parameters(parameters: dict[str, Any]) -> dict[str, Any]:
+    """The parameters for the key of an image pair that the frame gate skipped
+    (so the pair is only looked at again once the gate changes, while the pairs that passed
+    the gate aren't re-extracted when the gate is turned on or re-tuned)
+    """
+    return {**parameters, "frameGate": asdict(FRAME_GATE) if FRAME_GATE else None}
+
+
+def current_config() -> ec.ExtractionConfig:
+    """The extraction configuration made from the current settings of this module"""
+    return ec.ExtractionConfig(
+        outDir=out_dir,
+        imagesFile=IMAGES_FILE,
+        blockSize=BLOCK_SIZE,
+        tileStride=TILE_STRIDE,
+        tileScales=TILE_SCALES,
+        negativeSampleRate=NEGATIVE_SAMPLE_RATE,
+        negativeSamplingPolicy=NEGATIVE_SAMPLING_POLICY,
+        stabiliseImages=STABILISE_IMAGES,
+        augmentationMode=AUGMENTATION_MODE,
+        subImageBackend=SUB_IMAGE_BACKEND,
+        subImageJpegQuality=SUB_IMAGE_JPEG_QUALITY,
+        workers=PIPELINE_WORKERS,
+        seed=SEED,
+        profile=PROFILE,
+        frameGate=FRAME_GATE,
+        hardNegativeMining=HARD_NEGATIVE_MINING,
+        miningModel=MINING_MODEL,
+        decodeMode=DECODE_MODE,
+    )
+
+
+def apply_config(config: ec.ExtractionConfig) -> None:
+    """Change the settings of this module to the given extraction configuration
+
+    Raises:
+        ValueError: If any setting of the configuration is invalid
+    """
+    global out_dir, IMAGES_FILE, IMAGE_WIDTH, IMAGE_HEIGHT, BLOCK_SIZE, TILE_STRIDE
+    global TILE_SCALES, NEGATIVE_SAMPLE_RATE, NEGATIVE_SAMPLING_POLICY, STABILISE_IMAGES
+    global AUGMENTATION_MODE, SUB_IMAGE_BACKEND, SUB_IMAGE_JPEG_QUALITY, PIPELINE_WORKERS
+    global SEED, PROFILE, FRAME_GATE, HARD_NEGATIVE_MINING, MINING_MODEL, DECODE_MODE
+    global miner, rng
+
+    ec.validateConfig(config)
+    out_dir = config.outDir
+    IMAGES_FILE = config.imagesFile
+    IMAGE_WIDTH, IMAGE_HEIGHT = config.blockSize.width, config.blockSize.height
+    BLOCK_SIZE = config.blockSize
+    TILE_STRIDE = config.tileStride
+    TILE_SCALES = config.tileScales
+    NEGATIVE_SAMPLE_RATE = config.negativeSampleRate
+    NEGATIVE_SAMPLING_POLICY = config.negativeSamplingPolicy
+    STABILISE_IMAGES = config.stabiliseImages
+    AUGMENTATION_MODE = config.augmentationMode
+    SUB_IMAGE_BACKEND = config.subImageBackend
+    SUB_IMAGE_JPEG_QUALITY = config.subImageJpegQuality
+    PIPELINE_WORKERS = config.workers
+    SEED = config.seed
+    PROFILE = config.profile
+    FRAME_GATE = config.frameGate
+    if config.hardNegativeMining != HARD_NEGATIVE_MINING or (
+        config.miningModel != MINING_MODEL
+    ):
+        miner = None
+    HARD_NEGATIVE_MINING = config.hardNegativeMining
+    MINING_MODEL = config.miningModel
+    DECODE_MODE = config.decodeMode
+    rng = np.random.default_rng(SEED)
+    random.seed(SEED)
+
+
+def seed_image_pair(image_info: model.ImageInfo) -> None:
+    """Seed the negative sampling for the image pair (only if there's a `SEED`)"""
+    if SEED is None:
+        return
+
+    global rng
+    path_hash = zlib.crc32(image_info.filePath.encode("utf-8"))
+    rng = np.random.default_rng([SEED, path_hash])
+    random.seed(f"{SEED}|{image_info.filePath}")
+
+
+class ImageCache:
+    """Remembers the most recently loaded image, so that an image shared by two
+    consecutive image pairs is only decoded once (and skipped pairs are never decoded)
+    """
+
+    def __init__(
+        self, load_image: Callable[[str], Any] = cv2.imread, span: str = "decode"
+    ):
+        self._load_image = load_image
+        self._span = span
+        self._file_path: Union[str, None] = None
+        self._image: Any = None
+
+    def load(self, file_path: str) -> Any:
+        """Load the given image (or return it if it was the last image loaded)"""
+        if file_path != self._file_path:
+            with profiler.span(self._span):
+                self._image = self._load_image(file_path)
+            self._file_path = file_path
+        return self._image
+
+
+# An image pair to extract: the previous and current image, and the pair's manifest key
+ImagePair = tuple[model.ImageInfo, model.ImageInfo, str]
+
+# The result of extracting an image pair: the pair id, its manifest key, the saved sub-images
+# and the scores of the mined sub-images
+PairResult = tuple[str, str, list[str], dict[str, float]]
+
+
+def extract_pairs_in_process(
+    pairs: list[ImagePair],
+    transform_cache: Union[stab.TransformCache, None] = None,
+) -> Iterable[PairResult]:
+    """Decode, stabilise and extract each image pair, one after the other in this process"""
+    image_cache = ImageCache()
+    for previous_info, image_info, key in pairs:
+        previous_image = image_cache.load(previous_info.filePath)
+        current_image = image_cache.load(image_info.filePath)
+        tiles = extract_decoded_pair(
+            previous_info, image_info, previous_image, current_image, transform_cache
+        )
+        yield (image_info.filePath, key, tiles, take_tile_scores(tiles))
+
+
+def extract_decoded_pair(
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    previous_image: Any,
+    current_image: Any,
+    transform_cache: Union[stab.TransformCache, None] = None,
+) -> list[str]:
+    """Stabilise and extract an already decoded image pair, returning the saved sub-images"""
+    if previous_image is None or current_image is None:
+        print(f"Failed to load: {image_info.filePath} - skipping")
+        return []
+
+    # Check that the current image is the same shape as the previous image
+    # (for some reason the images are sometimes different shapes)
+    if previous_image.shape != current_image.shape:
+        print("Different image sizes - skipping")
+        return []
+
+    previous_image = stabilise_previous_image(
+        previous_info, image_info, previous_image, current_image, transform_cache
+    )
+    seed_image_pair(image_info)
+    with profiler.span("extract image pair"):
+        return extract_image_pair(out_dir, image_info, previous_image, current_image)
+
+
+def can_decode_cropped() -> bool:
+    """Determines if the saved sub-images can be chosen before the images are decoded,
+    so that only those sub-images are decoded (see `DECODE_MODE`)
+    """
+    return (
+        DECODE_MODE == "crop"
+        and NEGATIVE_SAMPLING_POLICY is None
+        and HARD_NEGATIVE_MINING is None
+    )
+
+
+def extract_pairs_cropped(
+    pairs: list[ImagePair],
+    transform_cache: Union[stab.TransformCache, None] = None,
+) -> Iterable[PairResult]:
+    """Extract each image pair by only decoding the saved sub-images, one after the other
+    in this process (any image pair that can't be cropped is decoded in full)
+    """
+    region_images = ImageCache(rd.openRegionImage, "open")
+    full_images = ImageCache()
+    for previous_info, image_info, key in pairs:
+        previous_image = region_images.load(previous_info.filePath)
+        current_image = region_images.load(image_info.filePath)
+        if previous_image is not None and current_image is not None:
+            tiles = extract_cropped_pair(
+                previous_info,
+                image_info,
+                previous_image,
+                current_image,
+                transform_cache,
+            )
+        else:
+            tiles = extract_decoded_pair(
+                previous_info,
+                image_info,
+                full_images.load(previous_info.filePath),
+                full_images.load(image_info.filePath),
+                transform_cache,
+            )
+        yield (image_info.filePath, key, tiles, {})
+
+
+def decode_cropped_tile(
+    image: rd.RegionImage,
+    sub_region: model.Region2d,
+    transform: Union[np.ndarray, None] = None,
+) -> Any:
+    """Decode the (optionally warped) sub-image's region of the full size image,
+    shrunk down to the BLOCK_SIZE if it is from a smaller pyramid level
+    """
+    # The regions of the smaller levels are rounded, so they can end just past the image
+    box = model.Region2d(
+        sub_region.x,
+        sub_region.y,
+        min(sub_region.w, image.size.width - sub_region.x),
+        min(sub_region.h, image.size.height - sub_region.y),
+    )
+    tile = rd.decodeWarpedRegion(image, box, transform)
+    if (box.w, box.h) != (BLOCK_SIZE.width, BLOCK_SIZE.height):
+        tile = cv2.resize(
+            tile, (BLOCK_SIZE.width, BLOCK_SIZE.height), interpolation=cv2.INTER_AREA
+        )
+    return tile
+
+
+def extract_cropped_pair(
+    previous_info: model.ImageInfo,
+    image_info: model.ImageInfo,
+    previous_image: rd.RegionImage,
+    current_image: rd.RegionImage,
+    transform_cache: Union[stab.TransformCache, None] = None,
+) -> list[str]:
+    """Extract an image pair by only decoding the sub-images that are saved.
+
+    The sub-images are chosen exactly like `extract_pyramid_level` chooses them (with the same
+    random numbers), so a seeded run saves the same sub-images as decoding the whole images.
+    The pixels of the warped previous image, and of the smaller pyramid levels (which are shrunk
+    from the full size sub-image rather than from the whole image), can differ by rounding.
+
+    Returns:
+        list[str]: The file paths of all the saved sub-images
+    """
+    if previous_image.size != current_image.size:
+        print("Different image sizes - skipping")
+        return []
+    print("Processing: ", image_info.filePath)
+
+    # Choose the sub-images to save before decoding anything
+    seed_image_pair(image_info)
+    levels = sir.getTilePyramid(
+        BLOCK_SIZE, current_image.size, TILE_STRIDE, TILE_SCALES
+    )
+    region_index = model.RegionIndex(model.confirmedRegions(image_info.regions))
+    selected: list[tuple[float, model.TaggedRegion2d]] = []
+    with profiler.span("tile"):
+        for level in levels:
+            sub_regions = sir.createSubImageTaggedRegions(level.regions, region_index)
+            for sub_region in sub_regions:
+                if sub_region.tag or random.random() < NEGATIVE_SAMPLE_RATE:
+                    selected.append((level.scale, sub_region))
+    if len(selected) == 0:
+        return []
+
+    transform: Union[np.ndarray, None] = None
+    if STABILISE_IMAGES:
+        with profiler.span("stabilise"):
+            transform = estimate_pair_transform(previous_info, image_info, transform_cache)
+
+    tiles: list[str] = []
+    for scale, sub_region in selected:
+        with profiler.span("decode region"):
+            previous_tile = decode_cropped_tile(previous_image, sub_region, transform)
+            current_tile = decode_cropped_tile(current_image, sub_region)
+        with profiler.span("diff"):
+            sub_image_diff = calculate_image_diff(previous_tile, current_tile)
+
+        output_info = OutputImageInfo(out_dir, image_info, sub_region, scale)
+        if sub_region.tag:
+            tiles.extend(save_sub_image_tagged(output_info, sub_image_diff))
+        else:
+            tiles.append(save_sub_image(output_info, sub_image_diff))
+    return tiles
+
+
+def extract_pairs_in_pipeline(
+    pairs: list[ImagePair],
+    transform_cache: Union[stab.TransformCache, None],
+    worker_count: int,
+    mining_stats: Union[hnm.MiningStats, None] = None,
+) -> Iterable[PairResult]:
+    """Decode each image pair (and estimate its stabilisation transform) in this process,
+    and stabilise, tile and encode them in worker processes
+    (the decoded images are passed to the workers through a `SharedFrameRing`).
+    The results are returned as the workers finish them (not necessarily in order).
+    The workers' hard negative mining statistics are added to the given `mining_stats`.
+    """
+    image_cache = ImageCache()
+    context = multiprocessing.get_context()
+    tasks: Any = context.Queue()
+    results: Any = context.Queue()
+    ring: Union[sfr.SharedFrameRing, None] = None
+    workers: list[Any] = []
+    pending: dict[str, str] = {}
+
+    def collect(wait: bool) -> Iterable[PairResult]:
+        """Return the finished results (waiting for every pending result if `wait`)"""
+        while pending:
+            try:
+                pair_id, tiles, scores, stats, error = results.get(
+                    block=wait, timeout=1.0
+                )
+            except queue.Empty:
+                if not wait:
+                    return
+                if not all(w.is_alive() for w in workers):
+                    raise RuntimeError("A sub-image extraction worker process died")
+                continue
+
+            if error is not None:
+                raise RuntimeError(f"Failed to extract {pair_id}:\n{error}")
+            key = pending.pop(pair_id)
+            if stats is not None and mining_stats is not None:
+                mining_stats.add(stats)
+            yield (pair_id, key, tiles, scores)
+
+    try:
+        for previous_info, image_info, key in pairs:
+            previous_image = image_cache.load(previous_info.filePath)
+            current_image = image_cache.load(image_info.filePath)
+            images = [previous_image, current_image]
+            if (
+                previous_image is None
+                or current_image is None
+                or previous_image.shape != current_image.shape
+            ):
+                # The image pair is skipped (`extract_decoded_pair` reports why)
+                tiles = extract_decoded_pair(
+                    previous_info, image_info, previous_image, current_image
+                )
+                yield (image_info.filePath, key, tiles, {})
+                continue
+
+            # The slots are sized for the first image pair (the images are usually all
+            # from the same camera), and the workers are started once the ring exists
+            if ring is None:
+                slot_bytes = previous_image.nbytes + current_image.nbytes
+                ring = sfr.SharedFrameRing(worker_count * 2, slot_bytes, context)
+                config = current_config()
+                workers = [
+                    context.Process(
+                        target=_pipeline_worker,
+                        args=(config, ring.names, ring.freeSlots, tasks, results),
+                        daemon=True,
+                    )
+                    for _ in range(worker_count)
+                ]
+                for worker in workers:
+                    worker.start()
+
+            # Any larger images are extracted in this process
+            if not ring.fits(images):
+                tiles = extract_decoded_pair(
+                    previous_info, image_info, previous_image, current_image, transform_cache
+                )
+                yield (image_info.filePath, key, tiles, take_tile_scores(tiles))
+                continue
+
+            # Estimate the stabilisation transform here, where the cache is, in the group order
+            # of the image pairs (so each pair re-uses the last image of the previous pair,
+            # and the transforms don't depend on which worker extracts which pair)
+            transform: Union[np.ndarray, None] = None
+            if STABILISE_IMAGES:
+                with profiler.span("stabilise"):
+                    transform = estimate_pair_transform(
+                        previous_info,
+                        image_info,
+                        transform_cache,
+                        previous_image,
+                        current_image,
+                    )
+
+            # Wait for a free slot, collecting the finished results while we wait
+            while True:
+                try:
+                    handle = ring.write(images, timeout=1.0)
+                    break
+                except queue.Empty:
+                    yield from collect(wait=False)
+                    if not all(w.is_alive() for w in workers):
+                        raise RuntimeError("A sub-image extraction worker process died")
+
+            pending[image_info.filePath] = key
+            tasks.put((image_info, handle, transform))
+            yield from collect(wait=False)
+
+        yield from collect(wait=True)
+        for _ in workers:
+            tasks.put(None)
+        for worker in workers:
+            worker.join()
+
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        if ring is not None:
+            ring.close()
+
+
+def _pipeline_worker(
+    config: ec.ExtractionConfig,
+    ring_names: list[str],
+    free_slots: Any,
+    tasks: Any,
+    results: Any,
+) -> None:
+    """The pipeline worker process: stabilise, tile and encode each image pair it is given
+    until it is given `None`
+    """
+    # Extract exactly like the main process (even if the worker was spawned rather than forked).
+    # This also gives each worker its own random negative sampling
+    # (a seeded run re-seeds for every image pair instead)
+    apply_config(config)
+    if HARD_NEGATIVE_MINING is not None:
+        # Share the cores between the workers' models (each would use every core otherwise)
+        from src import inference
+
+        inference.configureThreads(max(1, (os.cpu_count() or 1) // PIPELINE_WORKERS))
+
+    reader = sfr.SharedFrameReader(ring_names, free_slots)
+    try:
+        while (task := tasks.get()) is not None:
+            image_info, handle, transform = task
+            tiles: list[str] = []
+            scores: dict[str, float] = {}
+            error: Union[str, None] = None
+            previous_image: Any = None
+            current_image: Any = None
+            try:
+                previous_image, current_image = reader.read(handle)
+                if transform is not None:
+                    previous_image = stab.warpImage(previous_image, transform)
+                seed_image_pair(image_info)
+                tiles = extract_image_pair(out_dir, image_info, previous_image, current_image)
+                scores = take_tile_scores(tiles)
+            except Exception:
+                error = traceback.format_exc()
+            finally:
+                # The shared memory images must not be used once the slot is released
+                previous_image = current_image = None
+                reader.release(handle)
+            stats = take_mining_stats()
+            results.put((image_info.filePath, tiles, scores, stats, error))
+    finally:
+        reader.close()
+
+
+def main(config: Union[ec.ExtractionConfig, None] = None):
+    """Process the main images `.json` data file to create 224x224 training sub-images.
+    Image pairs that are unchanged since the last run (according to the extraction manifest)
+    are skipped, and the sub-images that are no longer produced are deleted.
+    A run manifest (with the configuration and timings) is saved in the output folder.
+
+    Args:
+        config (Union[ec.ExtractionConfig, None]): The extraction configuration
+            (or None to use the current settings of this module)
+    """
+    if config is not None:
+        apply_config(config)
+    started_at = datetime.now(timezone.utc)
+    start_time = time.perf_counter()
+    print(f"OpenCV version: {cv2.__version__}")
+
+    # Load the list of animals from the animals JSON file
+    images_data_file: model.ImagesCollection = ds.loadImagesCollectionFromJson(IMAGES_FILE)
 
     # Group them
     image_groups: list[list[model.ImageInfo]] = grouping.groupImages(
@@ -274,61 +1219,279 @@ def main():
     create_directory_if_not_exists(os.path.join(out_dir, "true"))
     create_directory_if_not_exists(os.path.join(out_dir, "false"))
 
-    # For every group
-    group_count = 0
-    for animal_group in image_groups:
-        # For each group we want to track the previous
-        group_count += 1
-        print(f"Group #{group_count} of {len(image_groups)}")
-        previous_image: Union[Any, None] = None
-        for image_info in animal_group:
-            # Load the image and grab its dimensions
-            current_image: Any = cv2.imread(image_info.filePath)
-            height, width = current_image.shape[0], current_image.shape[1]
-            image_size = model.Size2d(width, height)
-
-            # Check that we have a previous image to operate on
-            if previous_image is None:
-                previous_image = current_image
-                continue
-
-            # Check that the current image is the same shape as the previous image
-            # (for some reason the images are sometimes different shapes)
-            if previous_image.shape != current_image.shape:
-                print("Different image sizes - skipping")
-                previous_image = current_image
-                continue
-
-            # Calculate the difference with the previous image
-            print("Processing: ", image_info.filePath)
-            image_diff = current_image - previous_image
+    # Load the results of the previous run
+    manifest_file = os.path.join(out_dir, em.MANIFEST_FILE_NAME)
+    previous_manifest = em.loadManifest(manifest_file)
+    manifest = em.ExtractionManifest()
+    parameters = extraction_parameters()
+    if PROFILE:
+        profiler.enable()
+    transform_cache = stab.TransformCache(
+        os.path.join(out_dir, stab.TRANSFORM_CACHE_FILE_NAME)
+    )
 
-            # Create the sub-regions that we need to break the large image into
-            sub_image_regions = sir.createSubImageRegions(BLOCK_SIZE, image_size)
-            sub_image_tagged_regions = sir.createSubImageTaggedRegions(
-                sub_image_regions, image_info.regions
+    # Find the image pairs that changed since the last run
+    # (each image is subtracted from the previous image in the group),
+    # and that changed enough to be worth extracting
+    pairs: list[ImagePair] = []
+    skipped_count = 0
+    frame_gate = fg.FrameGate(FRAME_GATE) if FRAME_GATE is not None else None
+    gated_parameters = gated_pair_parameters(parameters)
+    for animal_group in image_groups:
+        for previous_info, image_info in zip(animal_group, animal_group[1:]):
+            pair_id = image_info.filePath
+            key = em.createPairKey(previous_info, image_info, parameters)
+            gated_key = em.createPairKey(previous_info, image_info, gated_parameters)
+            if any(previous_manifest.isUnchanged(pair_id, k) for k in (key, gated_key)):
+                manifest.entries[pair_id] = previous_manifest.entries[pair_id]
+                skipped_count += 1
+            elif frame_gate is not None and not frame_gate.passes(
+                previous_info, image_info
+            ):
+                # Nothing changed, so there are no sub-images to save
+                manifest.entries[pair_id] = em.ManifestEntry(gated_key, [])
+            else:
+                pairs.append((previous_info, image_info, key))
+    gated_count = 0
+    if frame_gate is not None:
+        gated_count = frame_gate.stats.skipped
+        print(frame_gate.summary())
+    print(f"Extracting {len(pairs)} image pairs from {len(image_groups)} groups")
+
+    # For every changed image pair
+    completed = False
+    extracted_count = 0
+    tile_count = 0
+    mining_stats = hnm.MiningStats() if HARD_NEGATIVE_MINING is not None else None
+    extract_start_time = time.perf_counter()
+    if DECODE_MODE == "crop" and not can_decode_cropped():
+        print("Cropping needs the uniform negative sampling - decoding the whole images")
+    elif can_decode_cropped() and PIPELINE_WORKERS > 0:
+        print("Cropping extracts in this process - ignoring the pipeline workers")
+    try:
+        if can_decode_cropped():
+            results = extract_pairs_cropped(pairs, transform_cache)
+        elif PIPELINE_WORKERS > 0:
+            results = extract_pairs_in_pipeline(
+                pairs, transform_cache, PIPELINE_WORKERS, mining_stats
             )
-
-            # Loop over each sub-image region
-            for sub_region in sub_image_tagged_regions:
-                # Numpy uses row, col notation instead of col, row
-                # From: https://stackoverflow.com/questions/67353650/extract-part-of-a-image-using-opencv
-                # or: https://stackoverflow.com/questions/15589517/how-to-crop-an-image-in-opencv-using-python
-                # or: https://stackoverflow.com/questions/9084609/how-to-copy-a-image-region-using-opencv-in-python
-                sub_image_diff = image_diff[
-                    sub_region.y1 : sub_region.y2, sub_region.x1 : sub_region.x2
-                ]
-
-                output_info = OutputImageInfo(out_dir, image_info, sub_region)
-                if sub_region.tag:
-                    save_sub_image_tagged_true(output_info, sub_image_diff)
-                else:
-                    save_sub_image_tagged_false(output_info, sub_image_diff)
-
-            # Update the previous image for the next image subtraction
-            previous_image = current_image
+        else:
+            results = extract_pairs_in_process(pairs, transform_cache)
+        for pair_id, key, tiles, scores in results:
+            manifest.entries[pair_id] = em.ManifestEntry(key, tiles, scores)
+            extracted_count += 1
+            tile_count += len(tiles)
+        completed = True
+
+    finally:
+        extract_seconds = time.perf_counter() - extract_start_time
+        stats = take_mining_stats()
+        if mining_stats is not None:
+            if stats is not None:
+                mining_stats.add(stats)
+            print(mining_stats.summary())
+        if not completed:
+            # Keep the entries we didn't get to, their sub-images are still valid
+            for pair_id, entry in previous_manifest.entries.items():
+                manifest.entries.setdefault(pair_id, entry)
+
+        # Remove the sub-images that are no longer produced, and save the new manifest
+        deleted_count = em.deleteStaleTiles(previous_manifest, manifest)
+        em.saveManifest(manifest_file, manifest)
+        transform_cache.save()
+
+        # Write out the index of every training sample for the data loader
+        tile_index_entries = ti.createTileIndexEntries(
+            sorted(manifest.allTiles()),
+            AUGMENTATION_MODE == "index",
+            manifest.allScores(),
+        )
+        ti.saveTileIndex(os.path.join(out_dir, ti.TILE_INDEX_FILE_NAME), tile_index_entries)
+        print(f"Skipped {skipped_count} unchanged image pairs")
+        print(f"Deleted {deleted_count} stale sub-images")
+
+        if profiler.enabled:
+            profiler.saveJson(os.path.join(out_dir, "__profile.json"))
+            profiler.saveChromeTrace(os.path.join(out_dir, "__profile.trace.json"))
+            print(profiler.summary())
+
+        # Record how the run went
+        run_manifest = {
+            "completed": completed,
+            "startedAt": started_at.isoformat(),
+            "config": ec.configToJson(current_config()),
+            "parameters": parameters,
+            "versions": {
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "numpy": np.__version__,
+            },
+            "counts": {
+                "groups": len(image_groups),
+                "pairs": len(pairs) + skipped_count + gated_count,
+                "extractedPairs": extracted_count,
+                "skippedPairs": skipped_count,
+                "savedSubImages": tile_count,
+                "deletedSubImages": deleted_count,
+                "frameGate": frame_gate.stats.toJson() if frame_gate else None,
+                "hardNegativeMining": mining_stats.toJson() if mining_stats else None,
+            },
+            "timings": {
+                "totalSeconds": time.perf_counter() - start_time,
+                "extractSeconds": extract_seconds,
+                "pairsPerSecond": _rate(extracted_count, extract_seconds),
+                "subImagesPerSecond": _rate(tile_count, extract_seconds),
+            },
+            "profile": (
+                {name: asdict(s) for name, s in profiler.stats().items()}
+                if profiler.enabled
+                else None
+            ),
+        }
+        with open(os.path.join(out_dir, ec.RUN_MANIFEST_FILE_NAME), "w") as f:
+            json.dump(run_manifest, f, indent=2)
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else 0.0
+
+
+def parseArguments(argv: Union[Sequence[str], None] = None) -> ec.ExtractionConfig:
+    """Parse the command line into the extraction configuration.
+    The settings come from this module, then the `--config` file, then the command line options.
+    """
+    parser = argparse.ArgumentParser(
+        description="Cut the tagged camera images into training sub-images"
+    )
+    parser.add_argument("--config", help="A `.json` extraction configuration file")
+    parser.add_argument("--out-dir", help="The output folder for the sub-images")
+    parser.add_argument(
+        "--images", help="The images `.json` data file (default: animals.json)"
+    )
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The size of the sub-images",
+    )
+    parser.add_argument(
+        "--tile-stride",
+        type=int,
+        nargs=2,
+        metavar=("WIDTH", "HEIGHT"),
+        help="The distance between neighbouring sub-images "
+        "(default: no overlap, or e.g. 112 112 for sub-images that overlap by half)",
+    )
+    parser.add_argument(
+        "--tile-scales",
+        type=float,
+        nargs="+",
+        help="The image scales the sub-images are taken from (e.g. 1 0.5 0.25)",
+    )
+    parser.add_argument(
+        "--negative-sample-rate",
+        type=float,
+        help="Sample the negative sub-images uniformly at this rate "
+        "(rather than by how much they changed)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="The number of pipeline worker processes (0 to extract in this process)",
+    )
+    parser.add_argument(
+        "--backend", choices=["pil", "cv2"], help="The sub-image JPEG encoder"
+    )
+    parser.add_argument("--jpeg-quality", type=int, help="The sub-image JPEG quality")
+    parser.add_argument(
+        "--augmentation-mode",
+        choices=["files", "index"],
+        help="Save the augmented sub-images as files, or only record them in the tile index",
+    )
+    parser.add_argument(
+        "--no-stabilise", action="store_true", help="Don't stabilise the image pairs"
+    )
+    parser.add_argument("--seed", type=int, help="The negative sampling seed")
+    parser.add_argument(
+        "--frame-gate",
+        type=float,
+        metavar="THRESHOLD",
+        help="Skip the untagged image pairs whose most changed (1/8 size) cell changed "
+        "less than this (0 to 255)",
+    )
+    parser.add_argument(
+        "--mine-hard-negatives",
+        metavar="MODEL",
+        help="Keep the negative sub-images this model scores highest "
+        "(a `.pt`/`.onnx` model from `model_export`, or a fastai learner). "
+        "With --workers, each worker's model uses an equal share of the CPU cores",
+    )
+    parser.add_argument(
+        "--decode-mode",
+        choices=["full", "crop"],
+        help="Decode the whole images, or only the saved sub-images "
+        "(which needs --negative-sample-rate, and doesn't use --workers)",
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="Save the profile of the extraction"
+    )
+    parser.add_argument(
+        "--save-config", help="Save the resulting configuration to this `.json` file"
+    )
+    args = parser.parse_args(argv)
+
+    overrides: dict[str, Any] = {}
+    if args.out_dir is not None:
+        overrides["outDir"] = args.out_dir
+    if args.images is not None:
+        overrides["imagesFile"] = args.images
+    if args.block_size is not None:
+        overrides["blockSize"] = args.block_size
+    if args.tile_stride is not None:
+        overrides["tileStride"] = args.tile_stride
+    if args.tile_scales is not None:
+        overrides["tileScales"] = args.tile_scales
+    if args.negative_sample_rate is not None:
+        overrides["negativeSampleRate"] = args.negative_sample_rate
+        overrides["negativeSamplingPolicy"] = None
+    if args.workers is not None:
+        overrides["workers"] = args.workers
+    if args.backend is not None:
+        overrides["subImageBackend"] = args.backend
+    if args.jpeg_quality is not None:
+        overrides["subImageJpegQuality"] = args.jpeg_quality
+    if args.augmentation_mode is not None:
+        overrides["augmentationMode"] = args.augmentation_mode
+    if args.no_stabilise:
+        overrides["stabiliseImages"] = False
+    if args.seed is not None:
+        overrides["seed"] = args.seed
+    if args.profile:
+        overrides["profile"] = True
+    if args.decode_mode is not None:
+        overrides["decodeMode"] = args.decode_mode
+    if args.frame_gate is not None:
+        overrides["frameGate"] = asdict(fg.FrameGatePolicy(threshold=args.frame_gate))
+    if args.mine_hard_negatives is not None:
+        overrides["miningModel"] = args.mine_hard_negatives
+    try:
+        config = current_config()
+        if args.config:
+            config = ec.loadExtractionConfig(args.config, config)
+        if args.mine_hard_negatives is not None and config.hardNegativeMining is None:
+            overrides["hardNegativeMining"] = asdict(hnm.HardNegativePolicy())
+        config = ec.configFromJson(overrides, config)
+        ec.validateConfig(config)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.save_config:
+        ec.saveExtractionConfig(args.save_config, config)
+    return config
 
 
 if __name__ == "__main__":
+    run_config = parseArguments()
     with Timer("Extract tagged sub-images"):
-        main()
+        main(run_config)
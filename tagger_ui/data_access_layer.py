@@ -26,6 +26,7 @@ def convertImageInfoToAnnotatedImage(
 
     result = uiModel.AnnotatedImage(image_info.filePath)
     result.isTagged = image_info.tagged
+    result.confidence = image_info.confidence
     for region in image_info.regions:
         scaledRegion = uiModel.ScaledRegion2d(None, region)
         result.addRegion(scaledRegion)
@@ -39,7 +40,7 @@ def convertAnnotatedImageToImageInfo(ai: uiModel.AnnotatedImage) -> model.ImageI
     regions: list[model.Region2d] = [
         r.imageRegion for r in ai.regions if r.imageRegion is not None
     ]
-    result = model.ImageInfo(ai.isTagged, ai.filePath, regions)
+    result = model.ImageInfo(ai.isTagged, ai.filePath, regions, ai.confidence)
     return result
 
 
@@ -135,8 +136,8 @@ def loadDirectory(directory: str) -> uiModel.AnnotatedImagesManager:
 
     # First, try and load the directory using any previously saved JSON file
     jsonDirFileName: str = os.path.join(directory, DIR_ANNOTATIONS_FILE_NAME)
-    manager = loadAnnotatedImagesFromJsonFile(jsonDirFileName)
-    if manager is not None:
+    if os.path.isfile(jsonDirFileName):
+        (manager, _) = loadAnnotatedImagesFromJsonFile(jsonDirFileName)
         return manager
 
     # If that didn't work, load the images directly from the list of images
@@ -58,6 +58,7 @@ class DataAnnotatorUI:
         self._canvas.pack(fill="both", expand=True)
         self._canvas.bind("<Button-1>", self._onMouseDown)  # type: ignore
         self._canvas.bind("<B1-Motion>", self._onMouseDrag)  # type: ignore
+        self._canvas.bind("<Button-3>", self._onRightClick)  # type: ignore
         self._canvas.bind("<Configure>", self._onCanvasResize)  # type: ignore
 
     @property
@@ -168,6 +169,9 @@ class DataAnnotatorUI:
         total = len(self._manager)
         tagged = "*" if self._manager.current.isTagged else " "
         newTitle = f"{ROOT_TITLE} - {tagged}{current+1} of {total}"
+        confidence = self._manager.current.confidence
+        if confidence is not None:
+            newTitle += f" (AI confidence: {confidence:.2f})"
         self.root.title(newTitle)
 
     # endregion
@@ -212,6 +216,33 @@ class DataAnnotatorUI:
                 self._saveAnnotations()
             return
 
+        # Move "left" to the previous image the AI model was uncertain about
+        if event.keysym == "c":
+            self._stopAutoMoveTimer()
+            previousUncertainIndex = self._manager.scanForUncertainIndex(-1)
+            if previousUncertainIndex is not None:
+                self.moveToImage(previousUncertainIndex)
+                self._saveAnnotations()
+            return
+
+        # Move "right" to the next image the AI model was uncertain about
+        if event.keysym == "v":
+            self._stopAutoMoveTimer()
+            nextUncertainIndex = self._manager.scanForUncertainIndex(+1)
+            if nextUncertainIndex is not None:
+                self.moveToImage(nextUncertainIndex)
+                self._saveAnnotations()
+            return
+
+        # Accept the AI model's draft regions on the current image
+        if event.keysym == "a":
+            self._stopAutoMoveTimer()
+            self._removeImageRegionRectangles()  # Clear out existing canvas IDs
+            self._manager.current.acceptDraftRegions()
+            self._redrawAllRectangles()  # Now we can redraw them (in the accepted colour)
+            self._saveAnnotations()
+            return
+
         # Jump to the very first image
         if event.keysym == "Home":
             self._stopAutoMoveTimer()
@@ -242,7 +273,7 @@ class DataAnnotatorUI:
             self._removeImageRegionRectangles()  # Clear out existing canvas IDs
 
             # NOW we can clear all the current image's regions
-            self._manager.current.regions.clear()
+            self._manager.current.removeAllRegions()
 
             # Save the new region
             if self._manager:
@@ -274,6 +305,26 @@ class DataAnnotatorUI:
         newRegion = model.Region2d(event.x, event.y, 1, 1)
         self._manager.updateActiveScreenRegion(newRegion)
 
+    def _onRightClick(self, event: tk.Event) -> None:  # type: ignore
+        """Called when the user right clicks on the image canvas.
+        Removes the (top most) region under the mouse
+        """
+        if self._manager is None or self._manager.scale <= 0:
+            return
+
+        # Hit-test in image coordinates (the regions are indexed by their image region)
+        x = int(event.x / self._manager.scale)
+        y = int(event.y / self._manager.scale)
+        hits = self._manager.current.findRegionsAt(x, y)
+        if not hits:
+            return
+
+        self._stopAutoMoveTimer()
+        self._removeImageRegionRectangles()  # Clear out existing canvas IDs
+        self._manager.current.removeRegion(hits[-1])  # The last drawn region is on top
+        self._redrawAllRectangles()
+        self._saveAnnotations()
+
     def _onMouseDrag(self, event: tk.Event) -> None:  # type: ignore
         """Called when the user drags the mouse, selecting a rectangular region of the image
         (kind of the entire point of the app)
@@ -335,7 +386,7 @@ class DataAnnotatorUI:
             return
 
         for region in self._manager.regions:
-            self._drawRegion(region, "red")
+            self._drawRegion(region, "orange" if region.isDraft else "red")
 
         # Now (re)draw the active rectangle (if there is one)
         activeRegion = self._manager.activeRegion
@@ -8,7 +8,7 @@ from typing import List, Union, Tuple
 from PIL import Image, ImageTk  # type: ignore
 
 from .image_utils import scaleImage, isAlreadyScaledCorrectly, calculateImageScale
-from .timer import Timer
+from .timer import profiler
 
 import src.model as model
 from src.model import Size2d
@@ -28,6 +28,7 @@ class AnnotatedImage:
     def __init__(self, filePath: str):
         self._filePath = filePath
         self._regions = []
+        self._regionIndex = None
         self._currentTkImage = None
 
     # ##############################################################################################
@@ -86,6 +87,15 @@ class AnnotatedImage:
     # Indicates if this image has been tagged as having an animal in it
     isTagged: bool = False
 
+    # The AI model's confidence (0 to 1) that this image contains an animal
+    # (only set when the image was pre-annotated by the model)
+    confidence: Union[float, None] = None
+
+    @property
+    def hasDraftRegions(self) -> bool:
+        """`True` if this image has any draft regions (predicted by the AI model)"""
+        return any(r.isDraft for r in self._regions)
+
     @property
     def tkScaledImage(self) -> PhotoImage:
         """The Tk PhotoImage scaled  to the canvas size"""
@@ -97,29 +107,64 @@ class AnnotatedImage:
     def loadImage(self) -> None:
         """Load the underlying full-size image from disk"""
         if self.image is None:
-            with Timer("Loading image: " + self.fileName):
+            with profiler.span("decode image"):
                 self.image = Image.open(self.filePath)
                 self.image.load()
 
     def clearAllRegions(self) -> None:
         """Clear all the regions from this annotated image"""
         self.isTagged = False
+        self.removeAllRegions()
+
+    def removeAllRegions(self) -> None:
+        """Remove all the regions from this annotated image (without changing `isTagged`)"""
         self._regions.clear()
+        self._regionIndex = None
+
+    def removeRegion(self, index: int) -> ScaledRegion2d:
+        """Remove the region with the given index, returning the removed region"""
+        self._regionIndex = None
+        return self._regions.pop(index)
+
+    def findRegionsAt(self, x: int, y: int) -> List[int]:
+        """The indexes of the regions that contain the given point (in image coordinates)"""
+        if self._regionIndex is None:
+            # Only built when needed, and re-used until the regions change
+            # (regions without an image region can't be hit, so they aren't indexed)
+            self._indexedRegions = [
+                i for i, r in enumerate(self._regions) if r.imageRegion is not None
+            ]
+            self._regionIndex = model.RegionIndex(
+                [self._regions[i].imageRegion for i in self._indexedRegions]  # type: ignore
+            )
+        return [self._indexedRegions[i] for i in self._regionIndex.queryPoint(x, y)]
 
     def addRegion(self, region: ScaledRegion2d) -> Tuple[int, ScaledRegion2d]:
         """Add a new region to this annotated image"""
         # With the image region we can now create a scaled region and add it to our collection
         indexOfNewRegion = len(self._regions)
         self._regions.append(region)
-        self.isTagged = True
+        self._regionIndex = None
+        if not region.isDraft:
+            self.isTagged = True
         return (indexOfNewRegion, region)
 
+    def acceptDraftRegions(self) -> None:
+        """Accept all the draft regions predicted by the AI model as human tagged regions"""
+        for region in self._regions:
+            if region.isDraft and region.imageRegion is not None:
+                r = region.imageRegion
+                region.imageRegion = model.Region2d(r.x, r.y, r.w, r.h)
+                self.isTagged = True
+        self._regionIndex = None
+
     def scaleImage(self, scale: float) -> Image.Image:
         """Scale the main image (if there is one loaded) to the given scale.
         Returns the scaled image if it was scaled, otherwise returns None
         """
         assert self.image  # If we don't have an image we can't resize it
-        self._scaledImage = scaleImage(self.image, scale)
+        with profiler.span("resize image"):
+            self._scaledImage = scaleImage(self.image, scale)
         self._scale = scale
         return self._scaledImage
 
@@ -151,7 +196,8 @@ class AnnotatedImage:
     def wrapImageForTk(self) -> None:
         """Wrap the underlying scaled image in a Tk PhotoImage for use by the Tk UI layer"""
         assert self.scaledImage
-        self._currentTkImage = ImageTk.PhotoImage(self.scaledImage)  # type: ignore
+        with profiler.span("wrap image for Tk"):
+            self._currentTkImage = ImageTk.PhotoImage(self.scaledImage)  # type: ignore
 
     # The current TK version of _currentImage
     # VERY IMPORTANT - Python doesn't know that TKinter will hold on to this!
@@ -163,3 +209,8 @@ class AnnotatedImage:
 
     # The selected regions on this image (is any)
     _regions: List[ScaledRegion2d]
+
+    # The spatial index of the regions (for hit-testing), built when first needed,
+    # and the index into `_regions` of each indexed region
+    _regionIndex: Union[model.RegionIndex, None]
+    _indexedRegions: List[int]
@@ -10,6 +10,10 @@ from .scaled_region2d import ScaledRegion2d
 
 from src.model import Size2d, Region2d
 
+# Pre-annotated images whose AI model confidence falls within this range are "uncertain"
+# (these are the images most worth a human's time to review)
+UNCERTAIN_CONFIDENCE_RANGE = (0.2, 0.8)
+
 
 def clearImagesOutsideRange(
     annotatedImages: List[AnnotatedImage],
@@ -163,6 +167,20 @@ class AnnotatedImagesManager:
                 return i
         return None
 
+    def scanForUncertainIndex(self, direction: int) -> Union[int, None]:
+        """Scan through starting at the current image index for the next
+        pre-annotated image that the AI model was uncertain about.
+        direction is either +1 or -1 to control direction.
+        """
+        low, high = UNCERTAIN_CONFIDENCE_RANGE
+        i = self.currentIndex + direction
+        while 0 <= i < len(self._annotatedImages):
+            confidence = self._annotatedImages[i].confidence
+            if confidence is not None and low <= confidence <= high:
+                return i
+            i += direction
+        return None
+
     def moveToImage(self, index: int):
         """Open the image with the given index
         (into our ordered collection of annotated images that we received from the model layer)
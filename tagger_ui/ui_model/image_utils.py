@@ -46,5 +46,5 @@ def scaleImage(image: Image.Image, scale: float) -> Image.Image:
     """Scale the given image with the given scaling factor and return a new image"""
     targetWidth: int = int(image.width * scale)
     targetHeight: int = int(image.height * scale)
-    scaledImage = image.resize((targetWidth, targetHeight), Image.ANTIALIAS)
+    scaledImage = image.resize((targetWidth, targetHeight), Image.Resampling.LANCZOS)
     return scaledImage
@@ -8,7 +8,7 @@ import src.model as model
 from src.model import Region2d
 
 
-@dataclass()
+@dataclass(slots=True)
 class ScaledRegion2d:
     """Represents two related regions:
     The first - image region - represents the selection in the original image size.
@@ -25,6 +25,11 @@ class ScaledRegion2d:
     # The Tinker canvas rectangle ID
     canvasRectId: int = 0
 
+    @property
+    def isDraft(self) -> bool:
+        """`True` if this region was predicted by the AI model, and not yet accepted by a human"""
+        return isinstance(self.imageRegion, model.PredictedRegion2d)
+
     def updateScreenFromImage(self, scaleFactor: float) -> None:
         """Update the screen region from the image region, using the given scaling factor
         (which defines how to go from the original image size to the screen image size)
@@ -2,10 +2,22 @@
 Contains a very simple performance timer,
 which can be used with the Python 3 `with` construct,
 making it very easy to time how long a piece of code takes to run.
+
+It also contains a lightweight profiler, which records named (and possibly nested) spans of code,
+so that the slow parts of a long running process (such as image decoding, resizing, tiling,
+encoding and saving) can be measured without printing every single timing.
+The profiler is disabled by default, and costs next to nothing while it is disabled.
 """
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+import json
+import math
+import os
+import random
+import threading
 import time
 import types
-from typing import Optional, Type
+from typing import Any, ContextManager, Optional, Type
 
 
 class Timer:
@@ -15,12 +27,20 @@ class Timer:
     making it very easy to time how long a piece of code takes to run.
     """
 
-    def __init__(self, taskName: str):
+    def __init__(self, taskName: str, verbose: bool = True):
         self._task_name = taskName
-        self._start_time = float("nan")
+        self._verbose = verbose
+        self._start_time_ns = 0
+        self._elapsed_ns = 0
+
+    @property
+    def elapsedMs(self) -> float:
+        """The time the timed code took to run, in milliseconds"""
+        return self._elapsed_ns / 1_000_000
 
     def __enter__(self):
-        self._start_time = time.time()
+        self._start_time_ns = time.perf_counter_ns()
+        return self
 
     def __exit__(
         self,
@@ -28,7 +48,249 @@ class Timer:
         _excception_instance: Optional[BaseException],
         _exception_traceback: Optional[types.TracebackType],
     ) -> bool:
-        end_time = time.time()
-        total_time_ms = int((end_time - self._start_time) * 1000)
-        print(f"{self._task_name} took {total_time_ms}ms")
+        self._elapsed_ns = time.perf_counter_ns() - self._start_time_ns
+        if self._verbose:
+            print(f"{self._task_name} took {int(self.elapsedMs)}ms")
         return False  # We don't handle the exception
+
+
+@dataclass(frozen=True)
+class SpanEvent:
+    """A single completed span of code"""
+
+    name: str
+    parent: Optional[str]
+    depth: int
+    threadId: int
+    startNs: int
+    durationNs: int
+
+
+@dataclass(frozen=True)
+class SpanStats:
+    """The aggregate timings (in milliseconds) of all the spans with the same name"""
+
+    count: int
+    totalMs: float
+    p50Ms: float
+    p95Ms: float
+    maxMs: float
+
+
+class _Span:
+    """Times a single span of code and records it in the profiler"""
+
+    __slots__ = ("_profiler", "_name", "_parent", "_depth", "_start_ns")
+
+    def __init__(self, profiler: "Profiler", name: str):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        stack = self._profiler._stack()
+        self._parent = stack[-1] if stack else None
+        self._depth = len(stack)
+        stack.append(self._name)
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self,
+        _exception_type: Optional[Type[BaseException]],
+        _excception_instance: Optional[BaseException],
+        _exception_traceback: Optional[types.TracebackType],
+    ) -> bool:
+        duration_ns = time.perf_counter_ns() - self._start_ns
+        self._profiler._stack().pop()
+        self._profiler._record(
+            SpanEvent(
+                self._name,
+                self._parent,
+                self._depth,
+                threading.get_ident(),
+                self._start_ns,
+                duration_ns,
+            )
+        )
+        return False  # We don't handle the exception
+
+
+class _SpanDurations:
+    """The running count, total and maximum duration of the spans with the same name, plus a
+    bounded random sample of their durations (a reservoir) for the percentiles - which are exact
+    until there are more spans than the sample holds
+    """
+
+    __slots__ = ("count", "totalNs", "maxNs", "samples", "_max_samples", "_rng")
+
+    def __init__(self, max_samples: int, rng: random.Random):
+        self.count = 0
+        self.totalNs = 0
+        self.maxNs = 0
+        self.samples: list[int] = []
+        self._max_samples = max_samples
+        self._rng = rng
+
+    def add(self, duration_ns: int) -> None:
+        self.count += 1
+        self.totalNs += duration_ns
+        self.maxNs = max(self.maxNs, duration_ns)
+        if len(self.samples) < self._max_samples:
+            self.samples.append(duration_ns)
+        else:
+            # Keep each of the durations so far with the same probability
+            index = self._rng.randrange(self.count)
+            if index < self._max_samples:
+                self.samples[index] = duration_ns
+
+
+# The shared (do nothing) span used while the profiler is disabled
+_NULL_SPAN: ContextManager[Any] = nullcontext()
+
+
+class Profiler:
+    """Records how long named spans of code take, for example:
+
+        with profiler.span("extract"):
+            with profiler.span("decode"):
+                ...
+
+    The aggregate timings of each span name are available from `stats()`,
+    and all the spans can be saved as JSON or as a Chrome trace
+    (open `chrome://tracing` or https://ui.perfetto.dev and load the file).
+    The memory used is bounded however long the process runs: only the first `max_events` spans
+    are kept for the trace, and the percentiles come from up to `max_samples` durations of each
+    span name.
+    """
+
+    def __init__(
+        self, enabled: bool = False, max_events: int = 1_000_000, max_samples: int = 10_000
+    ):
+        self._enabled = enabled
+        self._max_events = max_events
+        self._max_samples = max_samples
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._events: list[SpanEvent] = []
+        self._durations: dict[str, _SpanDurations] = {}
+        self._rng = random.Random(0)  # Not the shared generator, which may be seeded
+        self._origin_ns = time.perf_counter_ns()
+
+    @property
+    def enabled(self) -> bool:
+        """`True` if spans are being recorded"""
+        return self._enabled
+
+    def enable(self) -> None:
+        """Start recording spans"""
+        self._enabled = True
+
+    def disable(self) -> None:
+        """Stop recording spans (the spans recorded so far are kept)"""
+        self._enabled = False
+
+    def clear(self) -> None:
+        """Remove all the recorded spans"""
+        with self._lock:
+            self._events = []
+            self._durations = {}
+            self._origin_ns = time.perf_counter_ns()
+
+    def span(self, name: str) -> ContextManager[Any]:
+        """Time the code within the `with` block under the given name
+        (does nothing if the profiler is disabled)
+        """
+        if not self._enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def _stack(self) -> list[str]:
+        """The names of the spans currently open on this thread"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, event: SpanEvent) -> None:
+        with self._lock:
+            durations = self._durations.get(event.name)
+            if durations is None:
+                durations = _SpanDurations(self._max_samples, self._rng)
+                self._durations[event.name] = durations
+            durations.add(event.durationNs)
+            if len(self._events) < self._max_events:
+                self._events.append(event)
+
+    @property
+    def events(self) -> list[SpanEvent]:
+        """All the recorded spans (up to `max_events` of them)"""
+        with self._lock:
+            return list(self._events)
+
+    def stats(self) -> dict[str, SpanStats]:
+        """The aggregate timings of each span name"""
+        with self._lock:
+            durations = {
+                name: (d.count, d.totalNs, d.maxNs, list(d.samples))
+                for name, d in self._durations.items()
+            }
+
+        results: dict[str, SpanStats] = {}
+        for name, (count, total_ns, max_ns, samples) in durations.items():
+            samples_ms = sorted(v / 1_000_000 for v in samples)
+            results[name] = SpanStats(
+                count=count,
+                totalMs=total_ns / 1_000_000,
+                p50Ms=_percentile(samples_ms, 50),
+                p95Ms=_percentile(samples_ms, 95),
+                maxMs=max_ns / 1_000_000,
+            )
+        return results
+
+    def summary(self) -> str:
+        """A printable table of the aggregate timings, slowest (in total) first"""
+        lines = [
+            f"{'span':<30} {'count':>8} {'total ms':>10} "
+            f"{'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}"
+        ]
+        stats = sorted(self.stats().items(), key=lambda s: s[1].totalMs, reverse=True)
+        for name, s in stats:
+            lines.append(
+                f"{name:<30} {s.count:>8} {s.totalMs:>10.1f} "
+                f"{s.p50Ms:>8.2f} {s.p95Ms:>8.2f} {s.maxMs:>8.2f}"
+            )
+        return "\n".join(lines)
+
+    def saveJson(self, file_name: str) -> None:
+        """Save the aggregate timings of each span name as JSON"""
+        data = {name: asdict(s) for name, s in self.stats().items()}
+        with open(file_name, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def saveChromeTrace(self, file_name: str) -> None:
+        """Save every recorded span in the Chrome trace event format"""
+        process_id = os.getpid()
+        trace_events = [
+            {
+                "name": e.name,
+                "ph": "X",  # A complete event (with a duration)
+                "ts": (e.startNs - self._origin_ns) / 1000,  # Microseconds
+                "dur": e.durationNs / 1000,
+                "pid": process_id,
+                "tid": e.threadId,
+                "args": {"parent": e.parent} if e.parent else {},
+            }
+            for e in self.events
+        ]
+        with open(file_name, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    """The nearest-rank percentile of the already sorted values"""
+    index = max(0, math.ceil(percent / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+# The shared profiler used to instrument this project (disabled until `profiler.enable()`)
+profiler = Profiler()
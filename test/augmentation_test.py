@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+import src.augmentation as sut
+import src.tile_dataset as tile_dataset
+import src.tile_index as tile_index
+
+
+class ApplyTransformTests(unittest.TestCase):
+    def test_transforms_match_opencv(self):
+        # Setup
+        image = np.arange(4 * 4 * 3, dtype=np.uint8).reshape((4, 4, 3))
+        expected = {
+            sut.IDENTITY: image,
+            sut.ROTATE_90_CLOCKWISE: cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE),
+            sut.ROTATE_90_COUNTER_CLOCKWISE: cv2.rotate(
+                image, cv2.ROTATE_90_COUNTERCLOCKWISE
+            ),
+            sut.FLIP_X: cv2.flip(image, 1),
+            sut.FLIP_Y: cv2.flip(image, 0),
+            sut.FLIP_XY: cv2.flip(image, -1),
+        }
+
+        for name in sut.TRANSFORMS:
+            # Act
+            result = sut.applyTransform(image, name)
+
+            # Test
+            np.testing.assert_array_equal(result, expected[name], err_msg=name)
+
+
+class ApplyTransformsToBatchTests(unittest.TestCase):
+    def test_batch_matches_single_image_transforms(self):
+        # Setup
+        rng = np.random.default_rng(1)
+        batch = rng.integers(0, 255, size=(12, 5, 5, 3), dtype=np.uint8)
+        transform_ids = [i % len(sut.TRANSFORMS) for i in range(len(batch))]
+
+        # Act
+        result = sut.applyTransformsToBatch(batch, transform_ids)
+
+        # Test
+        for i in range(len(batch)):
+            expected = sut.applyTransform(batch[i], sut.TRANSFORMS[transform_ids[i]])
+            np.testing.assert_array_equal(result[i], expected)
+
+    def test_channels_first_batch(self):
+        # Setup
+        batch = np.arange(2 * 3 * 4 * 4).reshape((2, 3, 4, 4))
+        transform_ids = [sut.transformId(sut.FLIP_X), sut.transformId(sut.IDENTITY)]
+
+        # Act
+        result = sut.applyTransformsToBatch(batch, transform_ids, axes=(2, 3))
+
+        # Test
+        np.testing.assert_array_equal(result[0], batch[0][:, :, ::-1])
+        np.testing.assert_array_equal(result[1], batch[1])
+
+
+class CreateTileIndexEntriesTests(unittest.TestCase):
+    def test_positives_are_augmented(self):
+        # Setup
+        tiles = ["/out/true/a_@0000x0000.jpg", "/out/false/b_@0000x0000.jpg"]
+
+        # Act
+        result = list(tile_index.createTileIndexEntries(tiles, augment_positives=True))
+
+        # Test
+        self.assertEqual(len(result), len(sut.TRANSFORMS) + 1)
+        self.assertEqual([e.transform for e in result[:-1]], list(sut.TRANSFORMS))
+        self.assertTrue(all(e.tag for e in result[:-1]))
+        self.assertEqual(result[-1], tile_index.TileIndexEntry(tiles[1], False))
+
+    def test_scores_are_saved_and_loaded(self):
+        # Setup
+        tiles = ["/out/true/a_@0000x0000.jpg", "/out/false/b_@0000x0000.jpg"]
+        entries = tile_index.createTileIndexEntries(
+            tiles, augment_positives=False, scores={tiles[1]: 0.875}
+        )
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".csv")
+        try:
+            tile_index.saveTileIndex(file_name, entries)
+            result = tile_index.loadTileIndex(file_name)
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual([e.score for e in result], [None, 0.875])
+
+    def test_split_keeps_augmented_files_together(self):
+        # Setup
+        # The positives saved with a file for every augmentation ("files" mode)
+        tiles = [
+            f"/out/true/IMG_{i:04}_@0000x0000{'_' + t if t else ''}.jpg"
+            for i in range(10)
+            for t in sut.TRANSFORMS
+        ]
+        entries = list(tile_index.createTileIndexEntries(tiles, augment_positives=False))
+
+        # Act
+        train, valid = tile_dataset.splitTileIndex(entries, 0.2, 42)
+
+        # Test
+        train_sources = {tile_index.sourceTilePath(e.filePath) for e in train}
+        valid_sources = {tile_index.sourceTilePath(e.filePath) for e in valid}
+        self.assertEqual(len(valid_sources), 2)
+        self.assertEqual(len(valid), 2 * len(sut.TRANSFORMS))
+        self.assertEqual(train_sources & valid_sources, set())
+        self.assertEqual(len(train_sources | valid_sources), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import torch
+from fastai.data.core import DataLoaders
+from fastai.data.load import DataLoader
+from fastai.vision.learner import create_head
+import src.cpu_training as sut
+
+
+def createModel() -> torch.nn.Module:
+    """A tiny model with the same (backbone, head) structure as a fastai `cnn_learner` model"""
+    body = torch.nn.Sequential(torch.nn.Conv2d(3, 8, 3), torch.nn.ReLU())
+    return torch.nn.Sequential(body, create_head(8, 2))
+
+
+def createBatches(count: int) -> list[tuple[torch.Tensor, torch.Tensor]]:
+    torch.manual_seed(0)
+    labels = [torch.arange(4) % 2 for _ in range(count)]
+    # The positive images are brighter, so they're easy to tell apart
+    return [(torch.rand(4, 3, 16, 16) + l.view(4, 1, 1, 1).float(), l) for l in labels]
+
+
+class CachedFeaturesTests(unittest.TestCase):
+    def test_features_are_pooled_backbone_outputs(self):
+        # Setup
+        module = createModel().train()
+        batches = createBatches(3)
+
+        # Act
+        result = sut.computeFeatures(module, batches)
+
+        # Test
+        # The concatenated average and max pooling of the 8 backbone channels
+        self.assertEqual(tuple(result.features.shape), (12, 16))
+        self.assertEqual(result.labels.tolist(), [0, 1, 0, 1] * 3)
+        self.assertTrue(module.training)
+
+    def test_fitting_the_head_trains_the_model(self):
+        # Setup
+        module = createModel()
+        features = sut.computeFeatures(module, createBatches(16))
+        _, _, head = sut.splitCnnModel(module)
+        before = module[1][-1].weight.clone()
+
+        # Act
+        error_rates = sut.fitHead(head, features, features, epochs=3, lr=1e-2, batch_size=8)
+
+        # Test
+        self.assertEqual(len(error_rates), 3)
+        self.assertLess(error_rates[-1], 0.5)
+        self.assertFalse(module[1][-1].weight.equal(before))
+
+
+class TuneDataLoadersTests(unittest.TestCase):
+    def test_cpu_loader_settings(self):
+        # Setup
+        loaders = DataLoaders(DataLoader(list(range(8)), bs=4, pin_memory=True))
+        config = sut.CpuTrainingConfig(workers=0, threads=2, prefetchFactor=8)
+
+        # Act
+        sut.tuneDataLoaders(loaders, config)
+
+        # Test
+        loader = loaders.loaders[0]
+        self.assertFalse(loader.pin_memory)
+        self.assertEqual(loader.fake_l.num_workers, 0)
+        self.assertEqual(loader.fake_l.prefetch_factor, 8)
+        self.assertEqual(config.computeThreads, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
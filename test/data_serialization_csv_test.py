@@ -0,0 +1,141 @@
+import os
+import pathlib
+import tempfile
+import unittest
+import src.model as model
+import src.data_serialization_json as ds
+import src.data_serialization_csv as sut
+
+
+class CsvRoundTripTests(unittest.TestCase):
+    def test_animals_json_round_trips_through_csv(self):
+        # Setup
+        test_data_file = pathlib.Path(__file__).parent / "_test_animals.json"
+        collection = ds.loadImagesCollectionFromJson(str(test_data_file))
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".csv")
+        try:
+            sut.saveImagesCollectionToCsv(file_name, collection)
+            result = sut.loadImagesCollectionFromCsv(file_name)
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(result, collection)
+
+    def test_predicted_regions_and_confidence_round_trip(self):
+        # Setup
+        images = [
+            model.ImageInfo(
+                False,
+                "/data/test, with a comma/STC_0002.JPG",
+                [
+                    model.PredictedRegion2d(224, 0, 224, 224, confidence=0.123456789),
+                    model.Region2d(1, 2, 3, 4),
+                ],
+                confidence=0.75,
+            ),
+            model.ImageInfo(True, "/data/test/STC_0003.JPG", []),
+        ]
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".csv")
+        try:
+            count = sut.writeImages(file_name, images)
+            result = list(sut.readImages(file_name))
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(count, 2)
+        self.assertEqual(result, images)
+        self.assertIsInstance(result[0].regions[0], model.PredictedRegion2d)
+
+    def test_reads_two_column_files_in_chunks(self):
+        # Setup
+        _, file_name = tempfile.mkstemp(suffix=".csv")
+        with open(file_name, "w") as f:
+            f.write("Tag,Path\nTRUE,/data/a_0001.jpg\nFALSE, /data/a_0002.jpg\nTRUE,/data/a_3.jpg\n")
+
+        # Act
+        try:
+            chunks = list(sut.readImageChunks(file_name, chunk_size=2))
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual([len(c) for c in chunks], [2, 1])
+        self.assertEqual(chunks[0][1], model.ImageInfo(False, "/data/a_0002.jpg", []))
+        self.assertTrue(chunks[1][0].tagged)
+
+    def test_reads_legacy_files_without_a_header(self):
+        # Setup
+        _, file_name = tempfile.mkstemp(suffix=".csv")
+        with open(file_name, "w", newline="") as f:
+            f.write("True,|/data/cam 1, north/a_0001.jpg|\r\nFalse,/data/a_0002.jpg\r\n")
+
+        # Act
+        try:
+            result = list(sut.readImages(file_name))
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(
+            result,
+            [
+                model.ImageInfo(True, "/data/cam 1, north/a_0001.jpg", []),
+                model.ImageInfo(False, "/data/a_0002.jpg", []),
+            ],
+        )
+
+    def test_reads_excel_and_legacy_quoted_paths(self):
+        # Setup
+        expected = model.ImageInfo(True, "/data/cam 1, north/a_0001.jpg", [])
+        files = {
+            "excel": 'Tag,Path\r\nTRUE,"/data/cam 1, north/a_0001.jpg"\r\n',
+            "legacy": "Tag,Path\nTRUE,|/data/cam 1, north/a_0001.jpg|\n",
+        }
+
+        for name, text in files.items():
+            _, file_name = tempfile.mkstemp(suffix=".csv")
+            with open(file_name, "w", newline="") as f:
+                f.write(text)
+
+            # Act
+            try:
+                result = list(sut.readImages(file_name))
+            finally:
+                os.remove(file_name)
+
+            # Test
+            self.assertEqual(result, [expected], name)
+
+
+class ImageRecordStatsTests(unittest.TestCase):
+    def test_counts_and_tagged_group_starts(self):
+        # Setup
+        images = [
+            model.ImageInfo(True, "/data/cam1/IMG_0001.JPG", []),
+            model.ImageInfo(False, "/data/cam1/IMG_0002.JPG", []),
+            model.ImageInfo(True, "/data/cam1/IMG_0003.JPG", []),
+            model.ImageInfo(True, "/data/cam1/IMG_0010.JPG", []),
+            model.ImageInfo(False, "/data/cam2/IMG_0011.JPG", []),
+        ]
+
+        # Act
+        result = sut.calculateImageRecordStats(iter(images))
+
+        # Test
+        self.assertEqual(result.total, 5)
+        self.assertEqual(result.tagged, 3)
+        self.assertEqual(result.notTagged, 2)
+        self.assertEqual(result.groups, 3)
+        self.assertEqual(
+            result.taggedGroupStarts, ["/data/cam1/IMG_0001.JPG", "/data/cam1/IMG_0010.JPG"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
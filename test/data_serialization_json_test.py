@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 import pathlib
 import src.model as model
@@ -27,5 +29,33 @@ class LoadAnimalsJson(unittest.TestCase):
         self.assertEqual(result.images[1], expected2)
 
 
+class SavePreAnnotatedJson(unittest.TestCase):
+    def test_draft_regions_and_confidence_round_trip(self):
+        # Setup
+        images = [
+            model.ImageInfo(
+                False,
+                "/data/test/STC_0002.JPG",
+                [model.PredictedRegion2d(x=224, y=0, w=224, h=224, confidence=0.75)],
+                confidence=0.75,
+            ),
+            model.ImageInfo(True, "/data/test/STC_0003.JPG", [model.Region2d(1, 2, 3, 4)]),
+        ]
+        collection = model.ImagesCollection(1, 0, images)
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".json")
+        try:
+            sut.saveImagesCollectionToJson(file_name, collection)
+            result = sut.loadImagesCollectionFromJson(file_name)
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(result.images, images)
+        self.assertIsInstance(result.images[0].regions[0], model.PredictedRegion2d)
+        self.assertEqual(model.confirmedRegions(result.images[0].regions), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,128 @@
+import dataclasses
+import unittest
+import src.model as model
+import src.tile_motion as tm
+import src.extraction_config as ec
+import src.dataset_stats as sut
+
+
+def createConfig(**settings) -> ec.ExtractionConfig:
+    config = ec.ExtractionConfig(
+        outDir="/data/output",
+        imagesFile="animals.json",
+        blockSize=model.Size2d(100, 100),
+        tileStride=None,
+        tileScales=(1.0,),
+        negativeSampleRate=0.1,
+        negativeSamplingPolicy=None,
+        stabiliseImages=True,
+        augmentationMode="files",
+        subImageBackend="pil",
+        subImageJpegQuality=75,
+        workers=0,
+        seed=None,
+        profile=False,
+    )
+    return ec.configFromJson(settings, config)
+
+
+def createImages() -> list[model.ImageInfo]:
+    region = model.Region2d(150, 50, 20, 20)  # Touches a single 100x100 tile
+    return [
+        model.ImageInfo(True, "/data/cam1/IMG_0001.JPG", [region]),
+        model.ImageInfo(True, "/data/cam1/IMG_0002.JPG", [region, model.Region2d(0, 0, 5, 5)]),
+        model.ImageInfo(False, "/data/cam1/IMG_0003.JPG", []),
+        model.ImageInfo(True, "/data/cam1/IMG_0009.JPG", [model.Region2d(90, 90, -50, 20)]),
+        model.ImageInfo(False, "/data/cam2/IMG_0010.JPG", []),
+        model.ImageInfo(
+            True,
+            "/data/cam2/IMG_0011.JPG",
+            [region, model.PredictedRegion2d(0, 0, 300, 200, confidence=0.9)],
+        ),
+    ]
+
+
+class ImageTableTests(unittest.TestCase):
+    def test_table_columns(self):
+        # Act
+        table = sut.createImageTable(createImages())
+
+        # Test
+        self.assertEqual(len(table), 6)
+        self.assertEqual(len(table.cameras), 2)
+        self.assertEqual(table.camera.tolist(), [0, 0, 0, 0, 1, 1])
+        self.assertEqual(table.group.tolist(), [0, 0, 0, 1, 2, 2])
+        self.assertEqual(table.isPair.tolist(), [False, True, True, False, False, True])
+
+        # The predicted region is left out, and the regions are normalized
+        self.assertEqual(table.regionImage.tolist(), [0, 1, 1, 3, 5])
+        self.assertEqual(table.regions[3], model.Region2d(40, 90, 50, 20))
+
+    def test_camera_and_group_stats(self):
+        # Setup
+        table = sut.createImageTable(createImages())
+
+        # Act
+        cameras = sut.calculateCameraStats(table)
+        groups = sut.calculateGroupStats(table)
+
+        # Test
+        self.assertEqual(cameras[0], sut.CameraStats(cameras[0].camera, 4, 3, 2, 2, 4))
+        self.assertEqual(cameras[1], sut.CameraStats(cameras[1].camera, 2, 1, 1, 1, 1))
+        self.assertEqual(groups.groups, 3)
+        self.assertEqual(groups.taggedGroups, 3)
+        self.assertEqual(groups.taggedGroupStarts, 2)
+        self.assertEqual(sum(groups.sizeCounts), 3)
+
+
+class ProjectionTests(unittest.TestCase):
+    def test_counts_positive_tiles_of_image_pairs_only(self):
+        # Setup
+        table = sut.createImageTable(createImages())
+        sizes = [model.Size2d(300, 200), None]
+
+        # Act
+        result = sut.countExtractionTiles(table, createConfig(), sizes)
+
+        # Test
+        # Only cam1's 2 pairs have a known size (6 tiles each),
+        # and only the first pair has regions (touching 2 tiles)
+        self.assertEqual(result.pairs, 2)
+        self.assertEqual(result.tiles, 12)
+        self.assertEqual(result.positiveTiles, 2)
+        self.assertEqual(result.unsizedPairs, 1)
+
+    def test_projection_with_augmented_files(self):
+        # Setup
+        counts = sut.TileCounts(pairs=10, tiles=100, positiveTiles=10, unsizedPairs=0)
+
+        # Act
+        files = sut.projectExtraction(counts, createConfig(), bytes_per_file=1000)
+        index = sut.projectExtraction(
+            counts, createConfig(augmentationMode="index"), bytes_per_file=1000
+        )
+
+        # Test
+        self.assertEqual(files.positiveFiles, 60)
+        self.assertAlmostEqual(files.negativeFiles, 9.0)
+        self.assertAlmostEqual(files.bytes, 69_000)
+        self.assertEqual(index.positiveFiles, 10)
+        self.assertEqual(index.positiveSamples, 60)
+        self.assertAlmostEqual(index.positiveRatio, 60 / 69)
+
+    def test_projection_with_motion_sampling_uses_mean_keep_rate(self):
+        # Setup
+        counts = sut.TileCounts(pairs=1, tiles=10, positiveTiles=0, unsizedPairs=0)
+        policy = tm.NegativeSamplingPolicy(thresholds=(1.0,), keepRates=(0.0, 0.5))
+        config = dataclasses.replace(createConfig(), negativeSamplingPolicy=policy)
+
+        # Act
+        result = sut.projectExtraction(counts, config)
+
+        # Test
+        self.assertAlmostEqual(result.negativeKeepRate, 0.25)
+        self.assertAlmostEqual(result.negativeFiles, 2.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import utils.excelFileUtils.taggedImagePaths as sut
+
+
+def createFile(path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write("")
+
+
+class ResolvePathsTests(unittest.TestCase):
+    def test_sub_folder_paths_are_found(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            # Setup
+            createFile(os.path.join(base_dir, "A", "site1", "IMG_0001.JPG"))
+            createFile(os.path.join(base_dir, "B", "site2", "extra", "IMG_0002.JPG"))
+            df = pd.DataFrame(
+                {
+                    "Folder": ["site1", "site2", "site2", "unknown"],
+                    "RelativePath": ["", "extra", "", ""],
+                    "File": ["IMG_0001.JPG", "IMG_0002.JPG", "IMG_0002.JPG", "IMG_9.JPG"],
+                }
+            )
+
+            # Act
+            paths = sut.resolveSubFolderPaths(df, sut.listSubFolders(base_dir))
+            exists = sut.findExistingPaths(paths, sut.listFiles(base_dir))
+
+            # Test
+            self.assertEqual(exists.tolist(), [True, True, False, False])
+            self.assertEqual(paths[3], "")
+            expected = sut.normalizePath(
+                os.path.join(base_dir, "B", "site2", "extra", "IMG_0002.JPG")
+            )
+            self.assertEqual(paths[1], expected)
+
+    def test_camera_paths_are_found(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            # Setup
+            createFile(os.path.join(base_dir, "Camera-3", "100", "IMG_0001.JPG"))
+            df = pd.DataFrame(
+                {"Camera": ["3", "4"], "Folder": ["100", "100"], "File": ["IMG_0001.JPG"] * 2}
+            )
+
+            # Act
+            paths = sut.resolveCameraPaths(df, base_dir)
+            exists = sut.findExistingPaths(paths, sut.listFiles(base_dir))
+
+            # Test
+            self.assertEqual(exists.tolist(), [True, False])
+
+    def test_paths_keep_their_case_and_are_matched_by_key(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            # Setup
+            file_path = os.path.join(base_dir, "Cam1", "IMG_0001.JPG")
+            createFile(file_path)
+            sep = os.sep
+            df = pd.DataFrame(
+                {
+                    "Picture File": [
+                        f" {base_dir}{sep}Cam1{sep}{sep}.{sep}IMG_0001.JPG",
+                        f"{base_dir}{sep}Cam1{sep}IMG_0002.JPG",
+                    ]
+                }
+            )
+
+            # Act
+            paths = sut.resolvePictureFilePaths(df)
+            exists = sut.findExistingPaths(paths, sut.listFiles(base_dir))
+
+            # Test
+            self.assertEqual(paths[0], sut.normalizePath(file_path))
+            self.assertEqual(exists.tolist(), [True, False])
+            self.assertEqual(
+                sut.pathKeyColumn(paths).tolist(), [sut.pathKey(p) for p in paths]
+            )
+
+    def test_duplicate_sub_folders_are_an_error(self):
+        with tempfile.TemporaryDirectory() as base_dir:
+            os.makedirs(os.path.join(base_dir, "A", "site1"))
+            os.makedirs(os.path.join(base_dir, "B", "site1"))
+            with self.assertRaises(ValueError):
+                sut.listSubFolders(base_dir)
+
+
+class ImagesCollectionTests(unittest.TestCase):
+    def test_collection_is_sorted_without_duplicates(self):
+        result = sut.createImagesCollection(["/b.jpg", "/a.jpg", "/b.jpg"])
+        self.assertEqual([i.filePath for i in result.images], ["/a.jpg", "/b.jpg"])
+        self.assertTrue(all(i.tagged and i.regions == [] for i in result.images))
+
+
+class ReadExcelCachedTests(unittest.TestCase):
+    def test_up_to_date_cache_is_used(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            excel_file = os.path.join(temp_dir, "files.xlsx")
+            createFile(excel_file)
+            df = pd.DataFrame({"Folder": ["site1"], "File": ["IMG_0001.JPG"]})
+            df.to_pickle(sut.createCacheFileName(excel_file, "Data", ".pkl"))
+
+            # Act
+            result = sut.readExcelCached(excel_file, "Data")
+
+            # Test
+            pd.testing.assert_frame_equal(result, df)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+from dataclasses import replace
+import os
+import tempfile
+import unittest
+import src.model as model
+import src.frame_gate as fg
+import src.hard_negative_mining as hnm
+import src.tile_motion as tm
+import src.extraction_config as sut
+
+
+def createConfig() -> sut.ExtractionConfig:
+    return sut.ExtractionConfig(
+        outDir="/data/output",
+        imagesFile="animals.json",
+        blockSize=model.Size2d(224, 224),
+        tileStride=None,
+        tileScales=(1.0,),
+        negativeSampleRate=0.075,
+        negativeSamplingPolicy=tm.NegativeSamplingPolicy(),
+        stabiliseImages=True,
+        augmentationMode="files",
+        subImageBackend="pil",
+        subImageJpegQuality=75,
+        workers=0,
+        seed=None,
+        profile=False,
+    )
+
+
+class ExtractionConfigTests(unittest.TestCase):
+    def test_save_and_load_round_trip(self):
+        # Setup
+        config = sut.configFromJson(
+            {
+                "tileStride": [112, 112],
+                "tileScales": [1, 0.5],
+                "workers": 4,
+                "seed": 3,
+                "frameGate": {"threshold": 4.0},
+                "hardNegativeMining": {"maxPerPair": 8},
+                "miningModel": "/data/model.pt",
+                "decodeMode": "crop",
+            },
+            createConfig(),
+        )
+
+        # Act
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_name = os.path.join(temp_dir, "config.json")
+            sut.saveExtractionConfig(file_name, config)
+            result = sut.loadExtractionConfig(file_name, createConfig())
+
+        # Test
+        self.assertEqual(result, config)
+        self.assertEqual(result.tileStride, model.Size2d(112, 112))
+        self.assertEqual(result.tileScales, (1.0, 0.5))
+        self.assertEqual(result.frameGate, fg.FrameGatePolicy(threshold=4.0))
+        self.assertEqual(
+            result.hardNegativeMining, hnm.HardNegativePolicy(maxPerPair=8)
+        )
+
+    def test_missing_settings_keep_the_base_settings(self):
+        # Setup
+        base = createConfig()
+
+        # Act
+        result = sut.configFromJson(
+            {"blockSize": [448, 448], "negativeSamplingPolicy": None}, base
+        )
+
+        # Test
+        self.assertEqual(result.blockSize, model.Size2d(448, 448))
+        self.assertIsNone(result.negativeSamplingPolicy)
+        self.assertEqual(result.outDir, base.outDir)
+        self.assertEqual(result.negativeSampleRate, base.negativeSampleRate)
+
+    def test_unknown_setting_is_an_error(self):
+        with self.assertRaises(ValueError):
+            sut.configFromJson({"outputFolder": "/data"}, createConfig())
+
+    def test_invalid_policy_settings_are_errors(self):
+        # Setup
+        invalid = {
+            "Unknown frameGate settings": {"frameGate": {"threshhold": 4.0}},
+            "Invalid hardNegativeMining settings": {
+                "hardNegativeMining": {"randomRate": 2.0}
+            },
+            "Invalid negativeSamplingPolicy settings": {
+                "negativeSamplingPolicy": {"thresholds": [2.0]}
+            },
+            "negativeSamplingPolicy must be a JSON object": {"negativeSamplingPolicy": 0.1},
+        }
+
+        for message, data in invalid.items():
+            # Act
+            with self.assertRaises(ValueError) as context:
+                sut.configFromJson(data, createConfig())
+
+            # Test
+            self.assertIn(message, str(context.exception))
+
+    def test_missing_policy_settings_keep_their_defaults(self):
+        # Act
+        result = sut.configFromJson(
+            {"negativeSamplingPolicy": {"keepRates": [0.0, 0.1, 0.2, 0.3]}},
+            createConfig(),
+        )
+
+        # Test
+        self.assertEqual(
+            result.negativeSamplingPolicy,
+            tm.NegativeSamplingPolicy(keepRates=(0.0, 0.1, 0.2, 0.3)),
+        )
+
+
+class ValidateConfigTests(unittest.TestCase):
+    def test_valid_config_passes(self):
+        sut.validateConfig(createConfig())
+
+    def test_every_invalid_setting_is_reported(self):
+        # Setup
+        config = replace(
+            createConfig(),
+            tileStride=model.Size2d(0, 112),
+            tileScales=(0.5, 1.0),
+            augmentationMode="copies",
+            workers=-1,
+            hardNegativeMining=hnm.HardNegativePolicy(),
+        )
+
+        # Act
+        with self.assertRaises(ValueError) as context:
+            sut.validateConfig(config)
+
+        # Test
+        message = str(context.exception)
+        names = ("tileStride", "tileScales", "augmentationMode", "workers", "miningModel")
+        for name in names:
+            self.assertIn(name, message)
+        self.assertNotIn("decodeMode", message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+import src.model as model
+import src.extraction_manifest as sut
+
+
+class CreatePairKeyTests(unittest.TestCase):
+    def test_same_inputs_create_same_key(self):
+        # Setup
+        previous = model.ImageInfo(False, "/data/missing/foo_0001.jpg", [])
+        current = model.ImageInfo(True, "/data/missing/foo_0002.jpg", [])
+        parameters = {"blockSize": [224, 224]}
+
+        # Act
+        key1 = sut.createPairKey(previous, current, parameters)
+        key2 = sut.createPairKey(previous, current, parameters)
+
+        # Test
+        self.assertEqual(key1, key2)
+
+    def test_new_region_changes_key(self):
+        # Setup
+        previous = model.ImageInfo(False, "/data/missing/foo_0001.jpg", [])
+        current1 = model.ImageInfo(True, "/data/missing/foo_0002.jpg", [])
+        current2 = model.ImageInfo(
+            True, "/data/missing/foo_0002.jpg", [model.Region2d(1, 2, 3, 4)]
+        )
+        parameters = {"blockSize": [224, 224]}
+
+        # Act
+        key1 = sut.createPairKey(previous, current1, parameters)
+        key2 = sut.createPairKey(previous, current2, parameters)
+
+        # Test
+        self.assertNotEqual(key1, key2)
+
+    def test_new_parameters_changes_key(self):
+        # Setup
+        previous = model.ImageInfo(False, "/data/missing/foo_0001.jpg", [])
+        current = model.ImageInfo(True, "/data/missing/foo_0002.jpg", [])
+
+        # Act
+        key1 = sut.createPairKey(previous, current, {"blockSize": [224, 224]})
+        key2 = sut.createPairKey(previous, current, {"blockSize": [128, 128]})
+
+        # Test
+        self.assertNotEqual(key1, key2)
+
+
+class ManifestTests(unittest.TestCase):
+    def test_save_and_load_returns_same(self):
+        # Setup
+        manifest = sut.ExtractionManifest()
+        manifest.entries["/data/b.jpg"] = sut.ManifestEntry("abc", ["/out/true/b.jpg"])
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".json")
+        try:
+            sut.saveManifest(file_name, manifest)
+            result = sut.loadManifest(file_name)
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(result, manifest)
+        self.assertTrue(result.isUnchanged("/data/b.jpg", "abc"))
+        self.assertFalse(result.isUnchanged("/data/b.jpg", "def"))
+        self.assertFalse(result.isUnchanged("/data/c.jpg", "abc"))
+
+    def test_save_and_load_keeps_scores(self):
+        # Setup
+        manifest = sut.ExtractionManifest()
+        manifest.entries["/data/b.jpg"] = sut.ManifestEntry(
+            "abc", ["/out/false/b.jpg"], {"/out/false/b.jpg": 0.75}
+        )
+        manifest.entries["/data/c.jpg"] = sut.ManifestEntry("def", ["/out/true/c.jpg"])
+
+        # Act
+        _, file_name = tempfile.mkstemp(suffix=".json")
+        try:
+            sut.saveManifest(file_name, manifest)
+            result = sut.loadManifest(file_name)
+        finally:
+            os.remove(file_name)
+
+        # Test
+        self.assertEqual(result, manifest)
+        self.assertEqual(result.allScores(), {"/out/false/b.jpg": 0.75})
+
+    def test_finds_stale_tiles(self):
+        # Setup
+        previous = sut.ExtractionManifest(
+            {
+                "/data/b.jpg": sut.ManifestEntry("abc", ["/out/b1.jpg", "/out/b2.jpg"]),
+                "/data/c.jpg": sut.ManifestEntry("def", ["/out/c1.jpg"]),
+            }
+        )
+        current = sut.ExtractionManifest(
+            {"/data/b.jpg": sut.ManifestEntry("xyz", ["/out/b1.jpg"])}
+        )
+
+        # Act
+        result = sorted(sut.findStaleTiles(previous, current))
+
+        # Test
+        self.assertEqual(result, ["/out/b2.jpg", "/out/c1.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+import src.model as model
+import src.frame_gate as sut
+
+
+def createScene() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    scene = rng.integers(40, 180, size=(60, 80), dtype=np.uint8)
+    return cv2.resize(scene, (800, 600), interpolation=cv2.INTER_CUBIC)
+
+
+def saveImage(folder: str, name: str, image: np.ndarray) -> model.ImageInfo:
+    path = os.path.join(folder, name)
+    cv2.imwrite(path, image)
+    return model.ImageInfo(False, path, [])
+
+
+class FrameChangeScoreTests(unittest.TestCase):
+    def test_brightness_changes_are_ignored(self):
+        # Setup
+        scene = createScene()
+        brighter = cv2.convertScaleAbs(scene, alpha=1.3)
+
+        # Act
+        result = sut.calculateFrameChangeScore(scene, brighter, 28)
+
+        # Test
+        self.assertLess(result, 6.0)
+
+    def test_a_small_change_is_found(self):
+        # Setup
+        scene = createScene()
+        changed = scene.copy()
+        changed[10:30, 10:30] = 255
+
+        # Act
+        result = sut.calculateFrameChangeScore(scene, changed, 28)
+
+        # Test
+        self.assertGreater(result, 6.0)
+
+
+class FrameGateTests(unittest.TestCase):
+    def test_only_changed_or_tagged_frames_pass(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            scene = createScene()
+            changed = scene.copy()
+            changed[200:300, 300:400] = 0
+            first = saveImage(temp_dir, "IMG_0001.png", scene)
+            same = saveImage(temp_dir, "IMG_0002.png", scene)
+            animal = saveImage(temp_dir, "IMG_0003.png", changed)
+            tagged_path = saveImage(temp_dir, "IMG_0004.png", changed).filePath
+            tagged = model.ImageInfo(True, tagged_path, [])
+            gate = sut.FrameGate(sut.FrameGatePolicy())
+
+            # Act
+            results = [
+                gate.passes(first, same),
+                gate.passes(same, animal),
+                gate.passes(animal, tagged),
+            ]
+
+            # Test
+            self.assertEqual(results, [False, True, True])
+            self.assertEqual(gate.stats.frames, 3)
+            self.assertEqual(gate.stats.skipped, 1)
+            self.assertEqual(gate.stats.tagged, 1)
+
+    def test_frames_that_cant_be_loaded_pass(self):
+        # Setup
+        gate = sut.FrameGate(sut.FrameGatePolicy())
+        images = [model.ImageInfo(False, f"/missing/IMG_000{i}.JPG", []) for i in (1, 2)]
+
+        # Act
+        result = gate.passes(images[0], images[1])
+
+        # Test
+        self.assertTrue(result)
+
+
+if __name__ == "__main__":
+    unittest.main()
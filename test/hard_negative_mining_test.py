@@ -0,0 +1,65 @@
+import unittest
+import numpy as np
+import src.hard_negative_mining as sut
+
+
+class BrightnessClassifier:
+    """Scores each sub-image by its mean brightness, and records the batch sizes"""
+
+    def __init__(self):
+        self.batchSizes: list[int] = []
+
+    def predict(self, tiles: np.ndarray) -> np.ndarray:
+        self.batchSizes.append(len(tiles))
+        return tiles.mean(axis=(1, 2, 3)) / 255.0
+
+
+class SelectHardNegativesTests(unittest.TestCase):
+    def test_keeps_the_highest_scoring_false_positives(self):
+        # Setup
+        scores = np.array([0.2, 0.9, 0.6, 0.95, 0.7, 0.1])
+        policy = sut.HardNegativePolicy(minScore=0.5, maxPerPair=3, randomRate=0.0)
+
+        # Act
+        hard, random = sut.selectHardNegatives(scores, policy, np.random.default_rng(0))
+
+        # Test
+        self.assertEqual(np.flatnonzero(hard).tolist(), [1, 3, 4])
+        self.assertFalse(random.any())
+
+    def test_random_remainder_excludes_the_hard_negatives(self):
+        # Setup
+        scores = np.array([0.9] * 10 + [0.0] * 990)
+        policy = sut.HardNegativePolicy(minScore=0.5, maxPerPair=16, randomRate=0.1)
+
+        # Act
+        hard, random = sut.selectHardNegatives(scores, policy, np.random.default_rng(0))
+
+        # Test
+        self.assertEqual(int(hard.sum()), 10)
+        self.assertFalse((hard & random).any())
+        self.assertTrue(70 < int(random.sum()) < 130)
+
+
+class HardNegativeMinerTests(unittest.TestCase):
+    def test_scores_in_batches_and_counts_kept_tiles(self):
+        # Setup
+        tiles = np.zeros((5, 4, 4, 3), dtype=np.uint8)
+        tiles[[1, 3]] = 255
+        classifier = BrightnessClassifier()
+        miner = sut.HardNegativeMiner(
+            classifier, sut.HardNegativePolicy(randomRate=0.0, batchSize=2)
+        )
+
+        # Act
+        keep, scores = miner.mine(tiles, np.random.default_rng(0))
+
+        # Test
+        self.assertEqual(classifier.batchSizes, [2, 2, 1])
+        np.testing.assert_allclose(scores, [0.0, 1.0, 0.0, 1.0, 0.0])
+        self.assertEqual(np.flatnonzero(keep).tolist(), [1, 3])
+        self.assertEqual((miner.stats.scored, miner.stats.hard, miner.stats.kept), (5, 2, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
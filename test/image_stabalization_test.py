@@ -0,0 +1,87 @@
+import unittest
+import cv2
+import numpy as np
+import src.image_stabalization as sut
+
+
+def createTexturedImage(width: int, height: int) -> np.ndarray:
+    """Create a camera-like image with plenty of corners to track"""
+    rng = np.random.default_rng(7)
+    blocks = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+    return cv2.GaussianBlur(image, (5, 5), 0)
+
+
+class EstimateImagePairTransformTests(unittest.TestCase):
+    def test_estimates_shift_and_rotation(self):
+        # Setup
+        previous = createTexturedImage(1024, 768)
+        expected = cv2.getRotationMatrix2D((512, 384), 1.5, 1.0)
+        expected[:, 2] += (12.0, -8.0)
+        current = sut.warpImage(previous, expected)
+
+        # Act
+        result = sut.estimateImagePairTransform(previous, current, levels=2)
+
+        # Test
+        assert result is not None
+        np.testing.assert_allclose(result[:, :2], expected[:, :2], atol=0.01)
+        np.testing.assert_allclose(result[:, 2], expected[:, 2], atol=3.0)
+
+    def test_featureless_images_return_none(self):
+        # Setup
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+
+        # Act
+        result = sut.estimateImagePairTransform(blank, blank)
+
+        # Test
+        self.assertIsNone(result)
+
+
+class TrackTransformTests(unittest.TestCase):
+    def test_tracked_points_can_seed_the_next_image(self):
+        # Setup
+        first = cv2.cvtColor(createTexturedImage(640, 480), cv2.COLOR_BGR2GRAY)
+        shift = np.array([[1.0, 0.0, 4.0], [0.0, 1.0, -3.0]])
+        second = sut.warpImage(first, shift)
+        third = sut.warpImage(second, shift)
+        _, seed_points = sut.trackTransform(first, second)
+
+        # Act
+        result, tracked_points = sut.trackTransform(second, third, seed_points)
+
+        # Test
+        assert result is not None and seed_points is not None
+        self.assertGreaterEqual(len(seed_points), sut.MIN_SEED_POINTS)
+        self.assertLessEqual(len(tracked_points), len(seed_points))
+        np.testing.assert_allclose(result, shift, atol=0.5)
+
+
+class PairTransformEstimatorTests(unittest.TestCase):
+    def test_the_next_pair_re_uses_the_last_image(self):
+        # Setup
+        first = createTexturedImage(1024, 768)
+        shift = np.array([[1.0, 0.0, 8.0], [0.0, 1.0, -4.0]])
+        second = sut.warpImage(first, shift)
+        third = sut.warpImage(second, shift)
+        estimator = sut.PairTransformEstimator(levels=1)
+        estimator.estimate("IMG_0001.JPG", "IMG_0002.JPG", first, second)
+
+        # Act (the second image isn't given, or on disk, so it must be re-used)
+        result = estimator.estimate("IMG_0002.JPG", "IMG_0003.JPG", None, third)
+
+        # Test
+        assert result is not None
+        np.testing.assert_allclose(result, shift, atol=1.0)
+
+
+class UpscaleTransformTests(unittest.TestCase):
+    def test_only_translation_is_scaled(self):
+        transform = np.array([[1.0, 0.1, 2.0], [-0.1, 1.0, 3.0]])
+        result = sut.upscaleTransform(transform, levels=3)
+        np.testing.assert_allclose(result, [[1.0, 0.1, 16.0], [-0.1, 1.0, 24.0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
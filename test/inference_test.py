@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+import warnings
+import cv2
+import numpy as np
+import torch
+from fastai.data.core import DataLoaders, Datasets
+from fastai.learner import Learner
+import src.model as model
+import src.sub_image_regions as sir
+import src.tile_classifier as tc
+import src.training_sub_image_extraction as extraction
+import src.inference as sut
+
+
+def createChangeModule() -> torch.nn.Module:
+    """Scores a sub-image as an animal when any of its pixels changed a lot
+    (the animal logit is the sum of the brightest normalized pixel of each channel)
+    """
+    linear = torch.nn.Linear(3, 2)
+    with torch.no_grad():
+        linear.weight.copy_(torch.tensor([[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]]))
+        linear.bias.zero_()
+    return torch.nn.Sequential(torch.nn.AdaptiveMaxPool2d(1), torch.nn.Flatten(), linear)
+
+
+def saveFrames(folder: str) -> list[model.ImageInfo]:
+    """Save a group of plain (featureless, so they're never stabilised) frames,
+    with a bright square in the last frame
+    """
+    frame = np.full((600, 800, 3), 100, dtype=np.uint8)
+    changed = frame.copy()
+    changed[250:310, 300:360] = 250
+    images: list[model.ImageInfo] = []
+    for i, image in enumerate([frame, frame, changed]):
+        file_path = os.path.join(folder, f"IMG_{i + 1:04}.png")
+        cv2.imwrite(file_path, image)
+        images.append(model.ImageInfo(False, file_path, []))
+    return images
+
+
+def createPrediction(gated: bool = False) -> sut.FramePrediction:
+    hot_tiles = [] if gated else [sut.TileScore(model.Region2d(224, 0, 224, 224), 0.875)]
+    score = 0.0 if gated else 0.875
+    return sut.FramePrediction("b.jpg", "a.jpg", score, hot_tiles, gated=gated)
+
+
+class ScoreImagePairTests(unittest.TestCase):
+    def test_scores_every_sub_image_of_the_difference(self):
+        # Setup
+        rng = np.random.default_rng(0)
+        previous = rng.integers(0, 256, size=(600, 800, 3), dtype=np.uint8)
+        current = rng.integers(0, 256, size=(600, 800, 3), dtype=np.uint8)
+        classifier = tc.TileClassifier(createChangeModule())
+        levels = sir.getTilePyramid(
+            extraction.BLOCK_SIZE,
+            model.Size2d(800, 600),
+            extraction.TILE_STRIDE,
+            extraction.TILE_SCALES,
+        )
+        diff = extraction.calculate_image_diff(previous, current)
+        expected = classifier.predict(levels[0].grid.extractTiles(diff))
+
+        # Act
+        regions, scores = sut.scoreImagePair(classifier, previous, current)
+
+        # Test
+        self.assertEqual(regions, [r for level in levels for r in level.regions])
+        np.testing.assert_allclose(scores[: len(expected)], expected)
+
+
+class PredictImageGroupsTests(unittest.TestCase):
+    def test_only_the_changed_sub_images_are_hot(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images = saveFrames(temp_dir)
+            classifier = tc.TileClassifier(createChangeModule())
+            square = model.Region2d(300, 250, 60, 60)
+
+            # Act
+            result = list(sut.predictImageGroups(classifier, [images], threshold=0.5))
+
+            # Test
+            self.assertEqual([p.filePath for p in result], [i.filePath for i in images[1:]])
+            self.assertFalse(result[0].isAnimal)
+            self.assertLess(result[0].score, 0.5)
+            self.assertTrue(result[1].isAnimal)
+            self.assertGreater(result[1].score, 0.5)
+            hot_regions = [t.region for t in result[1].hotTiles]
+            self.assertTrue(all(model.intersects(r, square) for r in hot_regions))
+
+
+class PredictionWriterTests(unittest.TestCase):
+    def test_json_lines(self):
+        # Setup
+        file = io.StringIO()
+        writer = sut.createPredictionWriter("scores.jsonl", file)
+
+        # Act
+        writer.write(createPrediction())
+        writer.write(createPrediction(gated=True))
+
+        # Test
+        lines = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(
+            lines[0],
+            {
+                "filePath": "b.jpg",
+                "previousFilePath": "a.jpg",
+                "score": 0.875,
+                "animal": True,
+                "gated": False,
+                "hotTiles": [{"x": 224, "y": 0, "w": 224, "h": 224, "score": 0.875}],
+            },
+        )
+        self.assertTrue(lines[1]["gated"])
+        self.assertEqual(lines[1]["hotTiles"], [])
+
+    def test_csv(self):
+        # Setup
+        file = io.StringIO()
+        writer = sut.createPredictionWriter("scores.CSV", file)
+
+        # Act
+        writer.write(createPrediction())
+        writer.write(createPrediction(gated=True))
+
+        # Test
+        rows = list(csv.reader(io.StringIO(file.getvalue())))
+        self.assertEqual(
+            rows,
+            [
+                ["filePath", "previousFilePath", "score", "animal", "hotTiles", "gated"],
+                ["b.jpg", "a.jpg", "0.87500", "True", "224:0:224:224:0.87500", "False"],
+                ["b.jpg", "a.jpg", "0.00000", "False", "", "True"],
+            ],
+        )
+
+
+class TileClassifierTests(unittest.TestCase):
+    def test_predict_is_the_animal_probability_of_the_normalized_tiles(self):
+        # Setup
+        module = createChangeModule()
+        tiles = np.zeros((2, 32, 32, 3), dtype=np.uint8)
+        tiles[1, 5, 5] = 255
+        classifier = tc.TileClassifier(module)
+        with torch.no_grad():
+            logits = module(classifier.createBatch(tiles))
+        expected = torch.softmax(logits, dim=1)[:, tc.ANIMAL_CLASS_INDEX].numpy()
+
+        # Act
+        result = classifier.predict(tiles)
+
+        # Test
+        np.testing.assert_allclose(result, expected)
+        self.assertLess(result[0], 0.5)
+        self.assertGreater(result[1], 0.5)
+        self.assertEqual(len(classifier.predict(tiles[:0])), 0)
+
+    def test_other_files_are_loaded_as_fastai_learners(self):
+        with tempfile.TemporaryDirectory() as temp_dir, warnings.catch_warnings():
+            # Setup
+            warnings.simplefilter("ignore")
+            module = createChangeModule()
+            datasets = Datasets(list(range(4)))
+            loaders = DataLoaders.from_dsets(datasets, datasets, bs=2)
+            learn = Learner(loaders, module, loss_func=torch.nn.CrossEntropyLoss())
+            file_name = os.path.join(temp_dir, "export.pkl")
+            learn.export(file_name)
+            tiles = np.random.default_rng(0).integers(0, 256, (3, 32, 32, 3), np.uint8)
+
+            # Act
+            result = tc.loadClassifier(file_name)
+
+            # Test
+            np.testing.assert_allclose(
+                result.predict(tiles), tc.TileClassifier(module).predict(tiles)
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import src.model as model
+
+
+class TestRegionArray(unittest.TestCase):
+    """Unit tests for the RegionArray class, which must match the Region2d functions"""
+
+    regions = [
+        model.Region2d(0, 0, 10, 10),
+        model.Region2d(5, 5, -4, 8),
+        model.Region2d(20, 30, 7, -3),
+        model.Region2d(11, 0, 5, 5),
+    ]
+
+    def test_round_trips_regions(self):
+        sut = model.RegionArray.fromRegions(self.regions)
+
+        self.assertEqual(len(sut), 4)
+        self.assertEqual(sut.boxes.dtype, np.int32)
+        self.assertEqual(sut.toRegions(), self.regions)
+        self.assertEqual(sut[2], self.regions[2])
+
+    def test_scale_matches_region2d(self):
+        sut = model.RegionArray.fromRegions(self.regions)
+
+        result = sut.scale(0.37)
+
+        self.assertEqual(result.toRegions(), [model.scale(r, 0.37) for r in self.regions])
+
+    def test_normalize_matches_region2d(self):
+        sut = model.RegionArray.fromRegions(self.regions)
+
+        result = sut.normalize()
+
+        self.assertEqual(result.toRegions(), [model.normalize(r) for r in self.regions])
+        np.testing.assert_array_equal(result.area(), [100, 32, 21, 25])
+
+    def test_intersects_matches_region2d(self):
+        sut = model.RegionArray.fromRegions(self.regions).normalize()
+        others = [model.Region2d(10, 10, 1, 1), model.Region2d(100, 100, 5, 5)]
+
+        result = sut.intersects(model.RegionArray.fromRegions(others))
+
+        expected = [
+            [model.intersects(a, b) for b in others] for a in sut.toRegions()
+        ]
+        np.testing.assert_array_equal(result, expected)
+        np.testing.assert_array_equal(sut.intersects(others[0]), result[:, 0])
+        np.testing.assert_array_equal(sut.intersectsAny(others), result.any(axis=1))
+        np.testing.assert_array_equal(sut.intersectsAny([]), [False] * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import numpy as np
+import src.model as model
+
+
+class TestRegionIndex(unittest.TestCase):
+    """Unit tests for the RegionIndex class, which must match `intersects`"""
+
+    regions = [
+        model.Region2d(0, 0, 10, 10),
+        model.Region2d(300, 300, 50, 40),
+        model.Region2d(250, 250, 600, 20),
+        model.Region2d(900, 10, -100, 30),  # Drawn backwards
+    ]
+
+    def test_query_matches_intersects(self):
+        sut = model.RegionIndex(self.regions, cell_size=64)
+        boxes = [
+            model.Region2d(x, y, 224, 224)
+            for y in range(0, 600, 112)
+            for x in range(0, 1000, 112)
+        ]
+
+        for box in boxes:
+            expected = [
+                i
+                for i, r in enumerate(self.regions)
+                if model.intersects(box, model.normalize(r))
+            ]
+            self.assertEqual(sut.query(box), expected, box)
+
+    def test_touching_edges_intersect(self):
+        sut = model.RegionIndex(self.regions, cell_size=10)
+
+        self.assertEqual(sut.queryPoint(10, 10), [0])
+        self.assertEqual(sut.queryPoint(11, 10), [])
+        self.assertTrue(sut.intersectsAny(model.Region2d(10, 0, 5, 5)))
+
+    def test_batch_matches_intersects_any(self):
+        sut = model.RegionIndex(self.regions)
+        boxes = [model.Region2d(0, 0, 5, 5), model.Region2d(500, 500, 5, 5)]
+
+        result = sut.intersectsAnyBatch(boxes)
+
+        self.assertEqual(result.tolist(), [True, False])
+
+    def test_batch_with_many_regions_matches_intersects_any(self):
+        rng = np.random.default_rng(0)
+        count = model.region_index.BATCH_INDEX_THRESHOLD + 1
+        positions = rng.integers(-50, 1000, size=(count, 2)).tolist()
+        sizes = rng.integers(-80, 80, size=(count, 2)).tolist()  # Some drawn backwards
+        regions = [model.Region2d(*p, *s) for p, s in zip(positions, sizes)]
+        sut = model.RegionIndex(regions, cell_size=64)
+        boxes = model.RegionArray(
+            [(x, y, 224, 224) for y in range(-112, 1100, 112) for x in range(0, 1100, 96)]
+        )
+        expected = boxes.intersectsAny([model.normalize(r) for r in regions])
+
+        result = sut.intersectsAnyBatch(boxes)
+
+        self.assertEqual(result.tolist(), expected.tolist())
+
+
+class TestCalculateOverlapMetrics(unittest.TestCase):
+    def test_counts_predicted_and_found_regions(self):
+        actual = [model.Region2d(0, 0, 10, 10), model.Region2d(500, 500, 10, 10)]
+        predicted = [
+            model.Region2d(5, 5, 224, 224),
+            model.Region2d(2, 2, 3, 3),
+            model.Region2d(1000, 1000, 224, 224),
+        ]
+
+        result = model.calculateOverlapMetrics(predicted, actual)
+
+        self.assertEqual(result, model.OverlapMetrics(2, 1, 1, 2))
+        self.assertAlmostEqual(result.precision, 2 / 3)
+        self.assertAlmostEqual(result.recall, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
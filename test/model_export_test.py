@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import torch
+import src.tile_classifier as tc
+import src.model_export as sut
+
+
+def createModule() -> torch.nn.Module:
+    torch.manual_seed(0)
+    return torch.nn.Sequential(
+        torch.nn.Conv2d(3, 4, 3),
+        torch.nn.AdaptiveAvgPool2d(1),
+        torch.nn.Flatten(),
+        torch.nn.Linear(4, 2),
+    )
+
+
+def createTiles() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, size=(5, 32, 32, 3), dtype=np.uint8)
+
+
+class ExportTorchScriptTests(unittest.TestCase):
+    def test_exported_model_has_the_normalization_built_in(self):
+        # Setup
+        module = createModule()
+        expected = tc.TileClassifier(module).predict(createTiles())
+
+        # Act
+        with tempfile.TemporaryDirectory() as temp_dir, warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            file_name = os.path.join(temp_dir, "model.pt")
+            sut.exportModel(module, file_name, block_size=sut.model.Size2d(32, 32))
+            result = tc.loadClassifier(file_name).predict(createTiles())
+
+        # Test
+        np.testing.assert_allclose(result, expected, atol=1e-5)
+
+    def test_quantized_model_is_close(self):
+        # Setup
+        module = createModule()
+        expected = tc.TileClassifier(module).predict(createTiles())
+
+        # Act
+        with tempfile.TemporaryDirectory() as temp_dir, warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)
+            file_name = os.path.join(temp_dir, "model.pt")
+            sut.exportModel(module, file_name, quantize=True, block_size=sut.model.Size2d(32, 32))
+            classifier = tc.loadClassifier(file_name)
+            result = classifier.predict(createTiles())
+
+        # Test
+        np.testing.assert_allclose(result, expected, atol=0.05)
+        self.assertEqual(len(classifier.predict(createTiles()[:0])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
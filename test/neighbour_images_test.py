@@ -0,0 +1,122 @@
+import os
+import tempfile
+import unittest
+import src.model as model
+import src.grouping as grouping
+import src.neighbour_images as sut
+
+
+def createImages(folder: str, numbers: list[int], prefix: str = "IMG_") -> list[str]:
+    os.makedirs(folder, exist_ok=True)
+    paths: list[str] = []
+    for number in numbers:
+        path = os.path.join(folder, f"{prefix}{number:04}.JPG")
+        with open(path, "w") as f:
+            f.write("")
+        paths.append(path)
+    return paths
+
+
+class FindNeighbourImagesTests(unittest.TestCase):
+    def test_only_existing_neighbours_are_found(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            folder = os.path.join(temp_dir, "cam1")
+            paths = createImages(folder, [1, 2, 3, 5, 9, 20])
+
+            # Act
+            result = sut.findNeighbourImages([paths[2]], 2)
+
+            # Test
+            # 3 is the tagged image, 4 doesn't exist, and 9 is too far away
+            self.assertEqual(result, [paths[0], paths[1], paths[3]])
+
+    def test_tagged_images_are_not_neighbours(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            paths = createImages(os.path.join(temp_dir, "cam1"), [1, 2, 3])
+
+            # Act
+            result = sut.findNeighbourImages([paths[0], paths[2]], 1)
+
+            # Test
+            self.assertEqual(result, [paths[1]])
+
+    def test_neighbours_stay_within_their_folder(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            cam1 = createImages(os.path.join(temp_dir, "cam1"), [10])
+            cam2 = createImages(os.path.join(temp_dir, "cam2"), [9, 11])
+
+            # Act
+            result = sut.findNeighbourImages(cam1, 1)
+
+            # Test
+            self.assertEqual(result, [])
+            self.assertEqual(sut.findNeighbourImages(cam2[:1], 2), cam2[1:])
+
+    def test_neighbours_stay_within_their_series(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            folder = os.path.join(temp_dir, "cam1")
+            series_a = createImages(folder, [1, 2, 3], prefix="A_")
+            series_b = createImages(folder, [1, 2, 3], prefix="B_")
+
+            # Act
+            result_a = sut.findNeighbourImages(series_a[1:2], 1)
+            result_b = sut.findNeighbourImages(series_b[1:2], 1)
+
+            # Test
+            self.assertEqual(result_a, [series_a[0], series_a[2]])
+            self.assertEqual(result_b, [series_b[0], series_b[2]])
+
+
+class ExpandNeighbourImagesTests(unittest.TestCase):
+    def test_neighbours_are_added_in_order(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            cam1 = createImages(os.path.join(temp_dir, "cam1"), [1, 2, 3, 4])
+            cam2 = createImages(os.path.join(temp_dir, "cam2"), [1, 2])
+            images = [
+                model.ImageInfo(True, cam1[2], []),
+                model.ImageInfo(True, cam2[0], []),
+            ]
+
+            # Act
+            result = list(sut.expandNeighbourImages(images, 1))
+
+            # Test
+            self.assertEqual([i.filePath for i in result], cam1[1:] + cam2)
+            self.assertEqual([i.tagged for i in result], [False, True, False, True, False])
+
+    def test_images_must_be_grouped_by_folder(self):
+        images = [
+            model.ImageInfo(True, "/missing/cam1/IMG_0001.JPG", []),
+            model.ImageInfo(True, "/missing/cam2/IMG_0001.JPG", []),
+            model.ImageInfo(True, "/missing/cam1/IMG_0005.JPG", []),
+        ]
+        with self.assertRaises(ValueError):
+            list(sut.expandNeighbourImages(images, 1))
+
+
+class SortImagePathsTests(unittest.TestCase):
+    def test_sorted_paths_are_grouped(self):
+        # Setup
+        paths = [
+            "data/cam2/IMG_0002.JPG",
+            "data/cam1/IMG_0010.JPG",
+            "data/cam1/IMG_0009.JPG",
+            "data/cam2/IMG_0001.JPG",
+        ]
+
+        # Act
+        result = sut.sortImagePaths(paths)
+        groups = grouping.groupImages([model.ImageInfo(False, p, []) for p in result])
+
+        # Test
+        self.assertEqual(result[0], "data/cam1/IMG_0009.JPG")
+        self.assertEqual(len(groups), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
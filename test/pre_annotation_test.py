@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+import src.model as model
+import src.data_serialization_json as ds
+import src.pre_annotation as sut
+
+
+class HotClassifier:
+    """Scores every sub-image as an animal"""
+
+    def predict(self, tiles: np.ndarray) -> np.ndarray:
+        return np.ones(len(tiles), dtype=np.float32)
+
+
+class SpyClassifier(HotClassifier):
+    """Counts the sub-images it scores"""
+
+    def __init__(self):
+        self.scored = 0
+
+    def predict(self, tiles: np.ndarray) -> np.ndarray:
+        self.scored += len(tiles)
+        return super().predict(tiles)
+
+
+def saveFrames(folder: str, count: int) -> list[str]:
+    rng = np.random.default_rng(0)
+    scene = cv2.resize(
+        rng.integers(40, 180, size=(30, 60, 3), dtype=np.uint8),
+        (800, 600),
+        interpolation=cv2.INTER_CUBIC,
+    )
+    file_paths: list[str] = []
+    for i in range(count):
+        file_path = os.path.join(folder, f"STC_{i + 1:04}.jpg").replace("\\", "/")
+        cv2.imwrite(file_path, scene)
+        file_paths.append(file_path)
+    return file_paths
+
+
+class PreAnnotateDirectoryTests(unittest.TestCase):
+    def test_viewed_images_are_treated_as_human_annotated(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            file_paths = saveFrames(temp_dir, 4)
+            tagged_region = model.Region2d(10, 10, 20, 20)
+            existing = model.ImagesCollection(
+                maxViewed=1,
+                currentIndex=1,
+                images=[
+                    model.ImageInfo(False, file_paths[0], []),
+                    model.ImageInfo(False, file_paths[1], []),  # Viewed: nothing found
+                    model.ImageInfo(False, file_paths[2], []),
+                    model.ImageInfo(True, file_paths[3], [tagged_region]),
+                ],
+            )
+            ds.saveImagesCollectionToJson(
+                os.path.join(temp_dir, "__annotations.json"), existing
+            )
+
+            # Act
+            result = sut.preAnnotateDirectory(HotClassifier(), temp_dir, threshold=0.5)
+
+            # Test
+            self.assertEqual((result.maxViewed, result.currentIndex), (1, 1))
+            self.assertEqual(result.images[1], existing.images[1])
+            self.assertEqual(result.images[3], existing.images[3])
+            self.assertFalse(result.images[2].tagged)
+            self.assertGreater(len(result.images[2].regions), 0)
+            self.assertEqual(result.images[2].confidence, 1.0)
+
+    def test_reviewed_images_are_never_scored(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            file_paths = saveFrames(temp_dir, 4)
+            existing = model.ImagesCollection(
+                maxViewed=3,
+                currentIndex=3,
+                images=[model.ImageInfo(False, f, []) for f in file_paths],
+            )
+            ds.saveImagesCollectionToJson(
+                os.path.join(temp_dir, "__annotations.json"), existing
+            )
+            classifier = SpyClassifier()
+
+            # Act
+            result = sut.preAnnotateDirectory(classifier, temp_dir, threshold=0.5)
+
+            # Test
+            self.assertEqual(classifier.scored, 0)
+            self.assertEqual(result.images, existing.images)
+
+    def test_unviewed_images_without_regions_are_not_human_annotated(self):
+        # Setup
+        image_info = model.ImageInfo(False, "STC_0001.jpg", [])
+
+        # Act & Test
+        self.assertFalse(sut.isHumanAnnotated(image_info))
+        self.assertTrue(sut.isHumanAnnotated(image_info, viewed=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from PIL import Image as pilImage
+import src.model as model
+import src.image_stabalization as stab
+import src.region_decode as sut
+
+
+def saveScene(folder: str) -> str:
+    rng = np.random.default_rng(0)
+    scene = rng.integers(40, 180, size=(60, 80, 3), dtype=np.uint8)
+    scene = cv2.resize(scene, (800, 600), interpolation=cv2.INTER_CUBIC)
+    path = os.path.join(folder, "scene.jpg")
+    cv2.imwrite(path, scene)
+    return path
+
+
+class RegionDecodeTests(unittest.TestCase):
+    def test_region_matches_the_full_image(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            path = saveScene(temp_dir)
+            expected = cv2.imread(path)
+            image = sut.openRegionImage(path)
+            assert image is not None
+
+            # Act
+            result = image.decode(model.Region2d(100, 50, 224, 224))
+
+            # Test
+            self.assertEqual(image.size, model.Size2d(800, 600))
+            np.testing.assert_array_equal(result, expected[50:274, 100:324])
+
+    def test_warped_region_matches_the_warped_image(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            path = saveScene(temp_dir)
+            transform = np.array([[0.999, 0.02, 4.3], [-0.02, 0.999, -6.7]])
+            expected = stab.warpImage(cv2.imread(path), transform)
+            image = sut.openRegionImage(path)
+            assert image is not None
+
+            for x, y in [(300, 200), (0, 0), (576, 376)]:
+                # Act
+                result = sut.decodeWarpedRegion(
+                    image, model.Region2d(x, y, 224, 224), transform
+                )
+
+                # Test
+                difference = np.abs(
+                    result.astype(int) - expected[y : y + 224, x : x + 224]
+                )
+                self.assertLessEqual(int(difference.max()), 1)
+
+    def test_rotated_images_are_not_supported(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            path = os.path.join(temp_dir, "rotated.jpg")
+            exif = pilImage.Exif()
+            exif[0x0112] = 6  # Rotated 90° clockwise
+            pilImage.new("RGB", (64, 32)).save(path, exif=exif)
+
+            # Act
+            result = sut.openRegionImage(path)
+
+            # Test
+            self.assertIsNone(result)
+
+
+if __name__ == "__main__":
+    unittest.main()
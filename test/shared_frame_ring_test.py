@@ -0,0 +1,58 @@
+import queue
+import unittest
+import numpy as np
+import src.shared_frame_ring as sut
+
+
+class SharedFrameRingTests(unittest.TestCase):
+    def test_images_round_trip_through_the_ring(self):
+        # Setup
+        previous = np.arange(4 * 6 * 3, dtype=np.uint8).reshape(4, 6, 3)
+        current = previous[::-1].copy()
+        ring = sut.SharedFrameRing(2, previous.nbytes + current.nbytes)
+        reader = sut.SharedFrameReader(ring.names, ring.freeSlots)
+
+        try:
+            # Act
+            handle = ring.write([previous, current])
+            result = [image.copy() for image in reader.read(handle)]
+            reader.release(handle)
+
+            # Test
+            self.assertEqual(len(result), 2)
+            np.testing.assert_array_equal(result[0], previous)
+            np.testing.assert_array_equal(result[1], current)
+        finally:
+            reader.close()
+            ring.close()
+
+    def test_write_waits_for_a_released_slot(self):
+        # Setup
+        image = np.ones((2, 2), dtype=np.uint8)
+        ring = sut.SharedFrameRing(1, image.nbytes)
+        reader = sut.SharedFrameReader(ring.names, ring.freeSlots)
+
+        try:
+            # Act
+            handle = ring.write([image])
+
+            # Test
+            with self.assertRaises(queue.Empty):
+                ring.write([image], timeout=0.1)
+            reader.release(handle)
+            self.assertEqual(ring.write([image], timeout=5).slot, handle.slot)
+        finally:
+            reader.close()
+            ring.close()
+
+    def test_fits_checks_the_slot_size(self):
+        ring = sut.SharedFrameRing(1, 100)
+        try:
+            self.assertTrue(ring.fits([np.zeros(60, np.uint8), np.zeros(40, np.uint8)]))
+            self.assertFalse(ring.fits([np.zeros(101, np.uint8)]))
+        finally:
+            ring.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+import cv2
+import numpy as np
+import src.model as model
+import src.extraction_config as ec
+import src.streaming_dataset as sut
+
+
+def createConfig(**settings) -> ec.ExtractionConfig:
+    config = ec.ExtractionConfig(
+        outDir="/data/output",
+        imagesFile="animals.json",
+        blockSize=model.Size2d(100, 100),
+        tileStride=None,
+        tileScales=(1.0,),
+        negativeSampleRate=1.0,
+        negativeSamplingPolicy=None,
+        stabiliseImages=False,
+        augmentationMode="index",
+        subImageBackend="pil",
+        subImageJpegQuality=75,
+        workers=0,
+        seed=None,
+        profile=False,
+    )
+    return ec.configFromJson(settings, config)
+
+
+def createGroup(folder: str, count: int) -> list[model.ImageInfo]:
+    """A group of 300x200 images, each tagged in its top left tile"""
+    rng = np.random.default_rng(1)
+    group: list[model.ImageInfo] = []
+    for i in range(count):
+        path = os.path.join(folder, f"IMG_{i + 1:04}.png")
+        cv2.imwrite(path, rng.integers(0, 256, size=(200, 300, 3), dtype=np.uint8))
+        group.append(model.ImageInfo(True, path, [model.Region2d(10, 10, 20, 20)]))
+    return group
+
+
+class CreatePairTileSamplesTests(unittest.TestCase):
+    def test_positives_are_augmented_and_tiles_are_diffs(self):
+        # Setup
+        rng = np.random.default_rng(0)
+        previous_image = rng.integers(0, 256, size=(200, 300, 3), dtype=np.uint8)
+        current_image = rng.integers(0, 256, size=(200, 300, 3), dtype=np.uint8)
+        image_info = model.ImageInfo(True, "/data/IMG_0002.JPG", [model.Region2d(150, 50, 20, 20)])
+
+        # Act
+        samples = sut.createPairTileSamples(
+            image_info, previous_image, current_image, createConfig(), rng
+        )
+
+        # Test
+        # The 1 positive tile is a sample for each of the 6 transforms, plus the 5 negatives
+        self.assertEqual(len(samples), 11)
+        positives = [s for s in samples if s[2]]
+        self.assertEqual([s[1] for s in positives], [0, 1, 2, 3, 4, 5])
+        expected = current_image[0:100, 100:200] - previous_image[0:100, 100:200]
+        self.assertTrue(np.array_equal(positives[0][0], expected))
+
+    def test_negatives_are_sampled(self):
+        # Setup
+        rng = np.random.default_rng(0)
+        image = np.zeros((200, 300, 3), dtype=np.uint8)
+        image_info = model.ImageInfo(False, "/data/IMG_0002.JPG", [])
+
+        # Act
+        samples = sut.createPairTileSamples(
+            image_info, image, image, createConfig(negativeSampleRate=0.0), rng
+        )
+
+        # Test
+        self.assertEqual(samples, [])
+
+
+class StreamingTileDatasetTests(unittest.TestCase):
+    def test_batches_are_balanced(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            group = createGroup(temp_dir, 3)
+            dataset = sut.StreamingTileDataset(
+                [group], createConfig(), batch_size=4, pool_size=8, seed=1, repeat=False
+            )
+
+            # Act
+            batches = list(dataset)
+            repeated = list(dataset)
+
+            # Test
+            # 2 pairs, with 6 positive samples and 5 negatives each
+            self.assertEqual(len(batches), 5)
+            for images, labels in batches:
+                self.assertEqual(tuple(images.shape), (4, 3, 100, 100))
+                self.assertEqual(labels.tolist().count(1), 2)
+            self.assertTrue(all(a[0].equal(b[0]) for a, b in zip(batches, repeated)))
+            self.assertEqual(dataset.estimateBatchCount(), 6)
+
+    def test_workers_share_the_pairs_of_too_few_groups(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            group = createGroup(temp_dir, 3)
+            dataset = sut.StreamingTileDataset(
+                [group], createConfig(), batch_size=4, pool_size=8, seed=1, repeat=False
+            )
+            batches: list[list] = []
+
+            # Act
+            for worker_id in range(2):
+                worker_info = SimpleNamespace(id=worker_id, num_workers=2, seed=0)
+                with mock.patch.object(sut, "get_worker_info", return_value=worker_info):
+                    batches.append(list(dataset))
+
+            # Test
+            # 1 pair each, with 6 positive samples and 5 negatives
+            self.assertEqual([len(b) for b in batches], [2, 2])
+            self.assertEqual(dataset.pairCount, 2)
+
+    def test_stops_when_nothing_is_tagged(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            group = [model.ImageInfo(False, i.filePath, []) for i in createGroup(temp_dir, 2)]
+            dataset = sut.StreamingTileDataset([group], createConfig(), batch_size=4)
+
+            # Act
+            batches = list(dataset)
+
+            # Test
+            self.assertEqual(batches, [])
+
+    def test_split_keeps_groups_together(self):
+        # Setup
+        groups = [[model.ImageInfo(False, f"/data/cam{i}/IMG_0001.JPG", [])] for i in range(10)]
+
+        # Act
+        train, valid = sut.splitImageGroups(groups, 0.2, 42)
+
+        # Test
+        self.assertEqual(len(train), 8)
+        self.assertEqual(len(valid), 2)
+        self.assertEqual(sorted(map(id, train + valid)), sorted(map(id, groups)))
+
+
+if __name__ == "__main__":
+    unittest.main()
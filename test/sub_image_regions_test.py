@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 import src.model as model
 import src.sub_image_regions as sut
 
@@ -27,6 +28,17 @@ class CreateSubImageOffsetsTests(unittest.TestCase):
         expected = [0, 10, 20, 30, 35]
         self.assertEqual(result, expected)
 
+    def test_results_with_overlapping_stride(self):
+        # No setup needed
+
+        # Act
+        result = sut.createSubImageOffsets(block_size=10, image_size=32, stride=5)
+        result = list(result)
+
+        # Test
+        expected = [0, 5, 10, 15, 20, 22]
+        self.assertEqual(result, expected)
+
 
 class CreateSubImageRegionsTests(unittest.TestCase):
     def test_results_when_image_size_is_exact_multiple_of_block_size(self):
@@ -96,5 +108,72 @@ class createSubImageTaggedRegionsTests(unittest.TestCase):
         self.assertEqual(result, expected)
 
 
+class TileGridTests(unittest.TestCase):
+    def test_grid_covers_a_non_divisible_image(self):
+        # Setup
+        block_size, image_size = model.Size2d(10, 5), model.Size2d(25, 12)
+
+        # Act
+        grid = sut.getTileGrid(block_size, image_size)
+
+        # Test
+        # The last column and row are moved back to the image's right and bottom edges
+        expected = [
+            model.Region2d(x, y, 10, 5) for y in (0, 5, 7) for x in (0, 10, 15)
+        ]
+        self.assertEqual(list(grid.regions), expected)
+        self.assertEqual(list(sut.createSubImageRegions(block_size, image_size)), expected)
+        np.testing.assert_array_equal(
+            grid.boxes, [(r.x, r.y, r.w, r.h) for r in expected]
+        )
+        self.assertIs(grid, sut.getTileGrid(block_size, image_size))
+
+    def test_extracts_tiles_in_region_order(self):
+        # Setup
+        grid = sut.getTileGrid(model.Size2d(2, 2), model.Size2d(5, 3))
+        image = np.arange(15).reshape(3, 5)
+
+        # Act
+        tiles = grid.extractTiles(image, [0, 2, 3])
+
+        # Test
+        for tile, index in zip(tiles, [0, 2, 3]):
+            r = grid.regions[index]
+            np.testing.assert_array_equal(tile, image[r.y1 : r.y2, r.x1 : r.x2])
+
+
+class TilePyramidTests(unittest.TestCase):
+    def test_levels_map_tiles_back_to_full_size_image(self):
+        # No setup needed
+        # Act
+        levels = sut.getTilePyramid(
+            block_size=model.Size2d(10, 10),
+            image_size=model.Size2d(40, 40),
+            stride=model.Size2d(5, 5),
+            scales=(1.0, 0.5, 0.25),
+        )
+
+        # Test
+        # The 0.25 scale image (10x10) is too small for a single tile, so it's left out
+        self.assertEqual([level.scale for level in levels], [1.0, 0.5])
+        self.assertEqual(len(levels[0].regions), 7 * 7)
+        self.assertEqual(len(levels[1].regions), 3 * 3)
+        self.assertEqual(levels[1].regions[1], model.Region2d(x=10, y=0, w=20, h=20))
+
+    def test_creates_scaled_images(self):
+        # Setup
+        levels = sut.getTilePyramid(
+            model.Size2d(10, 10), model.Size2d(80, 60), scales=(1.0, 0.5, 0.25)
+        )
+        image = np.zeros((60, 80, 3), dtype=np.uint8)
+
+        # Act
+        images = sut.createImagePyramid(image, levels)
+
+        # Test
+        self.assertIs(images[0], image)
+        self.assertEqual([i.shape for i in images[1:]], [(30, 40, 3), (15, 20, 3)])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import numpy as np
+import src.model as model
+import src.tile_motion as sut
+
+
+class CalculateTileMotionScoresTests(unittest.TestCase):
+    def test_scores_are_mean_absolute_difference(self):
+        # Setup
+        previous = np.zeros((10, 20, 3), dtype=np.uint8)
+        current = previous.copy()
+        current[0:5, 10:20] = 100  # Only the top right tile changes
+        regions = [
+            model.Region2d(x=0, y=0, w=10, h=5),
+            model.Region2d(x=10, y=0, w=10, h=5),
+            model.Region2d(x=0, y=5, w=10, h=5),
+            model.Region2d(x=5, y=0, w=10, h=10),  # Overlaps a quarter of the change
+        ]
+
+        # Act
+        motion_image = sut.createMotionImage(previous, current)
+        result = sut.calculateTileMotionScores(motion_image, regions)
+
+        # Test
+        np.testing.assert_allclose(result, [0.0, 100.0, 0.0, 25.0])
+
+    def test_no_regions_returns_no_scores(self):
+        motion_image = np.zeros((10, 10), dtype=np.uint8)
+        result = sut.calculateTileMotionScores(motion_image, [])
+        self.assertEqual(len(result), 0)
+
+
+class NegativeSamplingPolicyTests(unittest.TestCase):
+    def test_keep_probabilities_are_stratified(self):
+        # Setup
+        policy = sut.NegativeSamplingPolicy(thresholds=(1.0, 10.0), keepRates=(0, 0.5, 1))
+        scores = np.array([0.0, 0.99, 1.0, 5.0, 10.0, 200.0])
+
+        # Act
+        result = policy.keepProbabilities(scores)
+
+        # Test
+        np.testing.assert_allclose(result, [0, 0, 0.5, 0.5, 1, 1])
+
+    def test_static_tiles_are_dropped_and_busy_tiles_kept(self):
+        # Setup
+        policy = sut.NegativeSamplingPolicy(thresholds=(1.0,), keepRates=(0, 1))
+        scores = np.array([0.0, 0.5, 3.0, 50.0])
+        rng = np.random.default_rng(42)
+
+        # Act
+        result = sut.sampleNegativeTiles(scores, policy, rng)
+
+        # Test
+        self.assertEqual(list(result), [False, False, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,194 @@
+import contextlib
+import dataclasses
+import io
+import json
+import os
+import tempfile
 import unittest
+from unittest import mock
+import cv2
+import numpy as np
+from PIL import Image as pilImage
 import src.model as model
+import src.data_serialization_json as ds
+import src.extraction_config as ec
+import src.frame_gate as fg
 import src.training_sub_image_extraction as sut
 
 
+def saveFrames(folder: str, changes: list[bool]) -> str:
+    """Save a group of frames of the same scene (each one with a new dark square where
+    `changes` is true, and the same as the frame before otherwise), and the images file
+    """
+    rng = np.random.default_rng(0)
+    scene = rng.integers(40, 180, size=(60, 80, 3), dtype=np.uint8)
+    frame = cv2.resize(scene, (800, 600), interpolation=cv2.INTER_CUBIC)
+    images: list[model.ImageInfo] = []
+    for i, changed in enumerate([True] + changes):
+        if changed:
+            frame = frame.copy()
+            frame[100 + 40 * i : 160 + 40 * i, 100 + 90 * i : 160 + 90 * i] = 0
+        file_path = os.path.join(folder, f"IMG_{i + 1:04}.png")
+        cv2.imwrite(file_path, frame)
+        regions = [model.Region2d(100 + 90 * i, 100 + 40 * i, 60, 60)] if i == 1 else []
+        images.append(model.ImageInfo(i == 1, file_path, regions))
+    images_file = os.path.join(folder, "animals.json")
+    ds.saveImagesCollectionToJson(images_file, model.ImagesCollection(0, 0, images))
+    return images_file
+
+
+def readTiles(out_dir: str) -> dict[str, bytes]:
+    """The contents of every saved sub-image, by its path within the output folder"""
+    tiles: dict[str, bytes] = {}
+    for folder in ("true", "false"):
+        for file_name in os.listdir(os.path.join(out_dir, folder)):
+            with open(os.path.join(out_dir, folder, file_name), "rb") as f:
+                tiles[f"{folder}/{file_name}"] = f.read()
+    return tiles
+
+
+class ExtractionRunTests(unittest.TestCase):
+    """Runs the whole extraction on a few small frames"""
+
+    def setUp(self):
+        self._originalConfig = sut.current_config()
+
+    def tearDown(self):
+        sut.apply_config(self._originalConfig)
+
+    def runExtraction(self, out_dir: str, images_file: str, **changes) -> dict:
+        """Extract the sub-images, returning the run manifest"""
+        settings = {
+            "outDir": out_dir,
+            "imagesFile": images_file,
+            "tileScales": (1.0,),
+            "negativeSampleRate": 0.5,
+            "negativeSamplingPolicy": None,
+            "stabiliseImages": False,
+            "workers": 0,
+            "seed": 7,
+            "profile": False,
+        }
+        config = dataclasses.replace(self._originalConfig, **{**settings, **changes})
+        with contextlib.redirect_stdout(io.StringIO()):
+            sut.main(config)
+        with open(os.path.join(out_dir, ec.RUN_MANIFEST_FILE_NAME)) as f:
+            return json.load(f)
+
+    def test_pipeline_workers_save_the_same_sub_images(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images_file = saveFrames(temp_dir, [True, True, False, True])
+            in_process_dir = os.path.join(temp_dir, "workers0")
+            pipeline_dir = os.path.join(temp_dir, "workers2")
+
+            # Act
+            self.runExtraction(in_process_dir, images_file, stabiliseImages=True)
+            self.runExtraction(pipeline_dir, images_file, stabiliseImages=True, workers=2)
+
+            # Test
+            expected = readTiles(in_process_dir)
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(readTiles(pipeline_dir), expected)
+
+    def test_cropped_decode_saves_the_same_sub_images(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images_file = saveFrames(temp_dir, [True, True])
+            full_dir = os.path.join(temp_dir, "full")
+            crop_dir = os.path.join(temp_dir, "crop")
+
+            # Act
+            self.runExtraction(full_dir, images_file, tileScales=(1.0, 0.5))
+            self.runExtraction(
+                crop_dir, images_file, tileScales=(1.0, 0.5), decodeMode="crop"
+            )
+
+            # Test
+            expected = readTiles(full_dir)
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(readTiles(crop_dir), expected)
+
+    def test_changing_the_seed_re_extracts_every_pair(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images_file = saveFrames(temp_dir, [True, False])
+            out_dir = os.path.join(temp_dir, "out")
+            self.runExtraction(out_dir, images_file, seed=7)
+
+            # Act
+            result = self.runExtraction(out_dir, images_file, seed=8)
+            repeated = self.runExtraction(out_dir, images_file, seed=8)
+
+            # Test
+            self.assertEqual(result["counts"]["skippedPairs"], 0)
+            self.assertEqual(result["counts"]["extractedPairs"], 2)
+            self.assertEqual(repeated["counts"]["skippedPairs"], 2)
+
+    def test_turning_on_the_frame_gate_does_not_re_extract_passing_pairs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images_file = saveFrames(temp_dir, [True, False])
+            out_dir = os.path.join(temp_dir, "out")
+            self.runExtraction(out_dir, images_file)
+
+            # Act
+            result = self.runExtraction(
+                out_dir, images_file, frameGate=fg.FrameGatePolicy()
+            )
+
+            # Test
+            self.assertEqual(result["counts"]["skippedPairs"], 2)
+            self.assertEqual(result["counts"]["extractedPairs"], 0)
+
+    def test_re_tuning_the_frame_gate_only_re_checks_the_gated_pairs(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Setup
+            images_file = saveFrames(temp_dir, [True, False])
+            out_dir = os.path.join(temp_dir, "out")
+            first = self.runExtraction(
+                out_dir, images_file, frameGate=fg.FrameGatePolicy()
+            )
+
+            # Act
+            result = self.runExtraction(
+                out_dir, images_file, frameGate=fg.FrameGatePolicy(threshold=0.0)
+            )
+
+            # Test
+            self.assertEqual(first["counts"]["frameGate"]["skipped"], 1)
+            self.assertEqual(result["counts"]["skippedPairs"], 1)
+            self.assertEqual(result["counts"]["extractedPairs"], 1)
+
+
+class EncodeSubImageTests(unittest.TestCase):
+    def test_backends_save_equivalent_pixels_in_the_same_channel_order(self):
+        # Setup
+        rng = np.random.default_rng(0)
+        sub_image = cv2.resize(
+            rng.integers(0, 256, size=(28, 28, 3), dtype=np.uint8),
+            (224, 224),
+            interpolation=cv2.INTER_CUBIC,
+        )
+        sub_image[:, :, 0] = 200  # So a swapped channel order would stand out
+        exif = sut.create_image_exif_metadata(model.ImageInfo(True, "IMG_0001.JPG", []))
+        decoded: dict[str, np.ndarray] = {}
+
+        for backend in ("pil", "cv2"):
+            # Act
+            with mock.patch.object(sut, "SUB_IMAGE_BACKEND", backend):
+                encoded = sut.encode_sub_image(sub_image, exif)
+
+            # Pillow reads the channels back in the order they were saved
+            decoded[backend] = np.asarray(pilImage.open(io.BytesIO(encoded))).astype(int)
+
+        # Test
+        for backend, pixels in decoded.items():
+            self.assertLess(np.abs(pixels - sub_image).mean(), 8.0, backend)
+        difference = np.abs(decoded["pil"] - decoded["cv2"])
+        self.assertLess(difference.mean(), 1.0)
+
+
 class CreateOutputFilePathTests(unittest.TestCase):
     def test_file_name_when_true(self):
         # Setup
@@ -0,0 +1,30 @@
+"""
+Unit tests for the annotated image view model
+"""
+import unittest
+
+import src.model as model
+import tagger_ui.ui_model as uiModel
+
+
+class TestFindRegionsAt(unittest.TestCase):
+    def test_finds_and_removes_regions_under_a_point(self):
+        # Setup
+        sut = uiModel.AnnotatedImage("test.jpg")
+        sut.addRegion(uiModel.ScaledRegion2d(None, model.Region2d(0, 0, 100, 100)))
+        sut.addRegion(uiModel.ScaledRegion2d(None, None))
+        sut.addRegion(uiModel.ScaledRegion2d(None, model.Region2d(50, 50, 100, 100)))
+
+        # Act
+        overlapping = sut.findRegionsAt(75, 75)
+        sut.removeRegion(overlapping[-1])
+        remaining = sut.findRegionsAt(75, 75)
+
+        # Test
+        self.assertEqual(overlapping, [0, 2])
+        self.assertEqual(remaining, [0])
+        self.assertEqual(sut.findRegionsAt(500, 500), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""
+Unit tests for the performance timer and profiler
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import tagger_ui.ui_model.timer as sut
+
+
+class TimerTests(unittest.TestCase):
+    def test_records_elapsed_time(self):
+        with sut.Timer("Test", verbose=False) as timer:
+            sum(range(1000))
+        self.assertGreater(timer.elapsedMs, 0.0)
+
+
+class ProfilerTests(unittest.TestCase):
+    def test_disabled_profiler_records_nothing(self):
+        # Setup
+        profiler = sut.Profiler()
+
+        # Act
+        with profiler.span("outer"):
+            pass
+
+        # Test
+        self.assertEqual(profiler.events, [])
+        self.assertEqual(profiler.stats(), {})
+
+    def test_records_nested_spans(self):
+        # Setup
+        profiler = sut.Profiler(enabled=True)
+
+        # Act
+        with profiler.span("outer"):
+            for _ in range(3):
+                with profiler.span("inner"):
+                    pass
+
+        # Test
+        stats = profiler.stats()
+        self.assertEqual(stats["outer"].count, 1)
+        self.assertEqual(stats["inner"].count, 3)
+        self.assertLessEqual(stats["inner"].p50Ms, stats["inner"].maxMs)
+        inner = [e for e in profiler.events if e.name == "inner"]
+        self.assertTrue(all(e.parent == "outer" and e.depth == 1 for e in inner))
+        self.assertGreaterEqual(stats["outer"].totalMs, stats["inner"].totalMs)
+
+    def test_sampled_percentiles_are_bounded(self):
+        # Setup
+        profiler = sut.Profiler(enabled=True, max_events=10, max_samples=100)
+        durations_ns = [(i % 1000 + 1) * 1_000_000 for i in range(5000)]
+
+        # Act
+        for duration_ns in durations_ns:
+            profiler._record(sut.SpanEvent("decode", None, 0, 0, 0, duration_ns))
+
+        # Test
+        stats = profiler.stats()["decode"]
+        self.assertEqual(stats.count, 5000)
+        self.assertEqual(stats.totalMs, sum(durations_ns) / 1_000_000)
+        self.assertEqual(stats.maxMs, 1000.0)
+        self.assertLessEqual(len(profiler._durations["decode"].samples), 100)
+        self.assertAlmostEqual(stats.p50Ms, 500.0, delta=150.0)
+        self.assertEqual(len(profiler.events), 10)
+
+    def test_saves_json_and_chrome_trace(self):
+        # Setup
+        profiler = sut.Profiler(enabled=True)
+        with profiler.span("decode"):
+            pass
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stats_file = os.path.join(temp_dir, "profile.json")
+            trace_file = os.path.join(temp_dir, "profile.trace.json")
+
+            # Act
+            profiler.saveJson(stats_file)
+            profiler.saveChromeTrace(trace_file)
+
+            # Test
+            with open(stats_file) as f:
+                self.assertEqual(json.load(f)["decode"]["count"], 1)
+            with open(trace_file) as f:
+                events = json.load(f)["traceEvents"]
+            self.assertEqual(len(events), 1)
+            self.assertEqual(events[0]["name"], "decode")
+            self.assertEqual(events[0]["ph"], "X")
+
+
+if __name__ == "__main__":
+    unittest.main()
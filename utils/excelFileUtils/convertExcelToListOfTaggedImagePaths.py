@@ -1,87 +1,42 @@
 r"""
     Processes the Excel file in:
         D:\data\NRSI\2263B_Turtle-Nest-Mound
+
+    Run from the top-level folder with:
+        python -m utils.excelFileUtils.convertExcelToListOfTaggedImagePaths
 """
-import pandas as pd
-import numpy as np
 import os
 
+from src import data_serialization_json as ds
+from utils.excelFileUtils import taggedImagePaths as tip
 
 # First - load all the folders
 baseDir = r"D:\data\NRSI\2263B_Turtle-Nest-Mound"
 
+# Where the tagged images are saved (ready for the tagger UI)
+outputFile = "./taggedImages.json"
 
-def getDirectories(baseDir: str) -> list[str]:
-    """Get the list of directories in the given baseDir directory"""
-    result: list[str] = []
-    filenames = os.listdir(baseDir)
-    for filename in filenames:  # loop through all the files and folders
-        fullPath = os.path.join(baseDir, filename)
-        if os.path.isdir(fullPath):
-            result.append(filename)
-    return result
-
-
-def buildMapOfSubDirs(topLevelDirs: list[str]) -> dict[str, str]:
-    """Scan through all the of the given "top level" directories, and find all of their
-    immediate sub-directories.
-    Returns a dictionary where each key is the name of the sub-directory,
-    and each value is the full file system path to that sub-directory.
-    """
-    mapOfDirs: dict[str, str] = {}
-    for dir in topLevelDirs:
-        path = os.path.join(baseDir, dir)
-        subDirs = getDirectories(path)
-        for subDir in subDirs:
-            fullPath: str = os.path.join(baseDir, dir, subDir)
-            if mapOfDirs.get(subDir):
-                raise Exception("Found duplicate dir + sub-dir combination:")
-            mapOfDirs[subDir] = fullPath
-
-    return mapOfDirs
-
-
-# Grab the list of folders
-highLevelDirs = getDirectories(baseDir)
-
-# Now find the list of folders within those folders
-# We need to build a dictionary of them mapping each sub-folder to their full path
-# (because only the sub-directory is used as the "path" in our Excel files from NRSI)
-mapOfSubDirs = buildMapOfSubDirs(highLevelDirs)
 
-# Now load the original Excel file
-taggedImagesExcelFile = os.path.join(baseDir, "files.xlsx")
-df = pd.read_excel(taggedImagesExcelFile)
-df = df.replace(np.nan, "", regex=True)
+def main():
+    # Find the list of folders within the top-level folders
+    # We need to build a dictionary of them mapping each sub-folder to their full path
+    # (because only the sub-directory is used as the "path" in our Excel files from NRSI)
+    mapOfSubDirs = tip.listSubFolders(baseDir)
+    files = tip.listFiles(baseDir)
 
-count = 0
-missingFolders = set()
-taggedImagePaths: list[str] = []
-for i, row in df.iterrows():
-    count += 1
-    # Guess the folder from the Excel file
-    subDir = str(row["Folder"])
-    subDirPath = mapOfSubDirs.get(subDir)
-    if subDirPath is None:
-        missingFolders.add(row["Folder"])
-        continue
+    # Now load the original Excel file
+    df = tip.readExcelCached(os.path.join(baseDir, "files.xlsx"))
+    paths = tip.resolveSubFolderPaths(df, mapOfSubDirs)
+    exists = tip.findExistingPaths(paths, files)
 
-    relativePath = str(row["RelativePath"])
-    if relativePath != "":
-        subDirPath = os.path.join(subDirPath, relativePath)
+    missingFolders = set(df["Folder"][paths == ""])
+    for i, path in paths[~exists & (paths != "")].items():
+        print("Failed to find tagged image from row: ", i, " - ", path)
 
-    file = str(row["File"])
-    taggedImagePath = os.path.join(subDirPath, file)
-    if os.path.isfile(taggedImagePath):
-        print(taggedImagePath)
-        taggedImagePaths.append(taggedImagePath)
-    else:
-        print("Failed to find tagged image from row: ", i, " - ", taggedImagePath)
+    ds.saveImagesCollectionToJson(outputFile, tip.createImagesCollection(paths[exists]))
+    tip.printSummary(paths, exists)
+    print(f"Failed to find {len(missingFolders)} data folders")
 
 
-numTaggedImages = len(taggedImagePaths)
-numMissingImages = count - numTaggedImages
-print(
-    f"Found a total of {numTaggedImages} tagged images - out of {count} (missing {numMissingImages})"
-)
-print(f"Failed to find {len(missingFolders)} data folders")
+if __name__ == "__main__":
+    main()
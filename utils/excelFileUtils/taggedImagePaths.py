@@ -0,0 +1,246 @@
+r"""
+Resolves the tagged image file paths listed in the NRSI Excel files into an `ImagesCollection`.
+
+Each NRSI site stored its tagged images in a different Excel layout, for example:
+    * `Folder`, `RelativePath` and `File` columns, where `Folder` is the name of a
+      sub-folder of one of the top-level folders (see `resolveSubFolderPaths`)
+    * `Camera`, `Folder` and `File` columns (see `resolveCameraPaths`)
+    * A single `Picture File` column with the full path (see `resolvePictureFilePaths`)
+
+Rather than checking whether every row's image exists (one file system call per row),
+the image folders are listed once up front, and the paths of all the rows are built and
+checked against that listing at once with pandas.
+The paths are matched by their keys (which ignore the case on Windows), but the images
+collection keeps each path's original case.
+The parsed Excel worksheets are also cached next to the Excel file
+(as Parquet if `pyarrow` is installed, otherwise as a pickle), since parsing a large Excel
+file is by far the slowest part of the import.
+"""
+import os
+import re
+from typing import Any, Callable, Iterable, Union
+
+import pandas as pd
+
+from src import model
+
+# The cache formats of the parsed Excel worksheets, in order of preference:
+# (file extension, read function, write method name)
+_CACHE_FORMATS: list[tuple[str, Callable[[str], pd.DataFrame], str]] = [
+    (".parquet", pd.read_parquet, "to_parquet"),
+    (".pkl", pd.read_pickle, "to_pickle"),
+]
+
+# The runs of path separators after the start of a path (a leading `\\server` is kept),
+# and the `.` folders within a path (see `normalizeColumn`)
+_REPEATED_SEPARATORS = re.compile(f"(?<=[^{re.escape(os.sep)}]){re.escape(os.sep)}{{2,}}")
+_CURRENT_FOLDERS = re.compile(f"(?<={re.escape(os.sep)})\\.{re.escape(os.sep)}")
+_SEPARATOR_REPLACEMENT = os.sep.replace("\\", "\\\\")
+
+
+# ##################################################################################################
+# region Reading the Excel files
+# ##################################################################################################
+
+
+def createCacheFileName(excel_file: str, sheet_name: Union[str, int], extension: str) -> str:
+    """The file name of the cached copy of the given Excel worksheet"""
+    return f"{excel_file}.{sheet_name}.cache{extension}"
+
+
+def readExcelCached(excel_file: str, sheet_name: Union[str, int] = 0) -> pd.DataFrame:
+    """Read an Excel worksheet with every cell as a string (empty cells are empty strings).
+    The parsed worksheet is cached next to the Excel file, and the cache is used as long as
+    the Excel file hasn't been modified since.
+
+    Args:
+        excel_file (str): The Excel file
+        sheet_name (Union[str, int]): The name (or index) of the worksheet
+
+    Returns:
+        pd.DataFrame: The worksheet
+    """
+    excel_modified = os.stat(excel_file).st_mtime_ns
+    for extension, read, _ in _CACHE_FORMATS:
+        cache_file = createCacheFileName(excel_file, sheet_name, extension)
+        if os.path.isfile(cache_file) and os.stat(cache_file).st_mtime_ns >= excel_modified:
+            try:
+                return read(cache_file)
+            except ImportError:
+                continue  # The format's library isn't installed
+
+    df = pd.read_excel(excel_file, sheet_name, dtype=str).fillna("")
+    for extension, _, write in _CACHE_FORMATS:
+        try:
+            getattr(df, write)(createCacheFileName(excel_file, sheet_name, extension))
+            break
+        except ImportError:
+            continue  # The format's library isn't installed
+    return df
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Listing the image folders
+# ##################################################################################################
+
+
+def normalizePath(path: str) -> str:
+    """Normalize a file path, keeping its case
+    (on Windows this also converts forward slashes into backslashes)
+    """
+    return os.path.normpath(path)
+
+
+def pathKey(path: str) -> str:
+    """The key that matches a file path to the same file
+    (the normalized path, which also ignores the case on Windows)
+    """
+    return os.path.normcase(normalizePath(path))
+
+
+def listFiles(base_dir: str) -> set[str]:
+    """The path keys (see `pathKey`) of every file within the folder and all of its sub-folders"""
+    return {
+        pathKey(os.path.join(dir_path, file_name))
+        for dir_path, _, file_names in os.walk(base_dir)
+        for file_name in file_names
+    }
+
+
+def listSubFolders(base_dir: str) -> dict[str, str]:
+    """Find the immediate sub-folders of every top-level folder in the base folder.
+
+    Returns:
+        dict[str, str]: The name of each sub-folder mapped to its full path
+
+    Raises:
+        ValueError: If two top-level folders contain a sub-folder with the same name
+    """
+    result: dict[str, str] = {}
+    with os.scandir(base_dir) as top_levels:
+        top_level_dirs = [e.path for e in top_levels if e.is_dir()]
+    for top_level_dir in top_level_dirs:
+        with os.scandir(top_level_dir) as entries:
+            sub_folders = [e for e in entries if e.is_dir()]
+        for sub_folder in sub_folders:
+            if sub_folder.name in result:
+                raise ValueError(f"Found duplicate sub-folder: {sub_folder.name}")
+            result[sub_folder.name] = sub_folder.path
+    return result
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Building the image paths
+# ##################################################################################################
+
+
+def _joinColumns(parts: Iterable[Any]) -> pd.Series:
+    """Join the columns (or strings) of path parts with the path separator, skipping
+    any empty parts
+    """
+    result: Union[pd.Series, None] = None
+    for part in parts:
+        if result is None:
+            result = part
+            continue
+        if isinstance(part, pd.Series):
+            result = result.where(part == "", result + os.sep + part)
+        elif part:
+            result = result + os.sep + part
+    assert isinstance(result, pd.Series)
+    return result
+
+
+def resolveSubFolderPaths(df: pd.DataFrame, sub_folders: dict[str, str]) -> pd.Series:
+    """Build the image paths for the Excel layout where `Folder` is the name of a sub-folder
+    (see `listSubFolders`), with an optional `RelativePath` within it, and the `File` name.
+
+    Returns:
+        pd.Series: The normalized image path of each row
+            (an empty string if the row's folder couldn't be found)
+    """
+    folder_paths = df["Folder"].map(sub_folders).fillna("")
+    relative_paths = df["RelativePath"] if "RelativePath" in df else ""
+    paths = _joinColumns([folder_paths, relative_paths, df["File"]])
+    return normalizeColumn(paths.where(folder_paths != "", ""))
+
+
+def resolveCameraPaths(df: pd.DataFrame, base_dir: str) -> pd.Series:
+    """Build the image paths for the Excel layout with `Camera`, `Folder` and `File` columns
+    (the images are in `<base_dir>/Camera-<Camera>/<Folder>/<File>`)
+
+    Returns:
+        pd.Series: The normalized image path of each row
+    """
+    camera_folders = base_dir + os.sep + "Camera-" + df["Camera"]
+    return normalizeColumn(_joinColumns([camera_folders, df["Folder"], df["File"]]))
+
+
+def resolvePictureFilePaths(df: pd.DataFrame, column: str = "Picture File") -> pd.Series:
+    """The image paths for the Excel layout with the full path of each image in a column
+
+    Returns:
+        pd.Series: The normalized image path of each row
+    """
+    return normalizeColumn(df[column].str.strip())
+
+
+def normalizeColumn(paths: pd.Series) -> pd.Series:
+    """Normalize every path in the column, keeping their case (like `normalizePath`,
+    except that `..` folders aren't resolved), with vectorized string operations
+    """
+    if os.altsep:
+        paths = paths.str.replace(os.altsep, os.sep, regex=False)
+    paths = paths.str.replace(_REPEATED_SEPARATORS, _SEPARATOR_REPLACEMENT, regex=True)
+    return paths.str.replace(_CURRENT_FOLDERS, "", regex=True)
+
+
+def pathKeyColumn(paths: pd.Series) -> pd.Series:
+    """The key of every (normalized) path in the column (see `pathKey`)"""
+    if os.path.normcase("A") != "A":
+        return paths.str.lower()
+    return paths
+
+
+# endregion
+
+
+# ##################################################################################################
+# region Creating the images collection
+# ##################################################################################################
+
+
+def findExistingPaths(paths: pd.Series, files: set[str]) -> pd.Series:
+    """Determines which of the (normalized) paths are in the set of files (see `listFiles`)
+
+    Returns:
+        pd.Series: A boolean column, `True` where the path's image exists
+    """
+    return pathKeyColumn(paths).isin(files)
+
+
+def createImagesCollection(paths: Iterable[str]) -> model.ImagesCollection:
+    """Create the images collection of the tagged images (without any tagged regions yet),
+    sorted by file path and without any duplicates
+    """
+    images = [model.ImageInfo(True, path, []) for path in sorted(set(paths))]
+    return model.ImagesCollection(maxViewed=0, currentIndex=0, images=images)
+
+
+def printSummary(paths: pd.Series, exists: pd.Series) -> None:
+    """Print how many of the Excel file's tagged images were found"""
+    row_count = len(paths)
+    found_count = int(exists.sum())
+    print(
+        f"Found a total of {found_count} tagged images - out of {row_count} "
+        f"(missing {row_count - found_count})"
+    )
+
+
+# endregion
@@ -1,34 +1,32 @@
 r"""
     Processes the Excel file in:
         D:\data\NRSI\1033H
+
+    Run from the top-level folder with:
+        python -m utils.excelFileUtils.validateExcelTaggedImagePaths
 """
-import pandas as pd
-import numpy as np
-import os
+from src import data_serialization_json as ds
+from utils.excelFileUtils import taggedImagePaths as tip
 
 # First - load all the folders
+baseFolder = r"D:\data\NRSI\1033H"
 excelFileToValidate = (
     r"D:\data\NRSI\1033H\NRSI_1033H_Camera Data_2019_03_14_All Data.xlsx"
 )
 
-# Load the Excel file with the file paths to validate
-df = pd.read_excel(excelFileToValidate, "Wildlife Camera Data_QAQC")
-df = df.replace(np.nan, "", regex=True)
-
-count = 0
-taggedImagePaths: list[str] = []
-for i, row in df.iterrows():
-    count += 1
-    # Guess the folder from the Excel file
-    taggedImagePath: str = str(row["Picture File"]).strip()
-    if os.path.isfile(taggedImagePath):
-        print(taggedImagePath)
-        taggedImagePaths.append(taggedImagePath)
-    # else:
-    #     print(f'Failed to find tagged image from row: {i} - "{taggedImagePath}"')
-
-numTaggedImages = len(taggedImagePaths)
-numMissingImages = count - numTaggedImages
-print(
-    f"Found a total of {numTaggedImages} tagged images - out of {count} (missing {numMissingImages})"
-)
+# Where the tagged images are saved (ready for the tagger UI)
+outputFile = "./taggedImages.json"
+
+
+def main():
+    # Load the Excel file with the file paths to validate
+    df = tip.readExcelCached(excelFileToValidate, "Wildlife Camera Data_QAQC")
+    paths = tip.resolvePictureFilePaths(df)
+    exists = tip.findExistingPaths(paths, tip.listFiles(baseFolder))
+
+    ds.saveImagesCollectionToJson(outputFile, tip.createImagesCollection(paths[exists]))
+    tip.printSummary(paths, exists)
+
+
+if __name__ == "__main__":
+    main()
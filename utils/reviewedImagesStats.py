@@ -1,39 +1,20 @@
-import csv
+"""
+Counts the tagged and not tagged images.
 
-
-def readTaggedAnimalsCsvFile(path: str) -> list[list[str]]:
-    """Read in the latset/greatest animals CSV file"""
-    rows: list[list[str]] = []
-    with open(path, "r") as csvfile:
-        # create a csv reader object
-        csvReader = csv.reader(csvfile)
-
-        # extracting field names through first row
-        next(csvReader)
-
-        # extracting each data row one by one
-        row: list[str]
-        for row in csvReader:
-            rows.append(row)
-    return rows
+Run from the top-level folder with:
+    python -m utils.reviewedImagesStats
+"""
+from src import data_serialization_csv as dsc
 
 
 def main():
     inputFilename = "./animals.final.csv"
-    animalRecords = readTaggedAnimalsCsvFile(inputFilename)
-
-    totalTagged = 0
-    totalNotTagged = 0
-    for row in animalRecords:
-        tagged = row[0] == "TRUE"
-        if tagged:
-            totalTagged += 1
-        else:
-            totalNotTagged += 1
+    stats = dsc.calculateImageRecordStats(dsc.readImages(inputFilename))
 
-    total = totalTagged + totalNotTagged
-    print(f"Total tagged images: {totalTagged} - { totalTagged / total * 100}")
-    print(f"Total Not tagged   : {totalNotTagged} - { totalNotTagged / total * 100}")
+    total = stats.total
+    print(f"Total tagged images: {stats.tagged} - { stats.tagged / total * 100}")
+    print(f"Total Not tagged   : {stats.notTagged} - { stats.notTagged / total * 100}")
 
 
-main()
+if __name__ == "__main__":
+    main()